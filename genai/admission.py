@@ -0,0 +1,295 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Lower runs first.
+INTERACTIVE = 0
+BATCH = 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+WINDOW_SECONDS = 60.0
+
+# Per-provider request and token budgets per minute; 0 means unlimited.
+PROVIDER_LIMITS = {
+    "groq": (int(os.getenv("GROQ_RPM", "60")), int(os.getenv("GROQ_TPM", "0"))),
+    "gemini": (int(os.getenv("GEMINI_RPM", "0")), int(os.getenv("GEMINI_TPM", "0"))),
+}
+
+# A request whose predicted queue wait exceeds this is rejected straight away.
+ADMISSION_MAX_WAIT = {
+    INTERACTIVE: float(os.getenv("ADMISSION_INTERACTIVE_MAX_WAIT", "5")),
+    BATCH: float(os.getenv("ADMISSION_BATCH_MAX_WAIT", "60")),
+}
+
+_priority = contextvars.ContextVar("admission_priority", default=BATCH)
+
+
+class Overloaded(RuntimeError):
+    """Raised instead of queueing when a request would wait past its deadline."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} is over its rate budget; retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+@contextmanager
+def priority(level: int):
+    """Run model calls made inside the block (and tasks it starts) at `level`."""
+    previous = _priority.get()
+    _priority.set(level)
+    try:
+        yield
+    finally:
+        # not reset(token): a stream started by a route may finish in the response's task
+        _priority.set(previous)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "enqueued", "deadline", "admitted", "cancelled", "wake")
+
+    def __init__(self, level: int, seq: int, tokens: int, now: float, wake):
+        self.priority = level
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued = now
+        self.deadline = now + ADMISSION_MAX_WAIT[level]
+        self.admitted = None
+        self.cancelled = False
+        self.wake = wake
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Ticket:
+    """One admitted request; settle() swaps the token estimate for actual usage."""
+
+    def __init__(self, limiter, entry):
+        self._limiter = limiter
+        self._entry = entry
+
+    def settle(self, tokens: int):
+        if tokens:
+            with self._limiter.lock:
+                self._entry[1] = tokens
+
+
+class RateLimiter:
+    """
+    Sliding-window RPM/TPM budget for one provider with a priority queue.
+
+    Requests are admitted strictly in (priority, arrival) order while the last
+    minute's requests and tokens leave room. A request is shed with Overloaded
+    when the wait predicted from the window and the queue ahead of it exceeds
+    its priority's deadline, or when it is still queued at that deadline.
+    Works from threads and event loops alike.
+    """
+
+    def __init__(self, name: str, rpm: int = 0, tpm: int = 0):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.lock = threading.Lock()
+        self._window = deque()  # [admitted_at, tokens]
+        self._queue = []
+        self._seq = itertools.count()
+        self._stats = {
+            level: {"admitted": 0, "shed": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for level in _PRIORITY_NAMES
+        }
+
+    # -- window --------------------------------------------------------
+
+    def _prune(self, now: float):
+        while self._window and self._window[0][0] <= now - WINDOW_SECONDS:
+            self._window.popleft()
+
+    def _fits(self, tokens: int) -> bool:
+        if self.rpm and len(self._window) >= self.rpm:
+            return False
+        if self.tpm and sum(e[1] for e in self._window) + tokens > self.tpm:
+            return False
+        return True
+
+    def _clamp(self, tokens: int) -> int:
+        # a request larger than the whole budget would otherwise never fit
+        return min(tokens, self.tpm) if self.tpm else tokens
+
+    def _predict_wait(self, requests: int, tokens: int, now: float) -> float:
+        waits = [0.0]
+        window = list(self._window)
+        if self.rpm:
+            excess = len(window) + requests - self.rpm
+            if 0 < excess <= len(window):
+                waits.append(window[excess - 1][0] + WINDOW_SECONDS - now)
+            elif excess > len(window):
+                waits.append(WINDOW_SECONDS * math.ceil(excess / self.rpm))
+        if self.tpm:
+            remaining = sum(e[1] for e in window)
+            if remaining + tokens > self.tpm:
+                wait = WINDOW_SECONDS * math.ceil(tokens / self.tpm)
+                for admitted_at, used in window:
+                    remaining -= used
+                    if remaining + tokens <= self.tpm:
+                        wait = admitted_at + WINDOW_SECONDS - now
+                        break
+                waits.append(wait)
+        return max(waits)
+
+    def _next_change(self, now: float) -> float:
+        if self._window:
+            return max(self._window[0][0] + WINDOW_SECONDS - now, 0.01)
+        return 0.05
+
+    # -- queue ---------------------------------------------------------
+
+    def _admit(self, waiter: _Waiter, now: float):
+        entry = [now, waiter.tokens]
+        self._window.append(entry)
+        waiter.admitted = entry
+        stats = self._stats[waiter.priority]
+        waited = now - waiter.enqueued
+        stats["admitted"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+
+    def _pump(self, now: float):
+        self._prune(now)
+        while self._queue:
+            head = self._queue[0]
+            if head.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            if not self._fits(head.tokens):
+                return
+            heapq.heappop(self._queue)
+            self._admit(head, now)
+            if head.wake:
+                head.wake()
+
+    def _enqueue(self, tokens: int, wake) -> _Waiter:
+        now = time.monotonic()
+        level = current_priority()
+        waiter = _Waiter(level, next(self._seq), self._clamp(tokens), now, wake)
+        self._pump(now)
+        ahead = [w for w in self._queue if not w.cancelled and w < waiter]
+        predicted = self._predict_wait(len(ahead) + 1, sum(w.tokens for w in ahead) + waiter.tokens, now)
+        if predicted > ADMISSION_MAX_WAIT[level]:
+            self._stats[level]["shed"] += 1
+            raise Overloaded(self.name, predicted)
+        heapq.heappush(self._queue, waiter)
+        self._pump(now)
+        return waiter
+
+    def _poll(self, waiter: _Waiter):
+        """Return (ticket, None) once admitted, else (None, seconds to wait)."""
+        now = time.monotonic()
+        self._pump(now)
+        if waiter.admitted is not None:
+            return Ticket(self, waiter.admitted), None
+        if now >= waiter.deadline:
+            waiter.cancelled = True
+            self._stats[waiter.priority]["shed"] += 1
+            raise Overloaded(self.name, self._next_change(now))
+        return None, min(waiter.deadline - now, self._next_change(now))
+
+    def _cancel(self, waiter: _Waiter):
+        with self.lock:
+            if waiter.admitted is None:
+                waiter.cancelled = True
+                self._pump(time.monotonic())
+
+    def acquire(self, tokens: int = 0) -> Ticket:
+        event = threading.Event()
+        with self.lock:
+            waiter = self._enqueue(tokens, event.set)
+        try:
+            while True:
+                with self.lock:
+                    ticket, timeout = self._poll(waiter)
+                if ticket:
+                    return ticket
+                event.wait(timeout)
+                event.clear()
+        except BaseException:
+            self._cancel(waiter)
+            raise
+
+    async def acquire_async(self, tokens: int = 0) -> Ticket:
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        with self.lock:
+            waiter = self._enqueue(tokens, lambda: loop.call_soon_threadsafe(event.set))
+        try:
+            while True:
+                with self.lock:
+                    ticket, timeout = self._poll(waiter)
+                if ticket:
+                    return ticket
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        except BaseException:
+            self._cancel(waiter)
+            raise
+
+    def try_acquire(self, tokens: int = 0):
+        """Admit immediately if nothing is queued and the budget has room, else None."""
+        with self.lock:
+            now = time.monotonic()
+            self._pump(now)
+            tokens = self._clamp(tokens)
+            if any(not w.cancelled for w in self._queue) or not self._fits(tokens):
+                return None
+            entry = [now, tokens]
+            self._window.append(entry)
+            return Ticket(self, entry)
+
+    def stats(self) -> dict:
+        with self.lock:
+            now = time.monotonic()
+            self._prune(now)
+            queued = [w for w in self._queue if not w.cancelled]
+            result = {
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "requests_last_minute": len(self._window),
+                "tokens_last_minute": sum(e[1] for e in self._window),
+            }
+            for level, name in _PRIORITY_NAMES.items():
+                stats = self._stats[level]
+                waiting = [w for w in queued if w.priority == level]
+                result[name] = {
+                    "queue_depth": len(waiting),
+                    "oldest_wait_seconds": max((now - w.enqueued for w in waiting), default=0.0),
+                    "admitted": stats["admitted"],
+                    "shed": stats["shed"],
+                    "mean_wait_seconds": stats["wait_total"] / stats["admitted"] if stats["admitted"] else 0.0,
+                    "max_wait_seconds": stats["wait_max"],
+                }
+            return result
+
+
+_limiters = {name: RateLimiter(name, rpm, tpm) for name, (rpm, tpm) in PROVIDER_LIMITS.items()}
+
+
+def limiter(provider: str) -> RateLimiter:
+    return _limiters[provider]
+
+
+def stats() -> dict:
+    return {name: l.stats() for name, l in _limiters.items()}
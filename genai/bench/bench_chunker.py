@@ -0,0 +1,96 @@
+"""
+Micro-benchmark: chunker.iter_chunks against the old character-based _chunk_text.
+
+Run from the genai directory:
+    python bench/bench_chunker.py [--pages 400]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunker import estimate_tokens, iter_chunks  # noqa: E402
+
+WORDS = (
+    "tree node key value balance rotation height search insert delete order "
+    "traversal recursion complexity logarithmic pointer subtree invariant "
+    "normalization relation schema dependency transaction isolation lock"
+).split()
+
+
+def legacy_chunk_text(text: str, max_chars: int = 1200):
+    """The character slicer process_document used before chunker.py."""
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + max_chars, length)
+        cut = text.rfind("\n", start, end)
+        if cut <= start:
+            cut = text.rfind(" ", start, end)
+        if cut <= start:
+            cut = end
+        chunk = text[start:cut].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = cut
+    return chunks
+
+
+def synthetic_pages(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(count):
+        paragraphs = []
+        for _ in range(rng.randint(3, 7)):
+            sentences = []
+            for _ in range(rng.randint(2, 8)):
+                words = [rng.choice(WORDS) for _ in range(rng.randint(6, 28))]
+                sentences.append(" ".join(words).capitalize() + ".")
+            # pdfplumber output: hard-wrapped lines inside paragraphs
+            body = " ".join(sentences)
+            lines = [body[i:i + 90] for i in range(0, len(body), 90)]
+            paragraphs.append("\n".join(lines))
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+
+def describe(name, seconds, texts):
+    tokens = [estimate_tokens(t) for t in texts]
+    print(
+        f"{name:<10} {seconds * 1000:8.1f} ms  chunks={len(texts):5d}  "
+        f"tokens mean={statistics.mean(tokens):6.1f} stdev={statistics.pstdev(tokens):6.1f} "
+        f"min={min(tokens):4d} max={max(tokens):4d}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages)
+    print(f"{args.pages} pages, {sum(len(p) for p in pages) / 1e6:.2f} MB of text")
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        legacy = legacy_chunk_text("\n\n".join(pages))
+        best = min(best, time.perf_counter() - start)
+    describe("legacy", best, legacy)
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        chunks = [c.text for c in iter_chunks(pages)]
+        best = min(best, time.perf_counter() - start)
+    describe("chunker", best, chunks)
+
+
+if __name__ == "__main__":
+    main()
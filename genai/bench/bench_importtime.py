@@ -0,0 +1,102 @@
+"""
+Import-time budget for the genai service.
+
+Imports `main` in a fresh interpreter under `python -X importtime` several
+times and checks the fastest run against a budget. It also fails if any of
+the provider SDKs or pdfplumber were imported: those are meant to load on
+first use, and pulling one back in at import time is the usual way a cold
+start regresses.
+
+Run from the genai directory:
+    python bench/bench_importtime.py [--budget-ms 800] [--runs 5] [--top 15]
+
+Exits non-zero when the budget is exceeded or a lazy module was imported.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+GENAI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be loaded just by importing the app.
+LAZY_MODULES = ["openai", "google.genai", "pinecone", "pdfplumber", "requests", "json5", "uvicorn"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module: str):
+    """Return [(name, self_us, cumulative_us, depth)] for one cold import, in output order."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=GENAI_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"importing {module} failed")
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent)))
+    return modules
+
+
+def children(modules, name: str):
+    """Direct imports of `name`: the entries one level deeper printed just before it."""
+    index = next(i for i, entry in enumerate(modules) if entry[0] == name)
+    depth = modules[index][3]
+    found = []
+    for entry in reversed(modules[:index]):
+        if entry[3] <= depth:
+            break
+        if entry[3] == depth + 2:
+            found.append(entry)
+    return found
+
+
+def cumulative_us(modules, name: str) -> int:
+    return next(entry[2] for entry in modules if entry[0] == name)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "800")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda modules: cumulative_us(modules, args.module))
+    total_ms = cumulative_us(best, args.module) / 1000
+
+    print(f"import {args.module}: best {total_ms:.0f} ms of {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print(f"\n{'cumulative ms':>13}  {'self ms':>7}  module")
+    for name, self_us, cumulative, _ in sorted(children(best, args.module), key=lambda e: -e[2])[:args.top]:
+        print(f"{cumulative / 1000:13.1f}  {self_us / 1000:7.1f}  {name}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    imported = {entry[0]: entry for entry in best}
+    for name in LAZY_MODULES:
+        if name in imported:
+            failures.append(f"{name} was imported eagerly ({imported[name][2] / 1000:.0f} ms)")
+
+    print()
+    for failure in failures:
+        print("FAIL", failure)
+    if not failures:
+        print("OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
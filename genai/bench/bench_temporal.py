@@ -0,0 +1,120 @@
+"""
+Golden corpus check and micro-benchmark for temporal.parse_total_days.
+
+Every case in temporal_golden.json is parsed against the corpus' fixed
+"today"; a null "days" means the text must be left to the LLM fallback.
+The timing compares the old difflib + dateutil path with the new parser,
+both cold (caches cleared) and memoized.
+
+Run from the genai directory:
+    python bench/bench_temporal.py [--repeat 200]
+
+Exits non-zero if any golden case fails.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import date
+from difflib import get_close_matches
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import temporal  # noqa: E402
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temporal_golden.json")
+
+LEGACY_MONTHS = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december"
+]
+LEGACY_DURATION_WORDS = ["next", "day", "days", "week", "weeks", "month", "months"]
+
+
+def legacy_total_days(user_input: str, today: date):
+    """calculate_total_days before temporal.py, minus the LLM fallback."""
+    from dateutil import parser
+
+    def correct(text, words, cutoff):
+        out = []
+        for word in text.lower().split():
+            match = get_close_matches(word, words, n=1, cutoff=cutoff)
+            out.append(match[0] if match else word)
+        return " ".join(out)
+
+    text = correct(user_input, LEGACY_DURATION_WORDS, 0.8)
+    match = re.search(r"(next|for the next|for)\s+(\d+)\s+(day|days|week|weeks|month|months)", text)
+    if match:
+        count, unit = int(match.group(2)), match.group(3)
+        return count * 7 if "week" in unit else count * 30 if "month" in unit else count
+    match = re.search(r"(next|for the next|for)\s+(day|days|week|weeks|month|months)", text)
+    if match:
+        unit = match.group(2)
+        return 7 if "week" in unit else 30 if "month" in unit else 1
+    try:
+        parsed = parser.parse(correct(user_input, LEGACY_MONTHS, 0.7), fuzzy=True, dayfirst=True).date()
+    except Exception:
+        return None
+    if parsed < today:
+        parsed = parsed.replace(year=today.year + 1)
+    return (parsed - today).days + 1
+
+
+def clear_caches():
+    temporal._parse.cache_clear()
+    temporal._tokenize.cache_clear()
+    temporal._lookup_word.cache_clear()
+
+
+def check_golden(cases, today):
+    failures = 0
+    legacy_agrees = 0
+    for case in cases:
+        got = temporal.parse_total_days(case["text"], today)
+        if got != case["days"]:
+            failures += 1
+            print(f"FAIL {case['text']!r}: expected {case['days']}, got {got}")
+        if case["days"] is not None and legacy_total_days(case["text"], today) == case["days"]:
+            legacy_agrees += 1
+    resolved = sum(case["days"] is not None for case in cases)
+    print(f"golden: {len(cases) - failures}/{len(cases)} pass, {resolved} resolved locally")
+    print(f"legacy: {legacy_agrees}/{resolved} of the locally resolved cases match without the LLM")
+    return failures
+
+
+def bench(name, fn, texts, today, repeat, before=None):
+    best = float("inf")
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        for text in texts:
+            fn(text, today)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<10} {best / len(texts) * 1e6:8.1f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(GOLDEN_PATH) as f:
+        golden = json.load(f)
+    today = date.fromisoformat(golden["today"])
+    cases = golden["cases"]
+
+    failures = check_golden(cases, today)
+
+    texts = [case["text"] for case in cases]
+    bench("legacy", legacy_total_days, texts, today, max(1, args.repeat // 10))
+    bench("cold", temporal.parse_total_days, texts, today, args.repeat, before=clear_caches)
+    bench("memoized", temporal.parse_total_days, texts, today, args.repeat)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
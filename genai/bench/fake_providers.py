@@ -0,0 +1,338 @@
+"""
+Local stand-ins for Groq, Gemini and Pinecone, for benchmarks that must not
+spend API quota.
+
+One server answers all three under different path prefixes:
+
+    /openai/v1/chat/completions        OpenAI-compatible chat (Groq), incl. streaming
+    /gemini/v1beta/models/...          generateContent, streamGenerateContent,
+                                       batchEmbedContents
+    /pinecone/indexes...               Pinecone control plane
+    /pinecone/data/{index}/...         Pinecone data plane (in-memory index)
+
+Point the service at it with:
+
+    GROQ_BASE_URL=http://HOST:PORT/openai/v1
+    GEMINI_BASE_URL=http://HOST:PORT/gemini/
+    PINECONE_HOST=http://HOST:PORT/pinecone
+
+Chat answers are picked by recognising the genai prompts (flashcards, MCQs,
+schedule outline/segments, topic content, date extraction) and always parse.
+Latency is FAKE_LATENCY seconds before the first token plus the completion
+length at FAKE_TOKENS_PER_SECOND; embeddings cost FAKE_EMBED_LATENCY per
+request. Run standalone with:
+    python bench/fake_providers.py [--port 8790]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FAKE_LATENCY = float(os.getenv("FAKE_LATENCY", "0.2"))
+FAKE_TOKENS_PER_SECOND = float(os.getenv("FAKE_TOKENS_PER_SECOND", "400"))
+FAKE_EMBED_LATENCY = float(os.getenv("FAKE_EMBED_LATENCY", "0.05"))
+FAKE_EMBED_DIM = int(os.getenv("FAKE_EMBED_DIM", "256"))
+FAKE_PINECONE_LATENCY = float(os.getenv("FAKE_PINECONE_LATENCY", "0.01"))
+
+app = FastAPI()
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _count(pattern: str, text: str, default: int) -> int:
+    match = re.search(pattern, text)
+    return int(match.group(1)) if match else default
+
+
+def _days_from(text: str):
+    match = re.search(r"Start date: (\d{4}-\d{2}-\d{2})", text)
+    return match.group(1) if match else "2026-01-01"
+
+
+def _schedule(start: str, days: int) -> list:
+    from datetime import date, timedelta
+
+    first = date.fromisoformat(start)
+    return [
+        {
+            "date": (first + timedelta(days=i)).isoformat(),
+            "topic": f"Topic {i + 1}",
+            "details": "Work through the material for the day.",
+            "subtopics": ["reading", "exercises"],
+            "duration": "2",
+        }
+        for i in range(days)
+    ]
+
+
+def chat_answer(messages: list) -> str:
+    """A well-formed answer for whichever genai prompt `messages` is."""
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    user = " ".join(str(m.get("content", "")) for m in messages if m.get("role") != "system")
+    if "creating flashcards" in system:
+        return json.dumps({"flashcards": [
+            {"question": f"What is concept {i + 1}?", "answer": f"Concept {i + 1} is explained in the text."}
+            for i in range(4)
+        ]})
+    if "generates MCQs" in system:
+        count = _count(r"Generate (\d+) questions", user, 5)
+        digest = hashlib.sha1(user.encode("utf-8")).hexdigest()[:8]
+        return json.dumps([
+            {"question": f"Question {i + 1} on section {digest}?", "options": ["A", "B", "C", "D"], "answer": "A"}
+            for i in range(count)
+        ])
+    if "high-level outline" in system:
+        blocks = _count(r"EXACTLY (\d+) blocks", system, 1)
+        return json.dumps({"blocks": [
+            {"focus": f"Block {i + 1}", "goals": "Finish the block's material."} for i in range(blocks)
+        ]})
+    if "study planner" in system:
+        days = _count(r"EXACTLY (\d+) days", system, 7)
+        return json.dumps({"schedule": _schedule(_days_from(system), days)})
+    if "teaching content" in system:
+        return json.dumps({
+            "topic": "Benchmark topic",
+            "overview": "An overview of the topic.",
+            "learning_objectives": ["Understand the topic"],
+            "prerequisites": [],
+            "eli5": "A simple explanation.",
+            "core_concepts": [
+                {"title": f"Concept {i + 1}", "explanation": "Explanation.", "key_points": ["point"]}
+                for i in range(3)
+            ],
+            "worked_examples": [],
+            "visuals": [],
+            "common_mistakes": [],
+            "quick_revision": ["Recap"],
+        })
+    if "END DATE" in user:
+        return "2026-12-31"
+    return "This is a benchmark answer based on the provided context."
+
+
+async def _generation_delay(text: str):
+    await asyncio.sleep(FAKE_LATENCY + _tokens(text) / FAKE_TOKENS_PER_SECOND)
+
+
+def _pieces(text: str, size: int = 16):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+# -- OpenAI-compatible chat (Groq) ---------------------------------------
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    content = chat_answer(body["messages"])
+    prompt_tokens = sum(_tokens(str(m.get("content", ""))) for m in body["messages"])
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": _tokens(content),
+        "total_tokens": prompt_tokens + _tokens(content),
+    }
+    base = {"id": "chatcmpl-bench", "created": 0, "model": body["model"]}
+
+    if not body.get("stream"):
+        await _generation_delay(content)
+        return dict(base, object="chat.completion", usage=usage, choices=[{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }])
+
+    async def events():
+        await asyncio.sleep(FAKE_LATENCY)
+        for piece in _pieces(content):
+            await asyncio.sleep(_tokens(piece) / FAKE_TOKENS_PER_SECOND)
+            chunk = dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"content": piece}, "finish_reason": None},
+            ])
+            yield f"data: {json.dumps(chunk)}\n\n"
+        last = dict(base, object="chat.completion.chunk", usage=usage, choices=[
+            {"index": 0, "delta": {}, "finish_reason": "stop"},
+        ])
+        yield f"data: {json.dumps(last)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+# -- Gemini ----------------------------------------------------------------
+
+def _gemini_text(body: dict) -> str:
+    return " ".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def _gemini_response(text: str, prompt: str) -> dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        "usageMetadata": {
+            "promptTokenCount": _tokens(prompt),
+            "candidatesTokenCount": _tokens(text),
+            "totalTokenCount": _tokens(prompt) + _tokens(text),
+        },
+    }
+
+
+def _embedding(text: str) -> list:
+    # deterministic per text, so identical chunks retrieve each other
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(FAKE_EMBED_DIM)
+    return (vector / np.linalg.norm(vector)).round(6).tolist()
+
+
+@app.post("/gemini/{version}/models/{call}")
+async def gemini(version: str, call: str, request: Request):
+    body = await request.json()
+    _, _, method = call.partition(":")
+
+    if method == "batchEmbedContents":
+        await asyncio.sleep(FAKE_EMBED_LATENCY)
+        texts = [" ".join(p.get("text", "") for p in r["content"]["parts"]) for r in body["requests"]]
+        return {"embeddings": [{"values": _embedding(text)} for text in texts]}
+
+    prompt = _gemini_text(body)
+    text = chat_answer([{"role": "user", "content": prompt}])
+    if method == "generateContent":
+        await _generation_delay(text)
+        return _gemini_response(text, prompt)
+
+    if method == "streamGenerateContent":
+        async def events():
+            await asyncio.sleep(FAKE_LATENCY)
+            pieces = _pieces(text)
+            for i, piece in enumerate(pieces):
+                await asyncio.sleep(_tokens(piece) / FAKE_TOKENS_PER_SECOND)
+                chunk = _gemini_response(piece, prompt)
+                if i < len(pieces) - 1:
+                    del chunk["usageMetadata"]
+                yield f"data: {json.dumps(chunk)}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return JSONResponse({"error": {"code": 404, "message": f"Unknown method {method}"}}, status_code=404)
+
+
+# -- Pinecone ----------------------------------------------------------------
+
+class _Index:
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.namespaces = {}
+        self.lock = threading.Lock()
+
+    def upsert(self, vectors: list, namespace: str) -> int:
+        with self.lock:
+            space = self.namespaces.setdefault(namespace, {})
+            for vector in vectors:
+                space[vector["id"]] = (np.asarray(vector["values"], dtype=np.float32), vector.get("metadata") or {})
+        return len(vectors)
+
+    def query(self, values: list, top_k: int, namespace: str, include_metadata: bool) -> list:
+        with self.lock:
+            items = list(self.namespaces.get(namespace, {}).items())
+        if not items:
+            return []
+        matrix = np.stack([vector for _, (vector, _) in items])
+        query = np.asarray(values, dtype=np.float32)
+        scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-9)
+        best = np.argsort(-scores)[:top_k]
+        return [
+            dict({"id": items[i][0], "score": float(scores[i]), "values": []},
+                 **({"metadata": items[i][1][1]} if include_metadata else {}))
+            for i in best
+        ]
+
+    def delete(self, ids: list, namespace: str):
+        with self.lock:
+            space = self.namespaces.get(namespace, {})
+            for vector_id in ids:
+                space.pop(vector_id, None)
+
+
+_indexes = {}
+
+
+def _index_description(name: str, request: Request) -> dict:
+    return {
+        "name": name,
+        "dimension": _indexes[name].dimension,
+        "metric": "cosine",
+        "host": f"{request.base_url}pinecone/data/{name}".replace("//pinecone", "/pinecone"),
+        "spec": {"serverless": {"cloud": "aws", "region": "us-west-2"}},
+        "status": {"ready": True, "state": "Ready"},
+        "deletion_protection": "disabled",
+        "vector_type": "dense",
+    }
+
+
+@app.get("/pinecone/indexes")
+async def list_indexes(request: Request):
+    return {"indexes": [_index_description(name, request) for name in _indexes]}
+
+
+@app.post("/pinecone/indexes", status_code=201)
+async def create_index(request: Request):
+    body = await request.json()
+    _indexes.setdefault(body["name"], _Index(body["dimension"]))
+    return _index_description(body["name"], request)
+
+
+@app.get("/pinecone/indexes/{name}")
+async def describe_index(name: str, request: Request):
+    if name not in _indexes:
+        # the service may open the index before its first upsert creates it
+        _indexes[name] = _Index(FAKE_EMBED_DIM)
+    return _index_description(name, request)
+
+
+@app.post("/pinecone/data/{name}/vectors/upsert")
+async def upsert(name: str, request: Request):
+    body = await request.json()
+    await asyncio.sleep(FAKE_PINECONE_LATENCY)
+    count = _indexes[name].upsert(body["vectors"], body.get("namespace", ""))
+    return {"upsertedCount": count}
+
+
+@app.post("/pinecone/data/{name}/query")
+async def query(name: str, request: Request):
+    body = await request.json()
+    await asyncio.sleep(FAKE_PINECONE_LATENCY)
+    matches = _indexes[name].query(
+        body["vector"], body.get("topK", 10), body.get("namespace", ""), body.get("includeMetadata", False)
+    )
+    return {"matches": matches, "namespace": body.get("namespace", ""), "usage": {"readUnits": 1}}
+
+
+@app.post("/pinecone/data/{name}/vectors/delete")
+async def delete(name: str, request: Request):
+    body = await request.json()
+    _indexes[name].delete(body.get("ids", []), body.get("namespace", ""))
+    return {}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
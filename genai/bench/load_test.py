@@ -0,0 +1,397 @@
+"""
+Offline load test for the genai service.
+
+Starts bench/fake_providers.py in place of Groq, Gemini and Pinecone,
+writes synthetic PDFs, starts `main:app` under uvicorn against them,
+and drives the routes one after another at a fixed concurrency. Nothing
+leaves the machine and no API quota is used.
+
+For every route it reports client-side latency (p50/p95/p99, and time to
+first byte for streams) and throughput. It also reports a per-stage
+breakdown (download, extract, chunk, embed, upsert, retrieve, llm, parse),
+taken from the service's own /metrics histograms before and after the
+route ran. Stage percentiles are estimated from the histogram buckets.
+
+    python bench/load_test.py [--routes chat,flashcards] [--concurrency 8]
+        [--requests 32] [--pdf medium] [--latency 0.2] [--tokens-per-second 400]
+        [--output results.json] [--compare baseline.json]
+
+Save a run with --output on one commit and pass it to --compare on another
+to see how p50/p95 and throughput moved per route.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GENAI_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic_pdf  # noqa: E402
+
+TERMINAL_JOB_STATES = ("succeeded", "failed")
+
+
+def _pdf(ctx, i):
+    return {"Path": ctx["pdf"]}
+
+
+# name: (path, body(ctx, i), kind). Routes run in this order; upload comes
+# first so the chat routes have an indexed document to retrieve from.
+ROUTES = {
+    "upload": ("/api/chatbot/upload", _pdf, "json"),
+    "upload_job": ("/api/chatbot/upload/jobs", _pdf, "job"),
+    "chat": ("/api/chatbot/chat", lambda ctx, i: {
+        "userMessage": f"Question {i}: how does the scheduler balance the worst case?"}, "json"),
+    "chat_stream": ("/api/chatbot/chat/stream", lambda ctx, i: {
+        "userMessage": f"Streamed question {i}: what limits memory usage?"}, "stream"),
+    "flashcards": ("/api/flashcards", _pdf, "json"),
+    "flashcards_stream": ("/api/flashcards/stream", _pdf, "stream"),
+    "flashcards_job": ("/api/flashcards/jobs", _pdf, "job"),
+    "quizbot": ("/api/quizbot", _pdf, "json"),
+    "quizbot_stream": ("/api/quizbot/stream", _pdf, "stream"),
+    "quizbot_job": ("/api/quizbot/jobs", _pdf, "job"),
+    "quizbot_text": ("/api/quizbot/text", lambda ctx, i: {
+        "prompt": f"Quiz {i}: binary search trees, hash tables and dynamic programming."}, "json"),
+    "quizbot_text_stream": ("/api/quizbot/text/stream", lambda ctx, i: {
+        "prompt": f"Streamed quiz {i}: graph traversal and priority queues."}, "stream"),
+    "topic": ("/api/topic-content", lambda ctx, i: {"topic": f"Benchmark topic {i}"}, "json"),
+    "topic_stream": ("/api/topic-content/stream", lambda ctx, i: {"topic": f"Streamed topic {i}"}, "stream"),
+    "schedule": ("/api/schedule", lambda ctx, i: {
+        "userMessage": f"Plan revision of unit {i} for the next 7 days"}, "json"),
+    "schedule_long": ("/api/schedule", lambda ctx, i: {
+        "userMessage": f"Plan revision of course {i} for the next 6 weeks"}, "json"),
+}
+
+
+# -- processes -------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_processes(args, work_dir: str):
+    fake_port, service_port = _free_port(), _free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake_env = dict(
+        os.environ,
+        FAKE_LATENCY=str(args.latency),
+        FAKE_TOKENS_PER_SECOND=str(args.tokens_per_second),
+        FAKE_EMBED_LATENCY=str(args.embed_latency),
+    )
+    fake = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "fake_providers.py"), "--port", str(fake_port)],
+        env=fake_env,
+    )
+    service_env = dict(
+        os.environ,
+        GROQ_API_KEY="bench",
+        GROQ_BASE_URL=f"{fake_url}/openai/v1",
+        GEMINI_API_KEY="bench",
+        GEMINI_BASE_URL=f"{fake_url}/gemini/",
+        VECTOR_STORE="pinecone",
+        PINECONE_API_KEY="bench",
+        PINECONE_HOST=f"{fake_url}/pinecone",
+        PINECONE_INDEX="bench-index",
+        GENAI_CACHE_DIR=os.path.join(work_dir, "cache"),
+        GROQ_RPM=str(args.rpm),
+        LOG_LEVEL="WARNING",
+    )
+    service = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(service_port), "--log-level", "warning"],
+        cwd=GENAI_DIR,
+        env=service_env,
+    )
+    processes = [fake, service]
+    try:
+        _wait_ready(f"{fake_url}/pinecone/indexes", fake)
+        _wait_ready(f"http://127.0.0.1:{service_port}/health", service)
+    except BaseException:
+        stop_processes(processes)
+        raise
+    return processes, f"http://127.0.0.1:{service_port}"
+
+
+def stop_processes(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# -- measurement -----------------------------------------------------------
+
+def percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = q * (len(ordered) - 1)
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _summary(values) -> dict:
+    return {
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+
+async def scrape_stages(client: httpx.AsyncClient) -> dict:
+    """{stage: {"buckets": {le: cumulative count}, "count": n, "sum": seconds}} from /metrics."""
+    text = (await client.get("/metrics")).text
+    stages = {}
+    for family in text_string_to_metric_families(text):
+        if family.name != "genai_stage_seconds":
+            continue
+        for sample in family.samples:
+            stage = stages.setdefault(sample.labels["stage"], {"buckets": {}, "count": 0, "sum": 0.0})
+            if sample.name.endswith("_bucket"):
+                stage["buckets"][float(sample.labels["le"])] = sample.value
+            elif sample.name.endswith("_count"):
+                stage["count"] = sample.value
+            elif sample.name.endswith("_sum"):
+                stage["sum"] = sample.value
+    return stages
+
+
+def _bucket_quantile(buckets: dict, q: float):
+    """Estimate a quantile from cumulative histogram buckets by linear interpolation."""
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]] if bounds else 0
+    if not total:
+        return None
+    rank = q * total
+    previous_bound, previous_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return previous_bound
+            share = (rank - previous_count) / (count - previous_count) if count > previous_count else 0
+            return previous_bound + (bound - previous_bound) * share
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+
+def stage_delta(before: dict, after: dict, wall: float) -> dict:
+    result = {}
+    for name, end in sorted(after.items()):
+        start = before.get(name, {"buckets": {}, "count": 0, "sum": 0.0})
+        count = end["count"] - start["count"]
+        if count <= 0:
+            continue
+        buckets = {le: value - start["buckets"].get(le, 0) for le, value in end["buckets"].items()}
+        result[name] = {
+            "count": int(count),
+            "per_second": count / wall,
+            "mean": (end["sum"] - start["sum"]) / count,
+            "p50": _bucket_quantile(buckets, 0.50),
+            "p95": _bucket_quantile(buckets, 0.95),
+            "p99": _bucket_quantile(buckets, 0.99),
+        }
+    return result
+
+
+async def _poll_job(client: httpx.AsyncClient, job_id: str, interval: float):
+    while True:
+        job = (await client.get(f"/api/jobs/{job_id}")).json()
+        if job["status"] in TERMINAL_JOB_STATES:
+            return job["status"] == "succeeded"
+        await asyncio.sleep(interval)
+
+
+async def _one_request(client, path, body, kind, poll_interval):
+    """Return (ok, seconds, seconds to first byte or None)."""
+    started = time.perf_counter()
+    first_byte = None
+    if kind == "stream":
+        ok = True
+        async with client.stream("POST", path, json=body) as response:
+            async for line in response.aiter_lines():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                # both the NDJSON and SSE routes report failures in-band
+                if line.startswith('{"error"') or line == "event: error":
+                    ok = False
+            ok = ok and response.status_code == 200
+    elif kind == "job":
+        response = await client.post(path, json=body)
+        ok = response.status_code == 202 and await _poll_job(client, response.json()["job_id"], poll_interval)
+    else:
+        response = await client.post(path, json=body)
+        ok = response.status_code == 200
+    return ok, time.perf_counter() - started, first_byte
+
+
+async def run_route(client, name: str, ctx: dict, args) -> dict:
+    path, body, kind = ROUTES[name]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, first_bytes, errors = [], [], 0
+
+    async def worker(i):
+        nonlocal errors
+        async with semaphore:
+            try:
+                ok, seconds, first_byte = await _one_request(client, path, body(ctx, i), kind, args.poll_interval)
+            except httpx.HTTPError:
+                ok, seconds, first_byte = False, None, None
+        if not ok:
+            errors += 1
+        if seconds is not None:
+            latencies.append(seconds)
+        if first_byte is not None:
+            first_bytes.append(first_byte)
+
+    before = await scrape_stages(client)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.requests)))
+    wall = time.perf_counter() - started
+    after = await scrape_stages(client)
+
+    result = dict(
+        _summary(latencies),
+        path=path,
+        kind=kind,
+        requests=args.requests,
+        errors=errors,
+        wall_seconds=wall,
+        per_second=(args.requests - errors) / wall,
+        stages=stage_delta(before, after, wall),
+    )
+    if first_bytes:
+        result["first_byte"] = _summary(first_bytes)
+    return result
+
+
+# -- reporting -------------------------------------------------------------
+
+def _ms(seconds) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+
+def print_report(results: dict):
+    print(f"\n{'route':<22}{'ok/n':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttfb p50':>10}")
+    for name, r in results.items():
+        ttfb = r.get("first_byte", {}).get("p50")
+        print(f"{name:<22}{r['requests'] - r['errors']:>4}/{r['requests']:<3}{r['per_second']:>8.2f}"
+              f"{_ms(r['p50']):>9}{_ms(r['p95']):>9}{_ms(r['p99']):>9}{_ms(ttfb):>10}")
+    print(f"\n{'route':<22}{'stage':<10}{'count':>7}{'per s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, r in results.items():
+        for stage, s in r["stages"].items():
+            print(f"{name:<22}{stage:<10}{s['count']:>7}{s['per_second']:>8.1f}"
+                  f"{_ms(s['p50']):>9}{_ms(s['p95']):>9}{_ms(s['p99']):>9}")
+
+
+def _change(new, old) -> str:
+    if new is None or not old:
+        return "-"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def print_comparison(results: dict, baseline: dict):
+    print(f"\nvs {baseline['meta'].get('commit', 'baseline')[:12]}")
+    print(f"{'route':<22}{'p50':>8}{'p95':>8}{'req/s':>8}")
+    for name, r in results.items():
+        old = baseline["routes"].get(name)
+        if old is None:
+            continue
+        print(f"{name:<22}{_change(r['p50'], old['p50']):>8}{_change(r['p95'], old['p95']):>8}"
+              f"{_change(r['per_second'], old['per_second']):>8}")
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=GENAI_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args, base_url: str, ctx: dict) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    timeout = httpx.Timeout(args.timeout)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        for name in args.routes:
+            print(f"running {name} ({args.requests} requests, concurrency {args.concurrency})", flush=True)
+            results[name] = await run_route(client, name, ctx, args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated names from ROUTES")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32, help="requests per route")
+    parser.add_argument("--pdf", choices=list(synthetic_pdf.SIZES), default="medium")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--rpm", type=int, default=0, help="GROQ_RPM for the service; 0 disables the budget")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON from an earlier --output run")
+    args = parser.parse_args()
+    args.routes = [name.strip() for name in args.routes.split(",") if name.strip()]
+    unknown = [name for name in args.routes if name not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+
+    work_dir = tempfile.mkdtemp(prefix="genai-bench-")
+    try:
+        ctx = {"pdf": synthetic_pdf.generate(os.path.join(work_dir, "pdfs"), [args.pdf])[args.pdf]}
+        processes, base_url = start_processes(args, work_dir)
+        try:
+            results = asyncio.run(run(args, base_url, ctx))
+        finally:
+            stop_processes(processes)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(results)
+    report = {"meta": {"commit": _commit(), "args": vars(args), "time": time.time()}, "routes": results}
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
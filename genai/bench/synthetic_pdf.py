@@ -0,0 +1,117 @@
+"""
+Deterministic synthetic lecture-note PDFs for benchmarks.
+
+Pages are filled with generated sentences drawn from a fixed vocabulary, so
+every page (and every chunk) has different text and caches behave as they
+would on real documents. The PDF is written by hand with one built-in font,
+so nothing beyond the standard library is needed.
+
+    python bench/synthetic_pdf.py OUT_DIR [--sizes small,medium,large]
+"""
+import argparse
+import os
+import random
+
+SIZES = {"small": 4, "medium": 40, "large": 200}
+
+LINES_PER_PAGE = 46
+CHARS_PER_LINE = 90
+
+_SUBJECTS = [
+    "the binary search tree", "a hash table", "dynamic programming", "the scheduler", "a priority queue",
+    "the garbage collector", "gradient descent", "the cache hierarchy", "a graph traversal", "the compiler",
+    "photosynthesis", "the nervous system", "supply and demand", "the French revolution", "thermodynamics",
+    "a linked list", "the TCP handshake", "matrix multiplication", "the immune response", "plate tectonics",
+]
+_VERBS = [
+    "reduces", "explains", "depends on", "improves", "limits", "balances", "transforms", "predicts",
+    "organises", "stores", "measures", "controls", "separates", "combines", "approximates",
+]
+_OBJECTS = [
+    "the running time", "memory usage", "the final answer", "each intermediate step", "the worst case",
+    "the boundary conditions", "energy transfer", "the overall structure", "the error rate", "key definitions",
+    "the input size", "the order of operations", "long-term behaviour", "the average case", "edge cases",
+]
+_CONNECTIVES = ["Therefore", "In practice", "For example", "However", "As a result", "In summary", "Note that"]
+
+
+def _sentence(rng: random.Random) -> str:
+    sentence = f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}"
+    if rng.random() < 0.35:
+        sentence = f"{rng.choice(_CONNECTIVES)}, {sentence}"
+    if rng.random() < 0.3:
+        sentence += f" when {rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}"
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def page_lines(rng: random.Random, number: int) -> list[str]:
+    lines = [f"Lecture notes, page {number}", ""]
+    line = ""
+    while len(lines) < LINES_PER_PAGE:
+        sentence = _sentence(rng)
+        if len(line) + len(sentence) + 1 > CHARS_PER_LINE:
+            lines.append(line)
+            line = sentence
+        else:
+            line = f"{line} {sentence}" if line else sentence
+    return lines
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: list[list[str]]):
+    """Write a minimal PDF with one Helvetica text block per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        stream = "BT /F1 9 Tf 40 760 Td 15 TL " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate(out_dir: str, sizes=tuple(SIZES), seed: int = 0) -> dict:
+    """Write one PDF per size name into out_dir and return {size: path}."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for size in sizes:
+        rng = random.Random(f"{seed}-{size}")
+        pages = [page_lines(rng, n + 1) for n in range(SIZES[size])]
+        paths[size] = os.path.join(out_dir, f"{size}.pdf")
+        write_pdf(paths[size], pages)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("out_dir")
+    parser.add_argument("--sizes", default=",".join(SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for size, path in generate(args.out_dir, args.sizes.split(","), args.seed).items():
+        print(f"{size:<8} {SIZES[size]:>4} pages  {os.path.getsize(path):>9} bytes  {path}")
+
+
+if __name__ == "__main__":
+    main()
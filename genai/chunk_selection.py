@@ -0,0 +1,99 @@
+import numpy as np
+
+KMEANS_ITERATIONS = 25
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _squared_distances(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # ||p||^2 - 2 p.c + ||c||^2 for every pair at once, shape (n, k)
+    d = (
+        np.einsum("ij,ij->i", points, points)[:, None]
+        - 2.0 * points @ centroids.T
+        + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    )
+    return np.maximum(d, 0.0)
+
+
+def kmeans(points: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0):
+    """
+    Lloyd's k-means with k-means++ seeding.
+
+    Seeded so the same document always yields the same clusters.
+
+    Returns:
+        (centroids of shape (k, dim), label per point)
+    """
+    n = len(points)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+
+    centroids = np.empty((k, points.shape[1]), dtype=points.dtype)
+    centroids[0] = points[rng.integers(n)]
+    closest = _squared_distances(points, centroids[:1])[:, 0]
+    for c in range(1, k):
+        total = closest.sum()
+        pick = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centroids[c] = points[pick]
+        closest = np.minimum(closest, _squared_distances(points, centroids[c:c + 1])[:, 0])
+
+    labels = np.zeros(n, dtype=np.int64)
+    for i in range(iterations):
+        new_labels = np.argmin(_squared_distances(points, centroids), axis=1)
+        if i and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids, labels
+
+
+def select_representative(chunks, vectors, token_budget: int, chunk_tokens: int) -> list:
+    """
+    Pick chunks that cover the whole document within a token budget.
+
+    The chunk embeddings are clustered into about token_budget / chunk_tokens
+    groups. Clusters are visited largest first, taking the chunk closest to
+    each centroid, then the next closest, and so on until nothing else fits.
+
+    Args:
+        chunks: chunker.Chunk objects in document order
+        vectors: One embedding row per chunk
+        token_budget: Total estimated tokens the selection may use
+        chunk_tokens: Token size the chunks were cut to
+
+    Returns:
+        The selected chunks, in document order
+    """
+    if not len(chunks):
+        return []
+    points = _unit_rows(vectors)
+    k = max(1, token_budget // max(1, chunk_tokens))
+    centroids, labels = kmeans(points, k)
+    distances = _squared_distances(points, centroids)
+
+    clusters = []
+    for c in range(len(centroids)):
+        members = np.flatnonzero(labels == c)
+        if len(members):
+            clusters.append(members[np.argsort(distances[members, c])].tolist())
+    clusters.sort(key=len, reverse=True)
+
+    selected = []
+    used = 0
+    depth = 0
+    while any(depth < len(members) for members in clusters):
+        for members in clusters:
+            if depth < len(members) and used + chunks[members[depth]].tokens <= token_budget:
+                selected.append(members[depth])
+                used += chunks[members[depth]].tokens
+        depth += 1
+    return [chunks[i] for i in sorted(selected)]
@@ -0,0 +1,176 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "300"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+# Words are counted in pieces of up to four characters, which tracks BPE
+# token counts closely enough for budgeting without loading a tokenizer.
+_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+# the end of one sentence: its punctuation, then the gap before the next
+_SENTENCE_END_RE = re.compile(r"[.!?](\s+)(?=[\"'(\[A-Z0-9])")
+
+# ASCII byte -> b"w" (word), b" " (space) or b"p" (punctuation), so ASCII
+# text can be counted with bytes methods instead of the regex.
+_ASCII_KINDS = bytes(
+    ord("w") if re.match(r"\w", chr(b)) else ord(" ") if chr(b).isspace() else ord("p")
+    for b in range(256)
+)
+
+# Close a chunk early at a paragraph break once it is this full.
+_PARAGRAPH_FILL = 0.75
+
+
+def estimate_tokens(text: str) -> int:
+    if not text.isascii():
+        return len(_TOKEN_RE.findall(text))
+    # same count as _TOKEN_RE: a run of n word characters is ceil(n / 4)
+    # tokens, every punctuation character one
+    kinds = text.encode("ascii").translate(_ASCII_KINDS)
+    remainders = kinds.replace(b"wwww", b"").replace(b"www", b"w").replace(b"ww", b"w")
+    return kinds.count(b"wwww") + remainders.count(b"w") + kinds.count(b"p")
+
+
+def _sentences(paragraph: str) -> Iterator[str]:
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(paragraph):
+        yield paragraph[start:match.start(1)]
+        start = match.end(1)
+    yield paragraph[start:]
+
+
+@dataclass
+class Chunk:
+    text: str
+    index: int
+    tokens: int
+    pages: list[int] = field(default_factory=list)
+
+    @property
+    def metadata(self) -> dict:
+        # flat numbers only: Pinecone metadata does not allow lists of ints
+        return {
+            "chunk": self.index,
+            "page_start": self.pages[0],
+            "page_end": self.pages[-1],
+            "tokens": self.tokens,
+        }
+
+
+@dataclass
+class _Unit:
+    text: str
+    page: int
+    tokens: int
+    starts_paragraph: bool
+
+
+def _split_long(sentence: str, max_tokens: int):
+    """Split a sentence longer than the budget on word boundaries."""
+    piece = []
+    piece_tokens = 0
+    for word in sentence.split(" "):
+        word_tokens = estimate_tokens(word)
+        if piece and piece_tokens + word_tokens > max_tokens:
+            yield " ".join(piece), piece_tokens
+            piece, piece_tokens = [], 0
+        piece.append(word)
+        piece_tokens += word_tokens
+    if piece:
+        yield " ".join(piece), piece_tokens
+
+
+def _units(page_text: str, page: int, max_tokens: int) -> Iterator[_Unit]:
+    for paragraph in _PARAGRAPH_RE.split(page_text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        first = True
+        for sentence in _sentences(paragraph):
+            # counted once; a chunk's size is the sum of its units' counts
+            tokens = estimate_tokens(sentence)
+            pieces = [(sentence, tokens)] if tokens <= max_tokens else _split_long(sentence, max_tokens)
+            for text, piece_tokens in pieces:
+                yield _Unit(text, page, piece_tokens, first)
+                first = False
+
+
+def _join(units: list[_Unit]) -> str:
+    parts = []
+    for i, unit in enumerate(units):
+        if i:
+            parts.append("\n\n" if unit.starts_paragraph else " ")
+        parts.append(unit.text)
+    return "".join(parts)
+
+
+def iter_chunks(
+    pages: Iterable[str],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> Iterator[Chunk]:
+    """
+    Chunk page texts into pieces of at most ~max_tokens estimated tokens.
+
+    Chunks end on sentence boundaries, preferring paragraph breaks, and start
+    with up to overlap_tokens of trailing sentences from the previous chunk.
+    Pages are consumed lazily, so the document never has to be joined into
+    one string.
+
+    Args:
+        pages: Text of each page, in order (page numbers start at 1)
+        max_tokens: Token budget per chunk
+        overlap_tokens: Tokens of context repeated from the previous chunk
+
+    Yields:
+        Chunk objects with the pages each one spans
+    """
+    buffer: list[_Unit] = []
+    buffer_tokens = 0
+    fresh = False  # buffer holds more than the carried-over overlap
+    index = 0
+
+    def emit():
+        nonlocal index
+        chunk = Chunk(
+            text=_join(buffer),
+            index=index,
+            tokens=buffer_tokens,
+            pages=sorted({unit.page for unit in buffer}),
+        )
+        index += 1
+        return chunk
+
+    def carry_overlap():
+        kept = []
+        kept_tokens = 0
+        for unit in reversed(buffer):
+            if kept_tokens + unit.tokens > overlap_tokens:
+                break
+            kept.append(unit)
+            kept_tokens += unit.tokens
+        kept.reverse()
+        return kept, kept_tokens
+
+    for page_number, page_text in enumerate(pages, start=1):
+        if not page_text:
+            continue
+        for unit in _units(page_text, page_number, max_tokens):
+            over_budget = buffer_tokens + unit.tokens > max_tokens
+            paragraph_break = unit.starts_paragraph and buffer_tokens >= max_tokens * _PARAGRAPH_FILL
+            if fresh and (over_budget or paragraph_break):
+                yield emit()
+                buffer, buffer_tokens = carry_overlap()
+                fresh = False
+                # the overlap must still leave room for the new unit
+                while buffer and buffer_tokens + unit.tokens > max_tokens:
+                    buffer_tokens -= buffer.pop(0).tokens
+            buffer.append(unit)
+            buffer_tokens += unit.tokens
+            fresh = True
+
+    if fresh:
+        yield emit()
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import admission
+from chunker import estimate_tokens
+from disk_cache import CACHE_ROOT
+from llm import MODELS, gemini_generate, gemini_generate_async
+
+# "memory" (default) or "disk"; disk keeps sessions in SQLite so a worker's
+# memory stays flat however many conversations are open.
+CHAT_SESSION_STORE = os.getenv("CHAT_SESSION_STORE", "memory").lower()
+CHAT_SESSIONS_PATH = os.getenv("CHAT_SESSIONS_PATH", os.path.join(CACHE_ROOT, "chat_sessions.sqlite3"))
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+CHAT_SESSION_IDLE_SECONDS = float(os.getenv("CHAT_SESSION_IDLE_SECONDS", str(2 * 3600)))
+# Summary plus recent turns; above this the oldest turns are folded into the summary.
+CHAT_SESSION_TOKEN_CAP = int(os.getenv("CHAT_SESSION_TOKEN_CAP", "2000"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+SUMMARY_MODEL = MODELS["chat_summary"]
+
+
+def _new_state() -> dict:
+    return {"summary": "", "turns": [], "next_turn": 0}
+
+
+class MemorySessionStore:
+    """Sessions in an LRU dict, bounded by count and idle time."""
+
+    def __init__(self, max_sessions: int = CHAT_MAX_SESSIONS, idle_seconds: float = CHAT_SESSION_IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _evict(self, now: float):
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - state["updated_at"] < self.idle_seconds:
+                break
+            del self._sessions[session_id]
+            self.evicted += 1
+
+    def load(self, session_id: str):
+        with self._lock:
+            self._evict(time.time())
+            state = self._sessions.get(session_id)
+            return json.loads(json.dumps(state)) if state else None
+
+    def update(self, session_id: str, fn):
+        """Apply fn(state) -> state atomically; a missing session starts empty."""
+        with self._lock:
+            now = time.time()
+            state = self._sessions.pop(session_id, None)
+            if state is None or now - state["updated_at"] >= self.idle_seconds:
+                state = _new_state()
+            state = fn(state)
+            state["updated_at"] = now
+            self._sessions[session_id] = state
+            self._evict(now)
+            return state
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "evicted": self.evicted}
+
+
+class SqliteSessionStore:
+    """Sessions in a SQLite file, evicted by idle time and then oldest-first past max_sessions."""
+
+    def __init__(self, path: str = CHAT_SESSIONS_PATH, max_sessions: int = CHAT_MAX_SESSIONS,
+                 idle_seconds: float = CHAT_SESSION_IDLE_SECONDS):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._local = threading.local()
+        self.evicted = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_by_age ON sessions (updated_at)")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str):
+        row = self._connect().execute(
+            "SELECT state, updated_at FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None or time.time() - row[1] >= self.idle_seconds:
+            return None
+        return json.loads(row[0])
+
+    def update(self, session_id: str, fn):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT state, updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            fresh = row is not None and now - row[1] < self.idle_seconds
+            state = fn(json.loads(row[0]) if fresh else _new_state())
+            state["updated_at"] = now
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, state, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(state), now),
+            )
+            evicted = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.idle_seconds,)).rowcount
+            evicted += conn.execute(
+                "DELETE FROM sessions WHERE id IN "
+                "(SELECT id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.evicted += evicted
+        return state
+
+    def stats(self) -> dict:
+        count = self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"backend": "disk", "sessions": count, "evicted": self.evicted}
+
+
+def create_store():
+    if CHAT_SESSION_STORE == "disk":
+        return SqliteSessionStore()
+    if CHAT_SESSION_STORE == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"Unknown CHAT_SESSION_STORE '{CHAT_SESSION_STORE}' (expected 'memory' or 'disk')")
+
+
+def _turn_tokens(turn) -> int:
+    return estimate_tokens(turn[1]) + estimate_tokens(turn[2])
+
+
+def _state_tokens(state: dict) -> int:
+    return estimate_tokens(state["summary"]) + sum(_turn_tokens(turn) for turn in state["turns"])
+
+
+def _clip(text: str, tokens: int) -> str:
+    # estimate_tokens counts roughly four characters per token
+    limit = tokens * 4
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _summary_prompt(summary: str, turns) -> str:
+    transcript = "\n".join(f"User: {prompt}\nAssistant: {answer}" for _, prompt, answer in turns)
+    previous = f"Summary so far:\n{summary}\n\n" if summary else ""
+    return (
+        "Condense this study conversation into a short summary that keeps the topics, "
+        "facts and open questions a tutor would need to answer follow-up questions. "
+        f"Use at most {CHAT_SUMMARY_TOKENS * 3 // 4} words and plain sentences.\n\n"
+        f"{previous}New turns:\n{transcript}\n\nSummary:"
+    )
+
+
+def _fallback_summary(summary: str, turns) -> str:
+    # without the model, keep the newest questions; they matter most for follow-ups
+    lines = [summary] if summary else []
+    lines += [f"The student asked: {prompt}" for _, prompt, _ in turns]
+    text = "\n".join(lines)
+    limit = CHAT_SUMMARY_TOKENS * 4
+    return text[-limit:]
+
+
+class ConversationMemory:
+    """
+    Per-session chat memory with a token cap.
+
+    Each session keeps a rolling summary and the most recent turns. When the
+    two together exceed token_cap, the oldest turns are folded into the
+    summary until the recent turns fit in half the cap, so the prompt stays
+    bounded however long the conversation runs.
+    """
+
+    def __init__(self, store=None, token_cap: int = CHAT_SESSION_TOKEN_CAP):
+        self.store = store if store is not None else create_store()
+        self.token_cap = token_cap
+        self.compactions = 0
+        self.summary_failures = 0
+
+    def history(self, session_id: str) -> str:
+        """The conversation so far as prompt text, or "" for a new session."""
+        state = self.store.load(session_id) if session_id else None
+        if not state or not (state["summary"] or state["turns"]):
+            return ""
+        parts = []
+        if state["summary"]:
+            parts.append(f"Summary of earlier conversation: {state['summary']}")
+        parts += [f"Student: {prompt}\nMentor: {answer}" for _, prompt, answer in state["turns"]]
+        return "\n\n".join(parts)
+
+    def record(self, session_id: str, prompt: str, answer: str) -> bool:
+        """Append a turn; returns True when the session should be compacted."""
+        turn_tokens = self.token_cap // 4
+
+        def add(state):
+            turn = [state["next_turn"], _clip(prompt, turn_tokens), _clip(answer, turn_tokens)]
+            state["turns"].append(turn)
+            state["next_turn"] += 1
+            return state
+
+        state = self.store.update(session_id, add)
+        return _state_tokens(state) > self.token_cap
+
+    def _split(self, state: dict):
+        """Turns to fold into the summary, oldest first; the newest turn is always kept."""
+        turns = state["turns"]
+        keep_from = len(turns) - 1
+        kept = _turn_tokens(turns[-1])
+        for i in range(len(turns) - 2, -1, -1):
+            kept += _turn_tokens(turns[i])
+            if kept > self.token_cap // 2:
+                break
+            keep_from = i
+        return turns[:keep_from]
+
+    def _apply(self, session_id: str, summary_before: str, folded, summary: str):
+        last_folded = folded[-1][0]
+
+        def replace(state):
+            # another compaction got there first; its summary already covers these turns
+            if state["summary"] != summary_before:
+                return state
+            state["summary"] = summary
+            state["turns"] = [turn for turn in state["turns"] if turn[0] > last_folded]
+            return state
+
+        self.store.update(session_id, replace)
+        self.compactions += 1
+
+    def _plan(self, session_id: str):
+        state = self.store.load(session_id)
+        if not state or _state_tokens(state) <= self.token_cap:
+            return None
+        folded = self._split(state)
+        return (state["summary"], folded) if folded else None
+
+    def compact(self, session_id: str):
+        plan = self._plan(session_id)
+        if plan is None:
+            return
+        summary_before, folded = plan
+        try:
+            with admission.priority(admission.BATCH):
+                summary = gemini_generate(_summary_prompt(summary_before, folded), SUMMARY_MODEL).strip()
+        except Exception as e:
+            print(f"Conversation summary failed, keeping recent questions only: {e}")
+            self.summary_failures += 1
+            summary = _fallback_summary(summary_before, folded)
+        self._apply(session_id, summary_before, folded, _clip(summary, CHAT_SUMMARY_TOKENS))
+
+    async def compact_async(self, session_id: str):
+        # the disk store takes a SQLite write lock; keep it off the event loop
+        plan = await asyncio.to_thread(self._plan, session_id)
+        if plan is None:
+            return
+        summary_before, folded = plan
+        try:
+            with admission.priority(admission.BATCH):
+                summary = (await gemini_generate_async(_summary_prompt(summary_before, folded), SUMMARY_MODEL)).strip()
+        except Exception as e:
+            print(f"Conversation summary failed, keeping recent questions only: {e}")
+            self.summary_failures += 1
+            summary = _fallback_summary(summary_before, folded)
+        await asyncio.to_thread(self._apply, session_id, summary_before, folded, _clip(summary, CHAT_SUMMARY_TOKENS))
+
+    def stats(self) -> dict:
+        return dict(self.store.stats(), compactions=self.compactions, summary_failures=self.summary_failures)
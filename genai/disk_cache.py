@@ -0,0 +1,155 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+
+CACHE_ROOT = os.getenv(
+    "GENAI_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+
+
+class DiskCache:
+    """
+    Small size-bounded LRU cache of byte blobs stored as files in one directory.
+
+    Recency is tracked through file mtimes, so the cache survives restarts and
+    can be shared by several worker processes on the same host.
+
+    `companions` are suffixes of extra files kept next to an entry under the
+    same key (e.g. ".meta.json"); they are removed together with it.
+    """
+
+    # leases are hard links to entries, so their mtime follows the entry's
+    LEASE_MAX_AGE = 24 * 3600
+
+    def __init__(self, name: str, max_bytes: int, suffix: str = ".bin", companions=()):
+        self.directory = os.path.join(CACHE_ROOT, name)
+        self.lease_directory = os.path.join(self.directory, "leases")
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.companions = tuple(companions)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key: str):
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        self.touch(key)
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def touch(self, key: str):
+        try:
+            os.utime(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def set(self, key: str, data: bytes):
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def link(self, src_path: str) -> str:
+        """
+        Hard-link a file to a new path in the lease directory and return it.
+
+        The caller reads from the link and removes it when done; evicting the
+        original in the meantime does not affect it.
+        """
+        os.makedirs(self.lease_directory, exist_ok=True)
+        path = os.path.join(self.lease_directory, uuid.uuid4().hex + self.suffix)
+        try:
+            os.link(src_path, path)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # filesystems without hard links get a copy
+            shutil.copyfile(src_path, path)
+        return path
+
+    def lease(self, key: str) -> str:
+        """A private link to an entry (see link); raises FileNotFoundError once it is evicted."""
+        path = self.link(self.path_for(key))
+        self.touch(key)
+        return path
+
+    def store_file(self, key: str, src_path: str):
+        """Move an already written file (ideally in the cache directory) into the cache."""
+        os.replace(src_path, self.path_for(key))
+        self.evict()
+
+    def _remove(self, path: str):
+        base = path[:-len(self.suffix)]
+        for file_path in (path, *(base + companion for companion in self.companions)):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+    def delete(self, key: str):
+        self._remove(self.path_for(key))
+
+    def _prune_leases(self):
+        # only links left behind by a crashed reader get this old
+        cutoff = time.time() - self.LEASE_MAX_AGE
+        try:
+            with os.scandir(self.lease_directory) as it:
+                for entry in it:
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Remove least recently used entries until the directory fits in max_bytes."""
+        self._prune_leases()
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,44 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+from disk_cache import CACHE_ROOT
+
+DOCUMENT_REGISTRY_PATH = os.getenv(
+    "DOCUMENT_REGISTRY_PATH", os.path.join(CACHE_ROOT, "document_registry.json")
+)
+
+_lock = threading.Lock()
+
+
+def _key(store: str, namespace: str, document_id: str) -> str:
+    return f"{store}|{namespace or ''}|{document_id}"
+
+
+def _read() -> dict:
+    try:
+        with open(DOCUMENT_REGISTRY_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def get(store: str, namespace: str, document_id: str):
+    """Return the record of an indexed document, or None if it was never indexed."""
+    with _lock:
+        return _read().get(_key(store, namespace, document_id))
+
+
+def put(store: str, namespace: str, document_id: str, record: dict):
+    os.makedirs(os.path.dirname(DOCUMENT_REGISTRY_PATH), exist_ok=True)
+    with _lock, open(DOCUMENT_REGISTRY_PATH + ".lock", "w") as lock_file:
+        # other workers may have written since we last read; merge under the lock
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        data = _read()
+        data[_key(store, namespace, document_id)] = dict(record, indexed_at=time.time())
+        tmp_path = f"{DOCUMENT_REGISTRY_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, DOCUMENT_REGISTRY_PATH)
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from io import BytesIO
+
+from disk_cache import DiskCache
+
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+# Files larger than this are spooled to a temp file instead of being held in RAM.
+DOWNLOAD_SPOOL_BYTES = int(os.getenv("DOWNLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "5"))
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "30"))
+CHUNK_SIZE = 64 * 1024
+
+_cache = DiskCache("downloads", max_bytes=DOWNLOAD_CACHE_MAX_BYTES, suffix=".pdf", companions=(".meta.json",))
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"revalidated": 0, "downloaded": 0}
+
+
+class DownloadTooLarge(ValueError):
+    pass
+
+
+class PdfFile:
+    """
+    A PDF ready for extraction: either bytes in memory or a file on disk.
+
+    Use as a context manager so spooled temp files and cache links are removed afterwards.
+    """
+
+    def __init__(self, sha256: str, size: int, path: str = None, data: bytes = None, temporary: bool = False):
+        self.sha256 = sha256
+        self.size = size
+        self.path = path
+        self.data = data
+        self._temporary = temporary
+
+    @classmethod
+    def from_path(cls, path: str) -> "PdfFile":
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(block)
+                size += len(block)
+        return cls(digest.hexdigest(), size, path=path)
+
+    @property
+    def source(self):
+        """Path or raw bytes, whichever is cheaper to hand to pdfplumber or a worker."""
+        return self.path if self.path is not None else self.data
+
+    def open(self):
+        if self.path is not None:
+            return open(self.path, "rb")
+        return BytesIO(self.data)
+
+    def close(self):
+        if self._temporary and self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests is only imported once something is actually downloaded
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _meta_path(key: str) -> str:
+    return os.path.join(_cache.directory, key + ".meta.json")
+
+
+def _load_meta(key: str):
+    if not os.path.exists(_cache.path_for(key)):
+        return None
+    try:
+        with open(_meta_path(key)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_meta(key: str, meta: dict):
+    tmp_path = f"{_meta_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(key))
+
+
+def _stream_body(response, spool_bytes: int, spool_dir: str):
+    """
+    Read the body in chunks, hashing as we go and enforcing DOWNLOAD_MAX_BYTES.
+
+    Returns (sha256, size, path, data); exactly one of path/data is set.
+    """
+    declared = response.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > DOWNLOAD_MAX_BYTES:
+        raise DownloadTooLarge(f"PDF is {declared} bytes, limit is {DOWNLOAD_MAX_BYTES}")
+
+    digest = hashlib.sha256()
+    size = 0
+    buffer = BytesIO()
+    spool = None
+    try:
+        for block in response.iter_content(chunk_size=CHUNK_SIZE):
+            if not block:
+                continue
+            size += len(block)
+            if size > DOWNLOAD_MAX_BYTES:
+                raise DownloadTooLarge(f"PDF exceeds the {DOWNLOAD_MAX_BYTES} byte limit")
+            digest.update(block)
+            if spool is None and buffer.tell() + len(block) > spool_bytes:
+                spool = tempfile.NamedTemporaryFile(dir=spool_dir, suffix=".part", delete=False)
+                spool.write(buffer.getvalue())
+                buffer = None
+            if spool is not None:
+                spool.write(block)
+            else:
+                buffer.write(block)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        raise
+
+    if spool is not None:
+        spool.close()
+        return digest.hexdigest(), size, spool.name, None
+    return digest.hexdigest(), size, None, buffer.getvalue()
+
+
+def fetch_pdf(url: str) -> PdfFile:
+    """
+    Download a PDF over the shared keep-alive session.
+
+    Responses carrying an ETag or Last-Modified header are kept in a bounded
+    on-disk cache and revalidated with a conditional GET next time, so an
+    unchanged file is not transferred again. Cached files are handed out as
+    private hard links, so eviction cannot remove them mid-read.
+
+    Raises:
+        DownloadTooLarge: If the body exceeds DOWNLOAD_MAX_BYTES
+        ValueError: If the body is empty
+    """
+    key = _url_key(url)
+    meta = _load_meta(key)
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    session = _get_session()
+    with session.get(
+        url,
+        headers=headers,
+        stream=True,
+        timeout=(DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT),
+    ) as response:
+        if response.status_code == 304 and meta:
+            try:
+                path = _cache.lease(key)
+            except FileNotFoundError:
+                # evicted since we read the metadata; fetch it unconditionally
+                return fetch_pdf(url)
+            with _stats_lock:
+                _stats["revalidated"] += 1
+            return PdfFile(meta["sha256"], meta["size"], path=path, temporary=True)
+        response.raise_for_status()
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        cacheable = bool(etag or last_modified)
+        if cacheable:
+            # Write straight into the cache directory so storing is a rename.
+            sha256, size, path, data = _stream_body(response, 0, _cache.directory)
+        else:
+            sha256, size, path, data = _stream_body(response, DOWNLOAD_SPOOL_BYTES, None)
+
+    if size == 0:
+        raise ValueError(f"Downloaded PDF is empty: {url}")
+
+    with _stats_lock:
+        _stats["downloaded"] += 1
+
+    if cacheable:
+        # link before storing: eviction may remove the entry before we read it
+        reading = _cache.link(path)
+        _cache.store_file(key, path)
+        _save_meta(key, {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": sha256,
+            "size": size,
+        })
+        return PdfFile(sha256, size, path=reading, temporary=True)
+    return PdfFile(sha256, size, path=path, data=data, temporary=path is not None)
+
+
+def download_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
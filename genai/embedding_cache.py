@@ -0,0 +1,215 @@
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import threading
+import unicodedata
+
+import numpy as np
+
+from disk_cache import CACHE_ROOT
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class _Generation:
+    """
+    One generation of the cache: a directory of append-only files.
+
+    Vectors are appended as raw float32 rows to `vectors.f32` and read back
+    through a memory map; `keys.txt` holds one "<text hash> <row>" line per
+    vector. Both files only ever grow, which keeps writes cheap and lets other
+    worker processes pick up new rows by re-reading.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.keys_path = os.path.join(directory, "keys.txt")
+        self.dim_path = os.path.join(directory, "dim")
+        self._index = {}
+        self._keys_size = 0
+        self._dim = None
+        self._matrix = None
+
+    def refresh(self):
+        """Pick up rows appended since the last read (possibly by another process)."""
+        try:
+            size = os.path.getsize(self.keys_path)
+        except FileNotFoundError:
+            return
+        if size == self._keys_size:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_size)
+            tail = f.read(size - self._keys_size)
+        # ignore a partially written last line; it is picked up next time
+        complete = tail[:tail.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            key, row = line.decode("ascii").split()
+            self._index.setdefault(key, int(row))
+        self._keys_size += len(complete)
+        self._matrix = None
+
+    def _read_dim(self):
+        try:
+            with open(self.dim_path) as f:
+                return int(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _rows(self) -> np.ndarray:
+        if self._matrix is None and self._index:
+            self._dim = self._dim or self._read_dim()
+            row_count = os.path.getsize(self.vectors_path) // 4 // self._dim
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(row_count, self._dim)
+            )
+        return self._matrix
+
+    def get(self, key: str):
+        row = self._index.get(key)
+        return None if row is None else np.array(self._rows()[row])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def size_bytes(self) -> int:
+        try:
+            return os.path.getsize(self.vectors_path)
+        except FileNotFoundError:
+            return 0
+
+    def append(self, keys, vectors: np.ndarray):
+        """Append rows; the caller holds the cache's file lock."""
+        os.makedirs(self.directory, exist_ok=True)
+        dim = vectors.shape[1]
+        if self._read_dim() is None:
+            with open(self.dim_path, "w") as f:
+                f.write(str(dim))
+        # Vectors first, keys second, with explicit row numbers: a key line
+        # only ever points at a fully written row, even after a crash.
+        row_bytes = 4 * dim
+        with open(self.vectors_path, "ab") as f:
+            # drop a torn row left behind by a crashed writer
+            f.truncate(f.tell() - f.tell() % row_bytes)
+            first_row = f.tell() // row_bytes
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.keys_path, "ab") as f:
+            f.write("".join(
+                f"{k} {first_row + i}\n" for i, k in enumerate(keys)
+            ).encode("ascii"))
+        self._dim = dim
+        self.refresh()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache for one model, bounded by max_bytes.
+
+    Rows are written to the newest of two generations (numbered
+    subdirectories). Once it holds half of max_bytes, the older generation is
+    deleted and a new one started; hits in the older generation are copied
+    forward, so vectors that are still used survive the rotation.
+    """
+
+    def __init__(self, model: str, max_bytes: int = EMBED_CACHE_MAX_BYTES):
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self.directory = os.path.join(CACHE_ROOT, "embeddings", safe_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock_path = os.path.join(self.directory, ".lock")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+        self._lock = threading.Lock()
+        self._generations = {}
+
+    def _sync(self) -> list:
+        """The live generations, newest first, refreshed from disk."""
+        names = sorted((int(name) for name in os.listdir(self.directory) if name.isdigit()), reverse=True)[:2]
+        self._generations = {
+            name: self._generations[name] if name in self._generations
+            else _Generation(os.path.join(self.directory, str(name)))
+            for name in names
+        }
+        generations = [self._generations[name] for name in names]
+        for generation in generations:
+            generation.refresh()
+        return generations
+
+    def lookup(self, keys):
+        """Return (found, missing): found maps position -> vector, missing lists positions."""
+        found = {}
+        missing = []
+        promoted = {}
+        with self._lock:
+            generations = self._sync()
+            for i, key in enumerate(keys):
+                for age, generation in enumerate(generations):
+                    try:
+                        vector = generation.get(key)
+                    except FileNotFoundError:
+                        # rotated away by another worker since the refresh
+                        continue
+                    if vector is not None:
+                        found[i] = vector
+                        if age:
+                            promoted[key] = vector
+                        break
+                else:
+                    missing.append(i)
+            self.hits += len(found)
+            self.misses += len(missing)
+        if promoted:
+            self.add(list(promoted), np.stack(list(promoted.values())))
+        return found, missing
+
+    def add(self, keys, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock, open(self.lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            generations = self._sync()
+            if not generations or generations[0].size_bytes() >= self.max_bytes // 2:
+                generations = self._rotate(generations)
+            current = generations[0]
+            new = {k: v for k, v in zip(keys, vectors) if k not in current}
+            if new:
+                current.append(list(new), np.stack(list(new.values())))
+
+    def _rotate(self, generations: list) -> list:
+        newest = int(os.path.basename(generations[0].directory)) if generations else 0
+        os.makedirs(os.path.join(self.directory, str(newest + 1)))
+        for generation in generations[1:]:
+            shutil.rmtree(generation.directory, ignore_errors=True)
+        if generations:
+            self.rotations += 1
+        return self._sync()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            entries = sum(len(g) for g in self._generations.values())
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "rotations": self.rotations,
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import os
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import numpy as np
+
+import metrics
+from embedding_cache import EmbeddingCache, text_key
+from llm import MODELS, estimate_request_tokens, gemini_client, with_retries, with_retries_async
+
+EMBED_MODEL = MODELS["embedding"]
+
+# Gemini accepts up to 100 contents per embed_content request.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "4"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", "0.5"))
+
+_cache = EmbeddingCache(EMBED_MODEL)
+metrics.register_cache("embeddings", _cache.stats)
+
+
+def _batches(texts, batch_size: int):
+    return [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+
+def _to_matrix(response, expected: int) -> np.ndarray:
+    rows = [e.values for e in response.embeddings]
+    if len(rows) != expected:
+        raise ValueError(f"Expected {expected} embeddings, got {len(rows)}")
+    return np.asarray(rows, dtype=np.float32)
+
+
+def _embed_batch(batch, keys) -> np.ndarray:
+    client = gemini_client()
+    resp = with_retries(
+        lambda: client.models.embed_content(model=EMBED_MODEL, contents=batch),
+        max_retries=EMBED_MAX_RETRIES,
+        backoff_seconds=EMBED_BACKOFF_SECONDS,
+        provider="gemini",
+        tokens=estimate_request_tokens(batch, completion_tokens=0),
+    )
+    vectors = _to_matrix(resp, len(batch))
+    # cached per batch, so a later failing batch does not cost this one
+    _cache.add(keys, vectors)
+    return vectors
+
+
+async def _embed_batch_async(batch, keys, semaphore: asyncio.Semaphore) -> np.ndarray:
+    client = gemini_client()
+    async with semaphore:
+        resp = await with_retries_async(
+            lambda: client.aio.models.embed_content(model=EMBED_MODEL, contents=batch),
+            max_retries=EMBED_MAX_RETRIES,
+            backoff_seconds=EMBED_BACKOFF_SECONDS,
+            provider="gemini",
+            tokens=estimate_request_tokens(batch, completion_tokens=0),
+        )
+    vectors = _to_matrix(resp, len(batch))
+    # the cache takes a file lock and touches disk, so keep it off the event loop
+    await asyncio.to_thread(_cache.add, keys, vectors)
+    return vectors
+
+
+def _stack(parts) -> np.ndarray:
+    # one contiguous (n, dim) float32 block, in input order
+    return np.ascontiguousarray(np.vstack(parts), dtype=np.float32)
+
+
+def _embed_uncached(texts, keys) -> np.ndarray:
+    batches = list(zip(_batches(texts, EMBED_BATCH_SIZE), _batches(keys, EMBED_BATCH_SIZE)))
+    if len(batches) == 1:
+        return _stack([_embed_batch(*batches[0])])
+    executor = ThreadPoolExecutor(max_workers=min(EMBED_CONCURRENCY, len(batches)))
+    try:
+        futures = [executor.submit(_embed_batch, batch, batch_keys) for batch, batch_keys in batches]
+        wait(futures, return_when=FIRST_EXCEPTION)
+        return _stack([future.result() for future in futures])
+    finally:
+        # after a batch fails for good, the ones not yet started are dropped
+        executor.shutdown(cancel_futures=True)
+
+
+async def _embed_uncached_async(texts, keys) -> np.ndarray:
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_embed_batch_async(batch, batch_keys, semaphore))
+        for batch, batch_keys in zip(_batches(texts, EMBED_BATCH_SIZE), _batches(keys, EMBED_BATCH_SIZE))
+    ]
+    try:
+        return _stack(await asyncio.gather(*tasks))
+    finally:
+        # a batch that failed for good stops the rest; finished ones are already cached
+        for task in tasks:
+            task.cancel()
+
+
+def _merge(count: int, found: dict, missing: list, fresh) -> np.ndarray:
+    dim = fresh.shape[1] if fresh is not None else len(next(iter(found.values())))
+    out = np.empty((count, dim), dtype=np.float32)
+    for i, vec in found.items():
+        out[i] = vec
+    if fresh is not None:
+        out[missing] = fresh
+    return out
+
+
+def embed_texts(texts) -> np.ndarray:
+    """
+    Embed texts with Gemini, skipping any text already in the embedding cache.
+
+    Uncached texts go out in batches sent concurrently. Each batch is retried
+    on its own with jittered exponential backoff, so one failing batch does
+    not redo the others.
+
+    Returns:
+        float32 matrix of shape (len(texts), dim)
+    """
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    with metrics.span("embed"):
+        keys = [text_key(t) for t in texts]
+        found, missing = _cache.lookup(keys)
+        fresh = None
+        if missing:
+            gemini_client()  # fail before batching if Gemini is not configured
+            fresh = _embed_uncached([texts[i] for i in missing], [keys[i] for i in missing])
+        return _merge(len(texts), found, missing, fresh)
+
+
+async def embed_texts_async(texts) -> np.ndarray:
+    """Async variant of embed_texts; at most EMBED_CONCURRENCY batches are in flight."""
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    with metrics.span("embed"):
+        keys = [text_key(t) for t in texts]
+        # the cache takes a file lock and touches disk, so keep it off the event loop
+        found, missing = await asyncio.to_thread(_cache.lookup, keys)
+        fresh = None
+        if missing:
+            gemini_client()  # fail before batching if Gemini is not configured
+            fresh = await _embed_uncached_async([texts[i] for i in missing], [keys[i] for i in missing])
+        return _merge(len(texts), found, missing, fresh)
+
+
+def embed_query(text: str) -> np.ndarray:
+    return embed_texts([text])[0]
+
+
+async def embed_query_async(text: str) -> np.ndarray:
+    return (await embed_texts_async([text]))[0]
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
@@ -1,56 +1,19 @@
-import pdfplumber
-from openai import OpenAI
+import asyncio
 import json
+import logging
 import os
-from dotenv import load_dotenv
 import re
-import requests
-from io import BytesIO
 
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+import metrics
+from admission import Overloaded
+from chunk_selection import select_representative
+from chunker import iter_chunks
+from embeddings import embed_texts, embed_texts_async
+from json_stream import JsonStreamParser
+from llm import MODELS, complete, complete_async, stream_completion
+from pdf_text import extract_pages
 
-if not GROQ_API_KEY:
-    print("Error: GROQ_API_KEY not found in environment variables.")
-    exit(1)
-
-client = OpenAI(
-    api_key=GROQ_API_KEY,
-    base_url="https://api.groq.com/openai/v1",
-)
-
-def extract_text_from_pdf(pdf_source):
-    """
-    Extract text from PDF either from file path or URL.
-    
-    Args:
-        pdf_source: Either a local file path or a Cloudinary URL
-    
-    Returns:
-        Extracted text from the PDF
-    """
-    text = ""
-    try:
-        if pdf_source.startswith(('http://', 'https://')):
-            # Download PDF from URL
-            response = requests.get(pdf_source)
-            response.raise_for_status()
-            pdf_file = BytesIO(response.content)
-            with pdfplumber.open(pdf_file) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-        else:
-            # Read from local file path
-            with pdfplumber.open(pdf_source) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-        return text.strip()
-    except Exception as e:
-        return f"Error extracting text: {str(e)}"
+logger = logging.getLogger(__name__)
 
 
 def clean_json_response(response_text):
@@ -60,12 +23,98 @@ def clean_json_response(response_text):
         cleaned = json_match.group(0)
     else:
         raise ValueError("No valid JSON object found in response")
-    print("Cleaned response:", cleaned)
     return cleaned
 
+
+FLASHCARD_MODEL = MODELS["flashcards"]
+MAX_TEXT_LENGTH = 4000
+
+# Long documents are cut into small chunks, clustered by embedding, and a
+# representative subset that fits the budget is sent to the model instead of
+# only the first MAX_TEXT_LENGTH characters.
+FLASHCARD_TOKEN_BUDGET = int(os.getenv("FLASHCARD_TOKEN_BUDGET", "1000"))
+FLASHCARD_CHUNK_TOKENS = int(os.getenv("FLASHCARD_CHUNK_TOKENS", "120"))
+
+
+def _validate_source(pdf_source):
+    if not pdf_source:
+        return {"error": "PDF source not provided"}
+
+    # For local paths, check if file exists
+    if not pdf_source.startswith(('http://', 'https://')) and not os.path.exists(pdf_source):
+        return {"error": f"PDF file not found: {pdf_source}"}
+    return None
+
+
+def _read_chunks(pdf_source):
+    pages = extract_pages(pdf_source)
+    with metrics.span("chunk"):
+        return list(iter_chunks(pages, max_tokens=FLASHCARD_CHUNK_TOKENS, overlap_tokens=0))
+
+
+def _join_chunks(chunks):
+    return "\n\n".join(chunk.text for chunk in chunks)
+
+
+def _fits_budget(chunks):
+    return sum(chunk.tokens for chunk in chunks) <= FLASHCARD_TOKEN_BUDGET
+
+
+def _truncated(chunks, error):
+    # without embeddings there is nothing to cluster on
+    logger.warning("Chunk embedding failed, using the start of the document: %s", error)
+    return _join_chunks(chunks)[:MAX_TEXT_LENGTH]
+
+
+def _select_text(chunks):
+    if _fits_budget(chunks):
+        return _join_chunks(chunks)
+    try:
+        vectors = embed_texts([chunk.text for chunk in chunks])
+    except Exception as e:
+        return _truncated(chunks, e)
+    return _join_chunks(select_representative(chunks, vectors, FLASHCARD_TOKEN_BUDGET, FLASHCARD_CHUNK_TOKENS))
+
+
+async def _select_text_async(chunks):
+    if _fits_budget(chunks):
+        return _join_chunks(chunks)
+    try:
+        vectors = await embed_texts_async([chunk.text for chunk in chunks])
+    except Exception as e:
+        return _truncated(chunks, e)
+    return _join_chunks(select_representative(chunks, vectors, FLASHCARD_TOKEN_BUDGET, FLASHCARD_CHUNK_TOKENS))
+
+
+def _build_messages(extracted_text):
+    return [
+        {
+            "role": "system",
+            "content": """You are an expert educator tasked with creating flashcards from provided text. 
+            Analyze the text and generate 3-5 concise question-answer pairs focusing on key concepts, definitions, or facts. 
+            Return *only* valid JSON in the format: {"flashcards": [{"question": "", "answer": ""}, ...]}.
+            Do not include any extra text, explanations, or code fences (e.g., ```). Ensure the output is valid JSON."""
+        },
+        {
+            "role": "user",
+            "content": f"Text: {extracted_text}\nGenerate flashcards in JSON format."
+        }
+    ]
+
+
+def _parse_flashcards(content):
+    metrics.log_sampled(logger, "Raw flashcards response", content)
+    with metrics.span("parse"):
+        cleaned_response = clean_json_response(content)
+        return json.loads(cleaned_response)
+
+
 def generate_flashcards(pdf_source):
     """
     Generate flashcards from a PDF.
+
+    Documents longer than FLASHCARD_TOKEN_BUDGET are reduced to representative
+    chunks from across the whole text, so the prompt stays the same size.
     
     Args:
         pdf_source: Either a local file path or a Cloudinary URL
@@ -73,49 +122,88 @@ def generate_flashcards(pdf_source):
     Returns:
         Dictionary with flashcards or error message
     """
-    # Validate source
-    if not pdf_source:
-        return {"error": "PDF source not provided"}
-    
-    # For local paths, check if file exists
-    if not pdf_source.startswith(('http://', 'https://')) and not os.path.exists(pdf_source):
-        return {"error": f"PDF file not found: {pdf_source}"}
-    
-    extracted_text = extract_text_from_pdf(pdf_source)
-    if "Error" in extracted_text:
-        return {"error": extracted_text}
+    error = _validate_source(pdf_source)
+    if error:
+        return error
     
-    max_text_length = 4000 
-    if len(extracted_text) > max_text_length:
-        extracted_text = extracted_text[:max_text_length]
+    try:
+        chunks = _read_chunks(pdf_source)
+    except Exception as e:
+        return {"error": f"Error extracting text: {str(e)}"}
+    extracted_text = _select_text(chunks)
     
     try:
-        response = client.chat.completions.create(
-            model="moonshotai/kimi-k2-instruct-0905",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert educator tasked with creating flashcards from provided text. 
-                    Analyze the text and generate 3-5 concise question-answer pairs focusing on key concepts, definitions, or facts. 
-                    Return *only* valid JSON in the format: {"flashcards": [{"question": "", "answer": ""}, ...]}.
-                    Do not include any extra text, explanations, or code fences (e.g., ```). Ensure the output is valid JSON."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Text: {extracted_text}\nGenerate flashcards in JSON format."
-                }
-            ]
-        )
-        
-        print("Raw LLM response:", response.choices[0].message.content)
-        cleaned_response = clean_json_response(response.choices[0].message.content)
-        flashcards_json = json.loads(cleaned_response)
-        return flashcards_json
+        content = complete(_build_messages(extracted_text), FLASHCARD_MODEL)
+        return _parse_flashcards(content)
+    except json.JSONDecodeError as e:
+        return {"error": f"Error parsing JSON response: {str(e)}"}
+    except Overloaded:
+        raise
+    except Exception as e:
+        return {"error": f"Error generating flashcards: {str(e)}"}
+
+
+async def generate_flashcards_async(pdf_source):
+    """Async variant of generate_flashcards; PDF work runs off the event loop."""
+    error = _validate_source(pdf_source)
+    if error:
+        return error
+
+    try:
+        chunks = await asyncio.to_thread(_read_chunks, pdf_source)
+    except Exception as e:
+        return {"error": f"Error extracting text: {str(e)}"}
+    extracted_text = await _select_text_async(chunks)
+
+    try:
+        content = await complete_async(_build_messages(extracted_text), FLASHCARD_MODEL)
+        return _parse_flashcards(content)
     except json.JSONDecodeError as e:
         return {"error": f"Error parsing JSON response: {str(e)}"}
+    except Overloaded:
+        raise
     except Exception as e:
         return {"error": f"Error generating flashcards: {str(e)}"}
 
+
+
+def _is_flashcard(value):
+    return isinstance(value, dict) and "question" in value and "answer" in value
+
+
+async def stream_flashcards(pdf_source):
+    """
+    Stream flashcards from a PDF as the model writes them.
+
+    Each {"question", "answer"} object is yielded as soon as it closes in the
+    completion, instead of after the whole response has been parsed.
+
+    Args:
+        pdf_source: Either a local file path or a Cloudinary URL
+
+    Raises:
+        ValueError: If the PDF cannot be read or the output is not valid JSON
+    """
+    error = _validate_source(pdf_source)
+    if error:
+        raise ValueError(error["error"])
+
+    try:
+        chunks = await asyncio.to_thread(_read_chunks, pdf_source)
+    except Exception as e:
+        raise ValueError(f"Error extracting text: {str(e)}")
+    extracted_text = await _select_text_async(chunks)
+
+    parser = JsonStreamParser(max_depth=2)
+    async for delta in stream_completion(_build_messages(extracted_text), FLASHCARD_MODEL):
+        for path, value in parser.feed(delta):
+            # {"flashcards": [...]} gives ("flashcards", i); a bare array gives (i,)
+            if isinstance(path[-1], int) and _is_flashcard(value):
+                yield value
+
+    if not parser.done:
+        raise ValueError("Model output ended before the flashcards JSON was complete")
+
 if __name__ == "__main__":
     # Example with Cloudinary URL
     # Replace with your actual Cloudinary URL
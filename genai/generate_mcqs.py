@@ -1,61 +1,32 @@
-import pdfplumber
 import os
+import re
 import json
-import json5
-import requests
-from io import BytesIO
-from dotenv import load_dotenv
-from openai import OpenAI
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+import metrics
+from admission import Overloaded
+from chunker import iter_chunks
+from json_stream import JsonStreamParser
+from llm import MODELS, complete, complete_async, stream_completion
+from pdf_text import extract_pages
 
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY not found in environment variables.")
+logger = logging.getLogger(__name__)
 
-client = OpenAI(
-    api_key=GROQ_API_KEY,
-    base_url="https://api.groq.com/openai/v1",
-)
+MCQ_MODEL = MODELS["mcqs"]
 
-def generate_mcqs_from_pdf(pdf_source: str):
-    """
-    Generate MCQs from a PDF.
-    
-    Args:
-        pdf_source: Either a local file path or a Cloudinary URL
-    
-    Returns:
-        List of MCQ dictionaries or None if parsing fails
-    """
-    try:
-        if pdf_source.startswith(('http://', 'https://')):
-            # Download PDF from URL
-            response = requests.get(pdf_source)
-            response.raise_for_status()
-            pdf_file = BytesIO(response.content)
-            with pdfplumber.open(pdf_file) as pdf:
-                content = "\n".join(
-                    page.extract_text() for page in pdf.pages if page.extract_text()
-                )
-        else:
-            # Read from local file path
-            with pdfplumber.open(pdf_source) as pdf:
-                content = "\n".join(
-                    page.extract_text() for page in pdf.pages if page.extract_text()
-                )
-    except Exception as e:
-        raise RuntimeError(f"Failed to read PDF: {e}")
+# Documents longer than one section are handled map-reduce style: MCQs are
+# generated per section concurrently, then merged, de-duplicated and balanced.
+MCQ_SECTION_TOKENS = int(os.getenv("MCQ_SECTION_TOKENS", "6000"))
+MCQ_COUNT = int(os.getenv("MCQ_COUNT", "10"))
+MCQ_MAP_CONCURRENCY = int(os.getenv("MCQ_MAP_CONCURRENCY", "4"))
+# Questions whose word sets overlap at least this much (Jaccard) are duplicates.
+MCQ_DUPLICATE_SIMILARITY = float(os.getenv("MCQ_DUPLICATE_SIMILARITY", "0.7"))
 
-    print("Generating MCQs from LLM...")
-    
-    try:
-        result = client.chat.completions.create(
-            model="moonshotai/kimi-k2-instruct-0905",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an educational AI that generates MCQs. Return ONLY valid JSON — no explanations, no markdown, no headings.
+_WORD_RE = re.compile(r"\w+")
+
+MCQ_SYSTEM_PROMPT = """You are an educational AI that generates MCQs. Return ONLY valid JSON — no explanations, no markdown, no headings.
 
 Format:
 [
@@ -68,68 +39,266 @@ Format:
 ]
 
 IMPORTANT: Do not add extra text before or after the JSON."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Content:\n{content}"
-                }
-            ]
-        )
-        
-        raw_output = result.choices[0].message.content.strip()
-        
+
+
+def _build_messages(content: str, count: int = None):
+    request = f"Generate {count} questions.\n\n" if count else ""
+    return [
+        {
+            "role": "system",
+            "content": MCQ_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"{request}Content:\n{content}"
+        }
+    ]
+
+
+def _parse_mcqs(raw_output: str):
+    metrics.log_sampled(logger, "Raw MCQ response", raw_output)
+    raw_output = raw_output.strip()
+    with metrics.span("parse"):
         try:
             return json.loads(raw_output)
         except json.JSONDecodeError:
+            # json5 is only needed for the occasional sloppy response
+            import json5
+
             try:
                 return json5.loads(raw_output)
             except Exception:
-                print("Failed to parse JSON. Raw output:\n", raw_output)
+                print(f"Failed to parse MCQ JSON ({len(raw_output)} chars of output)")
                 return None
+
+
+def _read_sections(pdf_source: str) -> list[str]:
+    try:
+        pages = extract_pages(pdf_source)
     except Exception as e:
-        print(f"Error generating MCQs: {str(e)}")
+        raise RuntimeError(f"Failed to read PDF: {e}")
+    with metrics.span("chunk"):
+        return [chunk.text for chunk in iter_chunks(pages, max_tokens=MCQ_SECTION_TOKENS, overlap_tokens=0)]
+
+
+def _per_section(count: int, sections: int) -> int:
+    # a little slack per section leaves room for dropping duplicates
+    return max(2, -(-count // sections) + 1)
+
+
+def _is_mcq(item) -> bool:
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get("question"), str)
+        and isinstance(item.get("options"), list)
+        and "answer" in item
+    )
+
+
+def _question_words(item) -> frozenset:
+    return frozenset(_WORD_RE.findall(item["question"].lower()))
+
+
+def _is_duplicate(words: frozenset, seen: list) -> bool:
+    for other in seen:
+        union = len(words | other)
+        if union and len(words & other) / union >= MCQ_DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+
+def _reduce_sections(section_results, count: int):
+    """
+    Merge per-section MCQ lists: drop invalid items and near-duplicate
+    questions, then take questions round-robin across sections up to count.
+    """
+    queues = [[item for item in (result or []) if _is_mcq(item)] for result in section_results]
+    if not any(queues) and all(result is None for result in section_results):
         return None
 
+    merged = []
+    seen = []
+    position = 0
+    while len(merged) < count and any(position < len(q) for q in queues):
+        for queue in queues:
+            if position >= len(queue) or len(merged) >= count:
+                continue
+            item = queue[position]
+            words = _question_words(item)
+            if _is_duplicate(words, seen):
+                continue
+            seen.append(words)
+            merged.append(item)
+        position += 1
+    return merged
+
+
+def _generate_section(section: str, count: int):
+    try:
+        content = complete(_build_messages(section, count), MCQ_MODEL)
+        return _parse_mcqs(content)
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Error generating MCQs for a section: {str(e)}")
+        return None
+
+
+async def _generate_section_async(section: str, count: int, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        try:
+            content = await complete_async(_build_messages(section, count), MCQ_MODEL)
+            return _parse_mcqs(content)
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"Error generating MCQs for a section: {str(e)}")
+            return None
+
+
+def generate_mcqs_from_pdf(pdf_source: str, count: int = MCQ_COUNT):
+    """
+    Generate MCQs from a PDF.
+
+    Short documents go to the model in one request. Longer ones are split into
+    MCQ_SECTION_TOKENS sections that are processed concurrently and merged
+    into at most `count` questions balanced across the sections.
+    
+    Args:
+        pdf_source: Either a local file path or a Cloudinary URL
+        count: Number of questions wanted from long documents
+    
+    Returns:
+        List of MCQ dictionaries or None if parsing fails
+    """
+    sections = _read_sections(pdf_source)
+    if len(sections) <= 1:
+        return generate_mcqs_from_text("\n".join(sections))
+
+    per_section = _per_section(count, len(sections))
+    with ThreadPoolExecutor(max_workers=MCQ_MAP_CONCURRENCY) as executor:
+        results = list(executor.map(lambda section: _generate_section(section, per_section), sections))
+    return _reduce_sections(results, count)
+
 
 def generate_mcqs_from_text(text: str):
     print("Generating MCQs from LLM (text)...")
     try:
-        result = client.chat.completions.create(
-            model="moonshotai/kimi-k2-instruct-0905",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an educational AI that generates MCQs. Return ONLY valid JSON — no explanations, no markdown, no headings.
+        content = complete(_build_messages(text), MCQ_MODEL)
+        return _parse_mcqs(content)
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Error generating MCQs: {str(e)}")
+        return None
 
-Format:
-[
-  {
-    "question": "...",
-    "options": ["...", "...", "...", "..."],
-    "answer": "..."
-  },
-  ...
-]
 
-IMPORTANT: Do not add extra text before or after the JSON."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Content:\n{text}"
-                }
-            ]
-        )
+async def generate_mcqs_from_pdf_async(pdf_source: str, count: int = MCQ_COUNT):
+    """Async variant of generate_mcqs_from_pdf; PDF work runs off the event loop."""
+    sections = await asyncio.to_thread(_read_sections, pdf_source)
+    if len(sections) <= 1:
+        return await generate_mcqs_from_text_async("\n".join(sections))
 
-        raw_output = result.choices[0].message.content.strip()
+    per_section = _per_section(count, len(sections))
+    semaphore = asyncio.Semaphore(MCQ_MAP_CONCURRENCY)
+    results = await asyncio.gather(
+        *(_generate_section_async(section, per_section, semaphore) for section in sections)
+    )
+    return _reduce_sections(results, count)
 
-        try:
-            return json.loads(raw_output)
-        except json.JSONDecodeError:
-            try:
-                return json5.loads(raw_output)
-            except Exception:
-                print("Failed to parse JSON. Raw output:\n", raw_output)
-                return None
+
+async def generate_mcqs_from_text_async(text: str):
+    try:
+        content = await complete_async(_build_messages(text), MCQ_MODEL)
+        return _parse_mcqs(content)
+    except Overloaded:
+        raise
     except Exception as e:
         print(f"Error generating MCQs: {str(e)}")
         return None
+
+
+async def _stream_items(messages):
+    parser = JsonStreamParser(max_depth=2)
+    async for delta in stream_completion(messages, MCQ_MODEL):
+        for path, value in parser.feed(delta):
+            # a bare array gives (i,); a wrapped one such as {"mcqs": [...]} gives ("mcqs", i)
+            if isinstance(path[-1], int) and _is_mcq(value):
+                yield value
+    if not parser.done:
+        raise ValueError("Model output ended before the MCQ JSON was complete")
+
+
+async def stream_mcqs_from_text(text: str):
+    """Stream MCQs generated from text, one question dict at a time."""
+    sent = 0
+    async for item in _stream_items(_build_messages(text)):
+        sent += 1
+        yield item
+    if not sent:
+        raise RuntimeError("Failed to generate MCQs")
+
+
+async def stream_mcqs_from_pdf(pdf_source: str, count: int = MCQ_COUNT):
+    """
+    Stream MCQs from a PDF as soon as each question closes in the output.
+
+    Long documents stream all sections concurrently. Questions are emitted in
+    arrival order rather than round-robin, skipping near-duplicates, until
+    `count` have been sent; the remaining section streams are then cancelled.
+
+    Raises:
+        ValueError: If the PDF cannot be read
+        RuntimeError: If no question could be generated
+    """
+    try:
+        sections = await asyncio.to_thread(_read_sections, pdf_source)
+    except RuntimeError as e:
+        raise ValueError(str(e))
+    if len(sections) <= 1:
+        async for item in stream_mcqs_from_text("\n".join(sections)):
+            yield item
+        return
+
+    per_section = _per_section(count, len(sections))
+    queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(MCQ_MAP_CONCURRENCY)
+    finished = object()
+    overloaded = []
+
+    async def run_section(section):
+        try:
+            async with semaphore:
+                async for item in _stream_items(_build_messages(section, per_section)):
+                    await queue.put(item)
+        except Overloaded as e:
+            overloaded.append(e)
+        except Exception as e:
+            print(f"Error streaming MCQs for a section: {str(e)}")
+        finally:
+            await queue.put(finished)
+
+    tasks = [asyncio.create_task(run_section(section)) for section in sections]
+    try:
+        seen = []
+        sent = 0
+        running = len(tasks)
+        while running and sent < count:
+            item = await queue.get()
+            if item is finished:
+                running -= 1
+                continue
+            words = _question_words(item)
+            if _is_duplicate(words, seen):
+                continue
+            seen.append(words)
+            sent += 1
+            yield item
+        if overloaded and not sent:
+            raise overloaded[0]
+        if not sent:
+            # every section failed; before the first item this becomes a 500
+            raise RuntimeError("Failed to generate MCQs from the document")
+    finally:
+        for task in tasks:
+            task.cancel()
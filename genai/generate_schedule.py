@@ -1,71 +1,17 @@
 import os
+import re
 import json
-import json5
-from datetime import datetime
-from dotenv import load_dotenv
-from openai import OpenAI
-from dateutil import parser
-from difflib import get_close_matches
-
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-if not GROQ_API_KEY:
-    raise ValueError("❌ GROQ_API_KEY not found in environment variables.")
-
-client = OpenAI(
-    api_key=GROQ_API_KEY,
-    base_url="https://api.groq.com/openai/v1",
-)
-
-# -------------------------
-# Date utilities
-# -------------------------
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-MONTHS = [
-    "january","february","march","april","may","june",
-    "july","august","september","october","november","december"
-]
-
-DURATION_WORDS = [
-    "next","day","days","week","weeks","month","months"
-]
-
-def normalize_months(text: str) -> str:
-    words = text.lower().split()
-    corrected = []
-    for word in words:
-        match = get_close_matches(word, MONTHS, n=1, cutoff=0.7)
-        corrected.append(match[0] if match else word)
-    return " ".join(corrected)
-
-def normalize_duration_text(text: str) -> str:
-    words = text.lower().split()
-    corrected = []
-    for word in words:
-        match = get_close_matches(word, DURATION_WORDS, n=1, cutoff=0.8)
-        corrected.append(match[0] if match else word)
-    return " ".join(corrected)
-
-def extract_end_date(user_input: str):
-    today = datetime.today().date()
-    normalized = normalize_months(user_input)
-
-    try:
-        parsed_date = parser.parse(
-            normalized,
-            fuzzy=True,
-            dayfirst=True
-        ).date()
-
-        # If year missing or parsed date is in past → assume next year
-        if parsed_date < today:
-            parsed_date = parsed_date.replace(year=today.year + 1)
+import metrics
+from admission import Overloaded
+from llm import MODELS, complete, complete_async
+from temporal import parse_total_days
 
-        return parsed_date
-
-    except Exception:
-        return None
+logger = logging.getLogger(__name__)
 
 # -------------------------
 # LLM fallback for date extraction
@@ -87,12 +33,7 @@ Text:
 {user_input}
 """
 
-    result = client.chat.completions.create(
-        model="moonshotai/kimi-k2-instruct-0905",
-        messages=[{"role": "user", "content": prompt}]
-    )
-
-    raw = result.choices[0].message.content.strip()
+    raw = complete([{"role": "user", "content": prompt}], MODELS["dates"]).strip()
 
     try:
         return datetime.strptime(raw, "%Y-%m-%d").date()
@@ -101,36 +42,14 @@ Text:
 
 def calculate_total_days(user_input: str):
     today = datetime.today().date()
-    text = normalize_duration_text(user_input)
 
-    duration_match = re.search(
-        r"(next|for the next|for)\s+(\d+)\s+(day|days|week|weeks|month|months)",
-        text,
-    )
-    if duration_match:
-        count = int(duration_match.group(2))
-        unit = duration_match.group(3)
-        if "week" in unit:
-            return count * 7
-        if "month" in unit:
-            return count * 30
-        return count
-
-    duration_match_simple = re.search(
-        r"(next|for the next|for)\s+(day|days|week|weeks|month|months)",
-        text,
-    )
-    if duration_match_simple:
-        unit = duration_match_simple.group(2)
-        if "week" in unit:
-            return 7
-        if "month" in unit:
-            return 30
-        return 1
-
-    end_date = extract_end_date(user_input)
-    if not end_date:
-        end_date = llm_extract_date(user_input)
+    # Durations, dates and deadlines are parsed locally; the model is only
+    # asked when the text has none of them or several that disagree.
+    total_days = parse_total_days(user_input, today)
+    if total_days is not None:
+        return total_days
+
+    end_date = llm_extract_date(user_input)
 
     if not end_date:
         raise ValueError(
@@ -140,8 +59,6 @@ def calculate_total_days(user_input: str):
     return (end_date - today).days + 1
 
 
-import re
-
 def extract_json_array(text: str):
     """
     Extracts the first JSON array from text safely.
@@ -164,20 +81,25 @@ def extract_json_array(text: str):
 # Schedule generation
 # -------------------------
 
-def generate_schedule(user_input: str):
-    today_str = datetime.today().strftime("%Y-%m-%d")
-    total_days = calculate_total_days(user_input)
-
-    if total_days > 120:
-        total_days = 120
-
-    result = client.chat.completions.create(
-        model="moonshotai/kimi-k2-instruct-0905",
-        response_format={"type": "json_object"},  # ✅ JSON MODE
-        messages=[
-            {
-                "role": "system",
-                "content": f"""
+SCHEDULE_MODEL = MODELS["schedule"]
+MAX_SCHEDULE_DAYS = 120
+
+# Plans longer than SCHEDULE_SEGMENT_THRESHOLD days are generated in
+# week-sized segments: one short outline call assigns a focus to each
+# segment, the segments are generated concurrently, and only segments that
+# come back with the wrong number of days are retried.
+SCHEDULE_SEGMENT_DAYS = int(os.getenv("SCHEDULE_SEGMENT_DAYS", "7"))
+SCHEDULE_SEGMENT_THRESHOLD = int(os.getenv("SCHEDULE_SEGMENT_THRESHOLD", "14"))
+SCHEDULE_SEGMENT_RETRIES = int(os.getenv("SCHEDULE_SEGMENT_RETRIES", "2"))
+SCHEDULE_SEGMENT_CONCURRENCY = int(os.getenv("SCHEDULE_SEGMENT_CONCURRENCY", "4"))
+SCHEDULE_OUTLINE_MODEL = MODELS["schedule_outline"]
+
+
+def _build_messages(user_input: str, total_days: int, today_str: str):
+    return [
+        {
+            "role": "system",
+            "content": f"""
 You are an AI study planner.
 
 Create a study plan for EXACTLY {total_days} days.
@@ -205,18 +127,18 @@ Return ONLY valid JSON in this exact shape:
   ]
 }}
 """
-            },
-            {
-                "role": "user",
-                "content": user_input
-            }
-        ]
-    )
+        },
+        {
+            "role": "user",
+            "content": user_input
+        }
+    ]
 
-    raw_output = result.choices[0].message.content
 
+def _parse_schedule(raw_output: str, total_days: int):
     # ✅ Guaranteed JSON object
-    data = json.loads(raw_output)
+    with metrics.span("parse"):
+        data = json.loads(raw_output)
 
     schedule = data.get("schedule")
     if not isinstance(schedule, list):
@@ -226,9 +148,270 @@ Return ONLY valid JSON in this exact shape:
         raise ValueError(
             f"❌ Expected {total_days} days, got {len(schedule)}"
         )
-    print("Generated schedule:", schedule)
+    metrics.log_sampled(logger, "Generated schedule", schedule)
+    return schedule
+
+
+# -------------------------
+# Segmented generation
+# -------------------------
+
+def _segments(start_date, total_days: int):
+    """Split the plan into (first date, day count) blocks of SCHEDULE_SEGMENT_DAYS."""
+    segments = []
+    for offset in range(0, total_days, SCHEDULE_SEGMENT_DAYS):
+        days = min(SCHEDULE_SEGMENT_DAYS, total_days - offset)
+        segments.append((start_date + timedelta(days=offset), days))
+    return segments
+
+
+def _segment_range(segment):
+    start, days = segment
+    return start, start + timedelta(days=days - 1)
+
+
+def _build_outline_messages(user_input: str, segments):
+    blocks = "\n".join(
+        f"{i + 1}. {first:%Y-%m-%d} to {last:%Y-%m-%d}"
+        for i, (first, last) in enumerate(map(_segment_range, segments))
+    )
+    return [
+        {
+            "role": "system",
+            "content": f"""
+You are an AI study planner writing a high-level outline.
+
+The study period is split into EXACTLY {len(segments)} blocks:
+{blocks}
+
+For each block, in order, give a short focus for what it should cover so
+the blocks together form a sensible progression for the request.
+
+Return ONLY valid JSON in this exact shape:
+
+{{
+  "blocks": [
+    {{
+      "focus": "Main theme of the block",
+      "goals": "One sentence on what the learner should finish in this block"
+    }}
+  ]
+}}
+"""
+        },
+        {
+            "role": "user",
+            "content": user_input
+        }
+    ]
+
+
+def _parse_outline(raw_output: str, count: int):
+    try:
+        with metrics.span("parse"):
+            blocks = json.loads(raw_output).get("blocks")
+    except Exception:
+        blocks = None
+    if not isinstance(blocks, list):
+        blocks = []
+    outline = [block for block in blocks if isinstance(block, dict)][:count]
+    # a short outline still lets the remaining blocks be planned on their own
+    while len(outline) < count:
+        outline.append({"focus": "Continue the plan", "goals": "Pick up where the previous block left off"})
+    return outline
+
+
+def _build_segment_messages(user_input: str, outline, index: int, segment):
+    first, last = _segment_range(segment)
+    days = segment[1]
+    plan = "\n".join(
+        f"{i + 1}. {block.get('focus', '')}: {block.get('goals', '')}"
+        for i, block in enumerate(outline)
+    )
+    return [
+        {
+            "role": "system",
+            "content": f"""
+You are an AI study planner.
+
+The overall plan is split into blocks:
+{plan}
+
+Create the daily plan for block {index + 1} only, covering EXACTLY {days} days.
+
+Rules:
+- Start date: {first:%Y-%m-%d}
+- End date: {last:%Y-%m-%d}
+- Each next entry increments by 1 calendar day
+- The schedule array MUST contain exactly {days} items
+- Each day must have:
+  - topic: short title
+  - details: 1 concise sentence on what will be covered
+  - subtopics: 2-4 very short bullet points for that day
+
+Return ONLY valid JSON in this exact shape:
+
+{{
+  "schedule": [
+    {{
+      "date": "YYYY-MM-DD",
+      "topic": "Topic name",
+      "details": "One sentence summary for the day",
+      "subtopics": ["subtopic 1", "subtopic 2"],
+      "duration": "number of hours"
+    }}
+  ]
+}}
+"""
+        },
+        {
+            "role": "user",
+            "content": user_input
+        }
+    ]
+
+
+def _parse_segment(raw_output: str, segment):
+    first, days = segment
+    with metrics.span("parse"):
+        schedule = json.loads(raw_output).get("schedule")
+    if not isinstance(schedule, list) or not all(isinstance(day, dict) for day in schedule):
+        raise ValueError("'schedule' missing or not a list of days")
+    if len(schedule) != days:
+        raise ValueError(f"Expected {days} days, got {len(schedule)}")
+
+    for offset, day in enumerate(schedule):
+        expected = (first + timedelta(days=offset)).strftime("%Y-%m-%d")
+        if day.get("date") != expected:
+            # the day count is right, so only the label is off
+            day["date"] = expected
+    return schedule
+
+
+def _stitch(results, segments):
+    failed = [
+        f"{first:%Y-%m-%d}..{last:%Y-%m-%d}"
+        for result, (first, last) in zip(results, map(_segment_range, segments))
+        if result is None
+    ]
+    if failed:
+        raise ValueError(f"❌ Could not generate schedule segments: {', '.join(failed)}")
+    schedule = [day for result in results for day in result]
+    metrics.log_sampled(logger, "Generated schedule", schedule)
     return schedule
 
+
+def _generate_segment(user_input: str, outline, index: int, segment):
+    try:
+        raw = complete(
+            _build_segment_messages(user_input, outline, index, segment),
+            SCHEDULE_MODEL,
+            response_format={"type": "json_object"},
+        )
+        return _parse_segment(raw, segment)
+    except Overloaded:
+        raise
+    except Exception as e:
+        print(f"Schedule segment {index + 1} failed: {str(e)}")
+        return None
+
+
+async def _generate_segment_async(user_input: str, outline, index: int, segment, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        try:
+            raw = await complete_async(
+                _build_segment_messages(user_input, outline, index, segment),
+                SCHEDULE_MODEL,
+                response_format={"type": "json_object"},
+            )
+            return _parse_segment(raw, segment)
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"Schedule segment {index + 1} failed: {str(e)}")
+            return None
+
+
+def _generate_segmented(user_input: str, start_date, total_days: int):
+    segments = _segments(start_date, total_days)
+    raw = complete(
+        _build_outline_messages(user_input, segments),
+        SCHEDULE_OUTLINE_MODEL,
+        response_format={"type": "json_object"},
+    )
+    outline = _parse_outline(raw, len(segments))
+
+    results = [None] * len(segments)
+    with ThreadPoolExecutor(max_workers=SCHEDULE_SEGMENT_CONCURRENCY) as executor:
+        for _ in range(SCHEDULE_SEGMENT_RETRIES + 1):
+            pending = [i for i, days in enumerate(results) if days is None]
+            if not pending:
+                break
+            generated = executor.map(
+                lambda i: _generate_segment(user_input, outline, i, segments[i]), pending
+            )
+            for i, days in zip(pending, generated):
+                results[i] = days
+    return _stitch(results, segments)
+
+
+async def _generate_segmented_async(user_input: str, start_date, total_days: int):
+    segments = _segments(start_date, total_days)
+    raw = await complete_async(
+        _build_outline_messages(user_input, segments),
+        SCHEDULE_OUTLINE_MODEL,
+        response_format={"type": "json_object"},
+    )
+    outline = _parse_outline(raw, len(segments))
+
+    semaphore = asyncio.Semaphore(SCHEDULE_SEGMENT_CONCURRENCY)
+    results = [None] * len(segments)
+    for _ in range(SCHEDULE_SEGMENT_RETRIES + 1):
+        pending = [i for i, days in enumerate(results) if days is None]
+        if not pending:
+            break
+        generated = await asyncio.gather(
+            *(_generate_segment_async(user_input, outline, i, segments[i], semaphore) for i in pending)
+        )
+        for i, days in zip(pending, generated):
+            results[i] = days
+    return _stitch(results, segments)
+
+
+def generate_schedule(user_input: str):
+    today = datetime.today()
+    today_str = today.strftime("%Y-%m-%d")
+    total_days = min(calculate_total_days(user_input), MAX_SCHEDULE_DAYS)
+
+    if total_days > SCHEDULE_SEGMENT_THRESHOLD:
+        return _generate_segmented(user_input, today.date(), total_days)
+
+    raw = complete(
+        _build_messages(user_input, total_days, today_str),
+        SCHEDULE_MODEL,
+        response_format={"type": "json_object"},  # ✅ JSON MODE
+    )
+
+    return _parse_schedule(raw, total_days)
+
+
+async def generate_schedule_async(user_input: str):
+    today = datetime.today()
+    today_str = today.strftime("%Y-%m-%d")
+    # Date parsing is local; the rare LLM fallback inside it stays off the loop.
+    total_days = min(await asyncio.to_thread(calculate_total_days, user_input), MAX_SCHEDULE_DAYS)
+
+    if total_days > SCHEDULE_SEGMENT_THRESHOLD:
+        return await _generate_segmented_async(user_input, today.date(), total_days)
+
+    raw = await complete_async(
+        _build_messages(user_input, total_days, today_str),
+        SCHEDULE_MODEL,
+        response_format={"type": "json_object"},  # ✅ JSON MODE
+    )
+
+    return _parse_schedule(raw, total_days)
+
 # -------------------------
 # Main
 # -------------------------
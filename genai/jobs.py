@@ -0,0 +1,274 @@
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from disk_cache import CACHE_ROOT
+from pdf_text import open_pdf
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(CACHE_ROOT, "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs older than this are deleted when new work is submitted.
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+_IN_FLIGHT = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    operation TEXT NOT NULL,
+    source TEXT NOT NULL,
+    document_sha256 TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    shared_with TEXT,
+    result TEXT,
+    error TEXT,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_source ON jobs (operation, source, status);
+CREATE INDEX IF NOT EXISTS jobs_by_document ON jobs (operation, document_sha256, status);
+CREATE INDEX IF NOT EXISTS jobs_by_age ON jobs (status, updated_at);
+"""
+
+_operations = {}
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+_executor = None
+_executor_lock = threading.Lock()
+_HOST = socket.gethostname()
+
+
+def register(operation: str, fn):
+    """Make `fn(pdf_path) -> result` available as a job; it raises to fail the job."""
+    _operations[operation] = fn
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(JOBS_DB_PATH), exist_ok=True)
+        # autocommit; writes that read-then-update open BEGIN IMMEDIATE themselves
+        conn = sqlite3.connect(JOBS_DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        _local.conn = conn
+    _init(conn)
+    return conn
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _init(conn: sqlite3.Connection):
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        conn.executescript(_SCHEMA)
+        _reap(conn)
+        _initialized = True
+
+
+def _reap(conn: sqlite3.Connection):
+    """
+    Fail in-flight jobs of processes on this host that have exited.
+
+    They would never finish, and deduplication would keep attaching new
+    requests to them. Runs at start-up, on submit and when a poll finds one.
+    """
+    rows = conn.execute(
+        "SELECT DISTINCT pid FROM jobs WHERE host = ? AND pid != ? AND status IN (?, ?)",
+        (_HOST, os.getpid(), *_IN_FLIGHT),
+    ).fetchall()
+    for pid in (row["pid"] for row in rows):
+        if _pid_alive(pid):
+            continue
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+            "WHERE host = ? AND pid = ? AND status IN (?, ?)",
+            (FAILED, "Interrupted: the worker process exited", time.time(), _HOST, pid, *_IN_FLIGHT),
+        )
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        return _executor
+
+
+def _update(job_id: str, **fields):
+    fields["updated_at"] = time.time()
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    _connect().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _prune(conn: sqlite3.Connection):
+    conn.execute(
+        "DELETE FROM jobs WHERE (status IN (?, ?) OR shared_with IS NOT NULL) AND updated_at < ?",
+        (SUCCEEDED, FAILED, time.time() - JOB_RETENTION_SECONDS),
+    )
+
+
+def submit(operation: str, source: str) -> str:
+    """
+    Queue `operation` on a PDF path or URL and return the job id.
+
+    A request for the same source while an identical job is still in flight
+    gets its own id but shares that job's execution and result.
+    """
+    if operation not in _operations:
+        raise ValueError(f"Unknown job operation: {operation}")
+    if not source:
+        raise ValueError("PDF source not provided")
+
+    conn = _connect()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _prune(conn)
+        _reap(conn)
+        existing = conn.execute(
+            "SELECT id FROM jobs WHERE operation = ? AND source = ? AND status IN (?, ?) "
+            "AND shared_with IS NULL ORDER BY created_at LIMIT 1",
+            (operation, source, *_IN_FLIGHT),
+        ).fetchone()
+        conn.execute(
+            "INSERT INTO jobs (id, operation, source, status, stage, shared_with, host, pid, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, operation, source, QUEUED, "queued", existing["id"] if existing else None,
+             _HOST, os.getpid(), now, now),
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    if existing is None:
+        _get_executor().submit(_run, job_id, operation, source)
+    return job_id
+
+
+def _claim_document(job_id: str, operation: str, sha256: str):
+    """Record the document hash, or return the id of a job already working on it."""
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _reap(conn)
+        other = conn.execute(
+            "SELECT id FROM jobs WHERE operation = ? AND document_sha256 = ? AND status IN (?, ?) "
+            "AND shared_with IS NULL AND id != ? ORDER BY created_at LIMIT 1",
+            (operation, sha256, *_IN_FLIGHT, job_id),
+        ).fetchone()
+        now = time.time()
+        if other:
+            # hand this job and anything already waiting on it to the running one
+            conn.execute(
+                "UPDATE jobs SET shared_with = ?, document_sha256 = ?, updated_at = ? "
+                "WHERE id = ? OR shared_with = ?",
+                (other["id"], sha256, now, job_id, job_id),
+            )
+        else:
+            conn.execute(
+                "UPDATE jobs SET document_sha256 = ?, updated_at = ? WHERE id = ?",
+                (sha256, now, job_id),
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return other["id"] if other else None
+
+
+def _local_path(pdf_file):
+    """A path to the fetched bytes, so the operation does not download them again."""
+    if pdf_file.path is not None:
+        return pdf_file.path, None
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(pdf_file.data)
+    return f.name, f.name
+
+
+def _run(job_id: str, operation: str, source: str):
+    try:
+        _update(job_id, status=RUNNING, stage="fetching")
+        with open_pdf(source) as pdf_file:
+            if _claim_document(job_id, operation, pdf_file.sha256):
+                return
+            _update(job_id, stage="processing")
+            path, temporary = _local_path(pdf_file)
+            try:
+                result = _operations[operation](path)
+            finally:
+                if temporary:
+                    os.remove(temporary)
+        _update(job_id, status=SUCCEEDED, stage="done", result=json.dumps(result))
+    except Exception as e:
+        print(f"Job {job_id} ({operation}) failed:", e)
+        traceback.print_exc()
+        _update(job_id, status=FAILED, stage="done", error=str(e))
+
+
+def get(job_id: str):
+    """Return a job's status, stage and result, or None if the id is unknown."""
+    conn = _connect()
+    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = {
+        "job_id": row["id"],
+        "operation": row["operation"],
+        "source": row["source"],
+        "shared_with": row["shared_with"],
+        "created_at": row["created_at"],
+    }
+    if row["shared_with"]:
+        owner = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["shared_with"],)).fetchone()
+        if owner is not None:
+            row = owner
+    if row["status"] in _IN_FLIGHT and row["host"] == _HOST and not _pid_alive(row["pid"]):
+        _reap(conn)
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+    job.update({
+        "status": row["status"],
+        "stage": row["stage"],
+        "document_sha256": row["document_sha256"],
+        "updated_at": row["updated_at"],
+        "result": json.loads(row["result"]) if row["result"] is not None else None,
+        "error": row["error"],
+    })
+    return job
+
+
+def stats() -> dict:
+    """Job counts by status; jobs sharing another's execution are not counted."""
+    rows = _connect().execute(
+        "SELECT status, COUNT(*) AS n FROM jobs WHERE shared_with IS NULL GROUP BY status"
+    ).fetchall()
+    counts = {status: 0 for status in (*_IN_FLIGHT, SUCCEEDED, FAILED)}
+    counts.update({row["status"]: row["n"] for row in rows})
+    return dict(counts, workers=JOB_WORKERS)
@@ -0,0 +1,183 @@
+import json
+from bisect import bisect_right
+
+_WHITESPACE = " \t\r\n"
+_PRIMITIVE_END = ",}]" + _WHITESPACE
+
+
+class _Frame:
+    __slots__ = ("is_object", "start", "state", "key", "index")
+
+    def __init__(self, is_object: bool, start: int):
+        self.is_object = is_object
+        self.start = start
+        # object: key -> colon -> value -> after; array: value -> after
+        self.state = "key" if is_object else "value"
+        self.key = None
+        self.index = -1
+
+    @property
+    def position(self):
+        return self.key if self.is_object else self.index
+
+
+class JsonStreamParser:
+    """
+    Incremental JSON parser for model output that arrives in pieces.
+
+    feed() returns (path, value) pairs for every value that completed in the
+    new text, as long as len(path) <= max_depth. A path holds object keys and
+    array indexes from the root, so for {"flashcards": [{...}, {...}]} the
+    cards arrive as ("flashcards", 0), ("flashcards", 1) and the list itself
+    as ("flashcards",). Text before the first "{" or "[" (code fences, chatter)
+    and after the root value closes is ignored.
+    """
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self.done = False
+        # the text so far, kept as the fed pieces with their start offsets;
+        # concatenating every delta would copy the whole response each time
+        self._chunks: list[str] = []
+        self._offsets: list[int] = []
+        self._pos = 0
+        self._stack: list[_Frame] = []
+        self._root_start = None
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._string_is_key = False
+        self._primitive_start = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def result(self):
+        """The complete root value; only valid once done is True."""
+        return json.loads(self._slice(self._root_start, self._pos))
+
+    def _slice(self, start: int, end: int) -> str:
+        """Text between two absolute offsets, joined from the pieces it spans."""
+        k = bisect_right(self._offsets, start) - 1
+        parts = []
+        while start < end:
+            piece, offset = self._chunks[k], self._offsets[k]
+            parts.append(piece[start - offset:end - offset])
+            start = offset + len(piece)
+            k += 1
+        return "".join(parts)
+
+    def feed(self, chunk: str) -> list:
+        events = []
+        if not chunk or self.done:
+            return events
+        # every earlier piece has been scanned, so scanning resumes at this one
+        base = self._pos
+        self._offsets.append(base)
+        self._chunks.append(chunk)
+        i = base
+        n = base + len(chunk)
+        while i < n and not self.done:
+            c = chunk[i - base]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._end_string(i, events)
+                i += 1
+                continue
+
+            if self._primitive_start is not None:
+                if c not in _PRIMITIVE_END:
+                    i += 1
+                    continue
+                self._end_value(self._primitive_start, i, events)
+                self._primitive_start = None
+                # fall through: the delimiter still needs handling
+
+            if not self._stack:
+                if c in "{[":
+                    self._root_start = i
+                    self._stack.append(_Frame(c == "{", i))
+                i += 1
+                continue
+
+            if c in _WHITESPACE:
+                i += 1
+                continue
+
+            frame = self._stack[-1]
+            if frame.is_object:
+                if frame.state == "key":
+                    if c == '"':
+                        self._start_string(i, is_key=True)
+                    elif c == "}":
+                        self._close(i, events)
+                elif frame.state == "colon":
+                    if c == ":":
+                        frame.state = "value"
+                elif frame.state == "value":
+                    self._start_value(frame, i, c)
+                elif frame.state == "after":
+                    if c == ",":
+                        frame.state = "key"
+                    elif c == "}":
+                        self._close(i, events)
+            else:
+                if frame.state == "value":
+                    if c == "]":
+                        self._close(i, events)
+                    else:
+                        frame.index += 1
+                        self._start_value(frame, i, c)
+                elif frame.state == "after":
+                    if c == ",":
+                        frame.state = "value"
+                    elif c == "]":
+                        self._close(i, events)
+            i += 1
+
+        self._pos = i
+        return events
+
+    def _path(self):
+        return tuple(frame.position for frame in self._stack)
+
+    def _start_string(self, i: int, is_key: bool):
+        self._in_string = True
+        self._string_start = i
+        self._string_is_key = is_key
+
+    def _start_value(self, frame: _Frame, i: int, c: str):
+        frame.state = "after"
+        if c == '"':
+            self._start_string(i, is_key=False)
+        elif c in "{[":
+            self._stack.append(_Frame(c == "{", i))
+        else:
+            self._primitive_start = i
+
+    def _end_string(self, i: int, events: list):
+        if self._string_is_key:
+            frame = self._stack[-1]
+            frame.key = json.loads(self._slice(self._string_start, i + 1))
+            frame.state = "colon"
+        else:
+            self._end_value(self._string_start, i + 1, events)
+
+    def _end_value(self, start: int, end: int, events: list):
+        path = self._path()
+        if len(path) <= self.max_depth:
+            events.append((path, json.loads(self._slice(start, end))))
+
+    def _close(self, i: int, events: list):
+        frame = self._stack.pop()
+        if not self._stack:
+            self.done = True
+            return
+        self._end_value(frame.start, i + 1, events)
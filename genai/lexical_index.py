@@ -0,0 +1,278 @@
+import json
+import math
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+
+from disk_cache import CACHE_ROOT
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", os.path.join(CACHE_ROOT, "lexical"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# The best lexical hit is trusted on its own when it contains every query term
+# and outscores the runner-up by this factor; 0 always falls back to embeddings.
+LEXICAL_CONFIDENCE_RATIO = float(os.getenv("LEXICAL_CONFIDENCE_RATIO", "2.0"))
+
+# Bump when tokenization changes so indexes are rebuilt from their documents.
+INDEX_VERSION = 1
+
+# "3.2.1", "k-means" and "O(n)"-style identifiers stay whole; their parts are indexed too
+_WORD_RE = re.compile(r"\w+(?:[.\-/]\w+)*")
+_SPLIT_RE = re.compile(r"[.\-/]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it its me of on or "
+    "please tell that the this to was what when where which who why will with you".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    terms = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        terms.append(word)
+        parts = _SPLIT_RE.split(word)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part and part not in _STOPWORDS)
+    return terms
+
+
+class _Segment:
+    """Postings of one document; chunk text is read from its own file on first use."""
+
+    def __init__(self, path: str, mtime: int, data: dict):
+        self.path = path
+        self.mtime = mtime
+        self.version = data["version"]
+        self.chunks_name = data["chunks"]
+        self.ids = data["ids"]
+        self.lengths = data["lengths"]
+        self.postings = data["postings"]
+        self.metadata = None
+
+
+class _Namespace:
+    """
+    One namespace of the index: a directory with two files per document.
+
+    `<document>.postings.json` holds the chunk ids, their lengths in terms
+    and the document's postings ({term: [[row, term frequency], ...]}); the
+    chunk metadata and text live in a separate chunks file that is only read
+    when one of its chunks is returned. Indexing a document writes just its
+    own files, and workers reload only the documents whose postings changed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.segments = {}
+        self.document_frequency = Counter()
+        self.chunk_count = 0
+        self.average_length = 0.0
+
+    def refresh(self):
+        """Load postings files added or rewritten since the last look; drop removed ones."""
+        try:
+            entries = {
+                entry.name[:-len(".postings.json")]: entry
+                for entry in os.scandir(self.directory) if entry.name.endswith(".postings.json")
+            }
+        except FileNotFoundError:
+            entries = {}
+        changed = False
+        for document_id in set(self.segments) - set(entries):
+            del self.segments[document_id]
+            changed = True
+        for document_id, entry in entries.items():
+            mtime = entry.stat().st_mtime_ns
+            segment = self.segments.get(document_id)
+            if segment is not None and segment.mtime == mtime:
+                continue
+            try:
+                with open(entry.path) as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                continue
+            if data.get("index_version") != INDEX_VERSION:
+                continue
+            self.segments[document_id] = _Segment(entry.path, mtime, data)
+            changed = True
+        if changed:
+            self._recount()
+
+    def _recount(self):
+        self.document_frequency = Counter()
+        lengths = 0
+        self.chunk_count = 0
+        for segment in self.segments.values():
+            for term, entries in segment.postings.items():
+                self.document_frequency[term] += len(entries)
+            self.chunk_count += len(segment.ids)
+            lengths += sum(segment.lengths)
+        self.average_length = lengths / self.chunk_count if self.chunk_count else 0.0
+
+    def write_document(self, document_id: str, version, chunks):
+        os.makedirs(self.directory, exist_ok=True)
+        ids, lengths, metadata = [], [], []
+        postings = {}
+        for row, (chunk_id, text, chunk_metadata) in enumerate(chunks):
+            terms = Counter(tokenize(text))
+            ids.append(chunk_id)
+            lengths.append(sum(terms.values()))
+            metadata.append(chunk_metadata)
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append([row, tf])
+
+        # the chunks file goes first: postings only ever name a complete one
+        chunks_name = f"{document_id}.{uuid.uuid4().hex[:12]}.chunks.json"
+        _write_json(os.path.join(self.directory, chunks_name), {"metadata": metadata})
+        postings_path = os.path.join(self.directory, f"{document_id}.postings.json")
+        previous = self.segments.get(document_id)
+        _write_json(postings_path, {
+            "index_version": INDEX_VERSION,
+            "version": version,
+            "chunks": chunks_name,
+            "ids": ids,
+            "lengths": lengths,
+            "postings": postings,
+        })
+        if previous is not None:
+            try:
+                os.remove(os.path.join(self.directory, previous.chunks_name))
+            except FileNotFoundError:
+                pass
+        self.refresh()
+
+    def _metadata(self, segment: _Segment) -> list:
+        if segment.metadata is None:
+            with open(os.path.join(self.directory, segment.chunks_name)) as f:
+                segment.metadata = json.load(f)["metadata"]
+        return segment.metadata
+
+    def search(self, query_terms: list[str], top_k: int) -> list[dict]:
+        if self.chunk_count == 0 or top_k <= 0:
+            return []
+        distinct = set(query_terms)
+        n = self.chunk_count
+        scores = {}
+        matched = Counter()
+        for term in distinct:
+            df = self.document_frequency.get(term)
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for document_id, segment in self.segments.items():
+                for row, tf in segment.postings.get(term, ()):
+                    norm = 1 - BM25_B + BM25_B * segment.lengths[row] / self.average_length
+                    key = (document_id, row)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+                    matched[key] += 1
+        best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        results = []
+        for document_id, row in best:
+            segment = self.segments[document_id]
+            results.append({
+                "id": segment.ids[row],
+                "score": scores[(document_id, row)],
+                "metadata": self._metadata(segment)[row],
+                "coverage": matched[(document_id, row)] / len(distinct),
+            })
+        return results
+
+
+def _write_json(path: str, data: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk text, one directory per namespace under
+    LEXICAL_INDEX_DIR.
+
+    Chunk ids match the vector store's, so lexical and vector results can be
+    fused. Workers on the same host may share the directory.
+    """
+
+    def __init__(self, directory: str = LEXICAL_INDEX_DIR):
+        self.directory = directory
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: str = None) -> _Namespace:
+        name = namespace or "__default__"
+        ns = self._namespaces.get(name)
+        if ns is None:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+            ns = _Namespace(os.path.join(self.directory, safe_name))
+            self._namespaces[name] = ns
+        ns.refresh()
+        return ns
+
+    def documents(self, namespace: str = None, version=None) -> set:
+        """Ids of the indexed documents, limited to one chunk version when given."""
+        with self._lock:
+            segments = self._namespace(namespace).segments
+            return {
+                document_id for document_id, segment in segments.items()
+                if version is None or segment.version == version
+            }
+
+    def has(self, document_id: str, version, namespace: str = None) -> bool:
+        return document_id in self.documents(namespace, version)
+
+    def add(self, document_id: str, version, chunks, namespace: str = None):
+        """Index (chunk_id, text, metadata) tuples of one document, replacing earlier rows for it."""
+        with self._lock:
+            self._namespace(namespace).write_document(document_id, version, list(chunks))
+
+    def search(self, query: str, top_k: int, namespace: str = None) -> list[dict]:
+        """
+        Best top_k chunks by BM25 as {"id", "score", "metadata", "coverage"}
+        dicts, where coverage is the fraction of distinct query terms the chunk contains.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            ns = self._namespace(namespace)
+            try:
+                return ns.search(terms, top_k)
+            except FileNotFoundError:
+                # another worker re-indexed a document between refresh and read
+                ns.refresh()
+                return ns.search(terms, top_k)
+
+
+def confident(results: list[dict]) -> bool:
+    """Whether the best hit can answer the query without vector search."""
+    if not results or LEXICAL_CONFIDENCE_RATIO <= 0 or results[0]["coverage"] < 1:
+        return False
+    return len(results) == 1 or results[0]["score"] >= LEXICAL_CONFIDENCE_RATIO * results[1]["score"]
+
+
+def fuse(rankings, top_k: int, k: int = 60) -> list[dict]:
+    """Reciprocal rank fusion of several best-first result lists, keyed by id."""
+    scores = {}
+    results = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking):
+            scores[result["id"]] = scores.get(result["id"], 0.0) + 1 / (k + rank + 1)
+            results.setdefault(result["id"], result)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [dict(results[i], score=scores[i]) for i in best]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> LexicalIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LexicalIndex()
+        return _index
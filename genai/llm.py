@@ -0,0 +1,423 @@
+import asyncio
+import os
+import random
+import sys
+import time
+
+from dotenv import load_dotenv
+
+import admission
+import metrics
+import providers
+from chunker import estimate_tokens
+
+load_dotenv()
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Overrides the Gemini API endpoint, e.g. for the local stand-in in bench/.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+# -------------------------
+# Models
+# -------------------------
+
+GROQ_MODEL = os.getenv("GROQ_MODEL", "moonshotai/kimi-k2-instruct-0905")
+
+MODELS = {
+    "flashcards": os.getenv("FLASHCARD_MODEL", GROQ_MODEL),
+    "mcqs": os.getenv("MCQ_MODEL", GROQ_MODEL),
+    "schedule": os.getenv("SCHEDULE_MODEL", GROQ_MODEL),
+    "schedule_outline": os.getenv("SCHEDULE_OUTLINE_MODEL", os.getenv("SCHEDULE_MODEL", GROQ_MODEL)),
+    "dates": os.getenv("DATE_MODEL", GROQ_MODEL),
+    "topic": os.getenv("TOPIC_MODEL", GROQ_MODEL),
+    "chat": os.getenv("CHAT_MODEL", "gemini-3-flash-preview"),
+    "chat_summary": os.getenv("CHAT_SUMMARY_MODEL", os.getenv("CHAT_MODEL", "gemini-3-flash-preview")),
+    "embedding": os.getenv("EMBED_MODEL", "text-embedding-004"),
+}
+
+# -------------------------
+# Transport
+# -------------------------
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "16"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+
+# Retries cover 429, 5xx and connection failures. No retry is started once
+# LLM_RETRY_BUDGET_SECONDS (counted from the first attempt, backoff included)
+# would be exceeded; an attempt already running is only bounded by
+# LLM_TIMEOUT_SECONDS per read, and a stream is not bounded once it starts.
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "0.5"))
+LLM_MAX_BACKOFF_SECONDS = float(os.getenv("LLM_MAX_BACKOFF_SECONDS", "20"))
+LLM_RETRY_BUDGET_SECONDS = float(os.getenv("LLM_RETRY_BUDGET_SECONDS", "120"))
+
+# Completion tokens reserved against the provider's TPM budget until the
+# response reports actual usage.
+LLM_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "1024"))
+
+# Send a second identical request if the first has not answered after this
+# many seconds and keep whichever finishes first. 0 disables hedging.
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+
+
+# SDKs are imported inside the factories so the service starts without
+# loading them; each client is built by the provider registry on first use.
+
+def _timeout():
+    import httpx
+
+    return httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+def _limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+    )
+
+
+def _create_groq():
+    import httpx
+    import openai
+
+    return openai.OpenAI(
+        api_key=GROQ_API_KEY,
+        base_url=GROQ_BASE_URL,
+        max_retries=0,  # retried here, with jitter and a retry budget
+        http_client=httpx.Client(timeout=_timeout(), limits=_limits()),
+    )
+
+
+def _create_groq_async():
+    import httpx
+    import openai
+
+    return openai.AsyncOpenAI(
+        api_key=GROQ_API_KEY,
+        base_url=GROQ_BASE_URL,
+        max_retries=0,
+        http_client=httpx.AsyncClient(timeout=_timeout(), limits=_limits()),
+    )
+
+
+def _create_gemini():
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    return genai.Client(api_key=GEMINI_API_KEY, http_options=types.HttpOptions(
+        base_url=GEMINI_BASE_URL,
+        timeout=int(LLM_TIMEOUT_SECONDS * 1000),
+        httpx_client=httpx.Client(timeout=_timeout(), limits=_limits()),
+        httpx_async_client=httpx.AsyncClient(timeout=_timeout(), limits=_limits()),
+    ))
+
+
+providers.register("groq", _create_groq, required=["GROQ_API_KEY"])
+providers.register("groq_async", _create_groq_async, required=["GROQ_API_KEY"])
+providers.register("gemini", _create_gemini, required=["GEMINI_API_KEY"])
+
+
+def groq_client():
+    """Shared Groq (OpenAI-compatible) client with a pooled keep-alive transport."""
+    return providers.client("groq")
+
+
+def groq_async_client():
+    return providers.client("groq_async")
+
+
+def gemini_client():
+    """Shared Gemini client; sync calls and `.aio` both use pooled transports."""
+    return providers.client("gemini")
+
+
+# -------------------------
+# Retries and hedging
+# -------------------------
+
+def _count(event: str):
+    metrics.LLM_CALLS.labels(event).inc()
+
+
+def _status_code(exc: Exception):
+    # openai errors carry status_code, google-genai errors carry code
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(exc, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def _transient_errors() -> tuple:
+    # an SDK that was never imported cannot have raised
+    errors = [asyncio.TimeoutError]
+    if "openai" in sys.modules:
+        errors.append(sys.modules["openai"].APIConnectionError)
+    if "httpx" in sys.modules:
+        errors.append(sys.modules["httpx"].TransportError)
+    return tuple(errors)
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, _transient_errors()):
+        return True
+    status = _status_code(exc)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def _retry_after(exc: Exception):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int, exc: Exception = None, base: float = LLM_BACKOFF_SECONDS) -> float:
+    """Full-jitter exponential delay, or the server's Retry-After when it sent one."""
+    hinted = _retry_after(exc) if exc is not None else None
+    if hinted is not None:
+        return min(hinted, LLM_MAX_BACKOFF_SECONDS)
+    return random.uniform(0, min(LLM_MAX_BACKOFF_SECONDS, base * (2 ** attempt)))
+
+
+def estimate_request_tokens(prompt, completion_tokens: int = LLM_COMPLETION_TOKENS_ESTIMATE) -> int:
+    """Rough prompt + completion size of a request, for rate budgeting."""
+    if isinstance(prompt, str):
+        text = prompt
+    elif prompt and isinstance(prompt[0], dict):
+        text = " ".join(str(m.get("content", "")) for m in prompt)
+    else:
+        text = " ".join(str(p) for p in prompt or ())
+    return estimate_tokens(text) + completion_tokens
+
+
+def _usage_tokens(result) -> int:
+    usage = getattr(result, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None):
+        return usage.total_tokens
+    usage = getattr(result, "usage_metadata", None)
+    if usage is not None and getattr(usage, "total_token_count", None):
+        return usage.total_token_count
+    return 0
+
+
+def _record_usage(provider: str, model: str, result):
+    usage = getattr(result, "usage", None)
+    if usage is not None:
+        metrics.record_tokens(provider, model, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+        return
+    usage = getattr(result, "usage_metadata", None)
+    if usage is not None:
+        metrics.record_tokens(provider, model, usage.prompt_token_count or 0, usage.candidates_token_count or 0)
+
+
+def _next_delay(attempt, exc, max_retries, base, started, retry_budget):
+    """Seconds to wait before retrying, or None to give up and re-raise."""
+    if attempt >= max_retries or not is_retryable(exc):
+        return None
+    delay = backoff(attempt, exc, base)
+    if retry_budget and time.monotonic() - started + delay > retry_budget:
+        return None
+    return delay
+
+
+def with_retries(call, max_retries: int = LLM_MAX_RETRIES, backoff_seconds: float = LLM_BACKOFF_SECONDS,
+                 retry_budget: float = LLM_RETRY_BUDGET_SECONDS, provider: str = None, tokens: int = 0):
+    """
+    Run call() and retry transient failures with jittered exponential backoff.
+
+    With a provider, every attempt first waits for admission against that
+    provider's rate budget (see admission.py), which may raise Overloaded.
+    """
+    started = time.monotonic()
+    attempt = 0
+    _count("call")
+    while True:
+        ticket = admission.limiter(provider).acquire(tokens) if provider else None
+        try:
+            result = call()
+            if ticket:
+                ticket.settle(_usage_tokens(result))
+            return result
+        except Exception as e:
+            delay = _next_delay(attempt, e, max_retries, backoff_seconds, started, retry_budget)
+            if delay is None:
+                raise
+        _count("retry")
+        time.sleep(delay)
+        attempt += 1
+
+
+async def with_retries_async(call, max_retries: int = LLM_MAX_RETRIES, backoff_seconds: float = LLM_BACKOFF_SECONDS,
+                             retry_budget: float = LLM_RETRY_BUDGET_SECONDS, provider: str = None, tokens: int = 0):
+    """Async variant of with_retries; call() returns an awaitable."""
+    started = time.monotonic()
+    attempt = 0
+    _count("call")
+    while True:
+        ticket = await admission.limiter(provider).acquire_async(tokens) if provider else None
+        try:
+            result = await call()
+            if ticket:
+                ticket.settle(_usage_tokens(result))
+            return result
+        except Exception as e:
+            delay = _next_delay(attempt, e, max_retries, backoff_seconds, started, retry_budget)
+            if delay is None:
+                raise
+        _count("retry")
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def _settle_hedge(ticket, task):
+    # a cancelled or failed duplicate keeps its estimate
+    if not task.cancelled() and task.exception() is None:
+        ticket.settle(_usage_tokens(task.result()))
+
+
+async def _hedged(call, hedge_after: float, provider: str, tokens: int):
+    first = asyncio.ensure_future(call())
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        # the duplicate only goes out if the rate budget has room right now
+        ticket = None if done else admission.limiter(provider).try_acquire(tokens)
+        if ticket:
+            _count("hedge")
+            hedge = asyncio.ensure_future(call())
+            # the caller settles its own ticket; this one is charged for the duplicate
+            hedge.add_done_callback(lambda task: _settle_hedge(ticket, task))
+            tasks.add(hedge)
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        _count("hedge_win")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# -------------------------
+# Chat completions (Groq)
+# -------------------------
+
+def complete(messages, model: str, **kwargs) -> str:
+    """
+    Run a chat completion and return the message text.
+
+    Args:
+        messages: OpenAI-style message list
+        model: Model name, usually one of MODELS
+        **kwargs: Extra create() arguments such as response_format
+    """
+    client = groq_client()
+    with metrics.span("llm"):
+        result = with_retries(
+            lambda: client.chat.completions.create(model=model, messages=messages, **kwargs),
+            provider="groq",
+            tokens=estimate_request_tokens(messages),
+        )
+    _record_usage("groq", model, result)
+    return result.choices[0].message.content
+
+
+async def complete_async(messages, model: str, hedge_after: float = LLM_HEDGE_AFTER_SECONDS, **kwargs) -> str:
+    """Async variant of complete; hedges the request when hedge_after > 0."""
+    client = groq_async_client()
+    tokens = estimate_request_tokens(messages)
+
+    def call():
+        return client.chat.completions.create(model=model, messages=messages, **kwargs)
+
+    attempt = (lambda: _hedged(call, hedge_after, "groq", tokens)) if hedge_after > 0 else call
+    with metrics.span("llm"):
+        result = await with_retries_async(attempt, provider="groq", tokens=tokens)
+    _record_usage("groq", model, result)
+    return result.choices[0].message.content
+
+
+async def stream_completion(messages, model: str, **kwargs):
+    """
+    Stream a chat completion, yielding text deltas.
+
+    Opening the stream is retried like any other call; once text has been
+    yielded a failure is raised to the caller, since it cannot be replayed.
+    """
+    client = groq_async_client()
+    chunk = None
+    with metrics.span("llm"):
+        stream = await with_retries_async(
+            lambda: client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs),
+            provider="groq",
+            tokens=estimate_request_tokens(messages),
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    # usage, when the provider sends it, arrives on the last chunk
+    _record_usage("groq", model, chunk)
+
+
+# -------------------------
+# Gemini
+# -------------------------
+
+def gemini_generate(contents, model: str = MODELS["chat"]) -> str:
+    client = gemini_client()
+    with metrics.span("llm"):
+        result = with_retries(
+            lambda: client.models.generate_content(model=model, contents=contents),
+            provider="gemini",
+            tokens=estimate_request_tokens(contents),
+        )
+    _record_usage("gemini", model, result)
+    return result.text
+
+
+async def gemini_generate_async(contents, model: str = MODELS["chat"], hedge_after: float = LLM_HEDGE_AFTER_SECONDS) -> str:
+    client = gemini_client()
+    tokens = estimate_request_tokens(contents)
+
+    def call():
+        return client.aio.models.generate_content(model=model, contents=contents)
+
+    attempt = (lambda: _hedged(call, hedge_after, "gemini", tokens)) if hedge_after > 0 else call
+    with metrics.span("llm"):
+        result = await with_retries_async(attempt, provider="gemini", tokens=tokens)
+    _record_usage("gemini", model, result)
+    return result.text
+
+
+async def gemini_stream(contents, model: str = MODELS["chat"]):
+    client = gemini_client()
+    chunk = None
+    with metrics.span("llm"):
+        stream = await with_retries_async(
+            lambda: client.aio.models.generate_content_stream(model=model, contents=contents),
+            provider="gemini",
+            tokens=estimate_request_tokens(contents),
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+    _record_usage("gemini", model, chunk)
+
@@ -1,16 +1,46 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+import json
+import logging
+import os
+import traceback
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 
-from flashcard import generate_flashcards
-from qachatbot import process_document, process_prompt
-from generate_mcqs import generate_mcqs_from_pdf, generate_mcqs_from_text
-from generate_schedule import generate_schedule
-from topic import generate_topic_content
+import admission
+import jobs
+import metrics
+import providers
+from flashcard import generate_flashcards, generate_flashcards_async, stream_flashcards
+from qachatbot import (
+    conversation_stats, process_document, process_document_async, process_prompt_async, stream_prompt,
+)
+from generate_mcqs import (
+    generate_mcqs_from_pdf,
+    generate_mcqs_from_pdf_async,
+    generate_mcqs_from_text_async,
+    stream_mcqs_from_pdf,
+    stream_mcqs_from_text,
+)
+from generate_schedule import generate_schedule_async
+from topic import generate_topic_content_async, stream_topic_content
+
+# DEBUG also enables the sampled payload logs (see metrics.log_sampled)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # only checks that keys are set; SDK clients are still built on first use
+    for name, status in providers.check_config().items():
+        if status["missing"]:
+            print(f"Warning: {name} is not configured, {', '.join(status['missing'])} not set")
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,12 +50,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request: Request, exc: admission.Overloaded):
+    # shed load quickly instead of letting the request queue past its deadline
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
 class FilePathRequest(BaseModel):
     Path: str
 
 
 class Message(BaseModel):
     userMessage: str
+    # optional; turns with the same sessionId see the conversation so far
+    sessionId: str | None = None
 
 
 class QuizPrompt(BaseModel):
@@ -36,9 +78,108 @@ class TopicRequest(BaseModel):
     details: str | None = None
     subtopics: list[str] | None = None
 
+
+UPLOAD_RESPONSE = "Thank you for providing your PDF document. I have analyzed it, so now you can ask me any questions regarding it!"
+
+
+def _flashcards_job(path: str):
+    result = generate_flashcards(path)
+    if "error" in result:
+        raise ValueError(result["error"])
+    return result
+
+
+def _quiz_job(path: str):
+    result = generate_mcqs_from_pdf(path)
+    if not result:
+        raise ValueError("Failed to generate MCQs from the document")
+    return result
+
+
+def _upload_job(path: str):
+    return {"botResponse": UPLOAD_RESPONSE, "document": process_document(path)}
+
+
+jobs.register("flashcards", _flashcards_job)
+jobs.register("quizbot", _quiz_job)
+jobs.register("upload", _upload_job)
+
+
+def _submit_job(operation: str, source: str, response: Response) -> dict:
+    try:
+        job_id = jobs.submit(operation, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    status_url = f"/api/jobs/{job_id}"
+    response.headers["Location"] = status_url
+    return {"job_id": job_id, "status_url": status_url}
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    # no-transform/X-Accel-Buffering keep proxies from holding back events
+    return StreamingResponse(events, media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache, no-transform",
+        "X-Accel-Buffering": "no",
+    })
+
+
+async def _start_stream(items, route: str):
+    """
+    Run a stream up to its first item before any response is sent.
+
+    A missing or unreadable PDF (ValueError) then still gets a 400, and a
+    request shed by admission control a 503 with Retry-After, like on the
+    non-streaming routes; only failures after the first item are reported
+    inside the stream.
+    """
+    try:
+        first = [await anext(items)]
+    except StopAsyncIteration:
+        first = []
+    except admission.Overloaded:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Exception in {route}:", e)
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def resumed():
+        for item in first:
+            yield item
+        async for item in items:
+            yield item
+
+    return resumed()
+
+
+async def _ndjson_response(items, route: str) -> StreamingResponse:
+    # one JSON object per line; a failure mid-stream ends with an {"error"} line
+    items = await _start_stream(items, route)
+
+    async def lines():
+        try:
+            async for item in items:
+                yield json.dumps(item) + "\n"
+        except Exception as e:
+            print(f"Exception in {route}:", e)
+            traceback.print_exc()
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={
+        "Cache-Control": "no-cache, no-transform",
+        "X-Accel-Buffering": "no",
+    })
+
+
 @app.post("/api/flashcards")
-def get_flashcards(request: FilePathRequest):
-    result = generate_flashcards(request.Path)
+async def get_flashcards(request: FilePathRequest):
+    result = await generate_flashcards_async(request.Path)
 
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -46,9 +187,19 @@ def get_flashcards(request: FilePathRequest):
     return result
 
 
+@app.post("/api/flashcards/stream")
+async def stream_flashcards_route(request: FilePathRequest):
+    return await _ndjson_response(stream_flashcards(request.Path), "/api/flashcards/stream")
+
+
+@app.post("/api/flashcards/jobs", status_code=202)
+def submit_flashcards_job(request: FilePathRequest, response: Response):
+    return _submit_job("flashcards", request.Path, response)
+
+
 @app.post("/api/quizbot")
-def get_flashcards(request: FilePathRequest):
-    result = generate_mcqs_from_pdf(request.Path)
+async def get_flashcards(request: FilePathRequest):
+    result = await generate_mcqs_from_pdf_async(request.Path)
 
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -56,9 +207,19 @@ def get_flashcards(request: FilePathRequest):
     return result
 
 
+@app.post("/api/quizbot/stream")
+async def stream_quiz_route(request: FilePathRequest):
+    return await _ndjson_response(stream_mcqs_from_pdf(request.Path), "/api/quizbot/stream")
+
+
+@app.post("/api/quizbot/jobs", status_code=202)
+def submit_quiz_job(request: FilePathRequest, response: Response):
+    return _submit_job("quizbot", request.Path, response)
+
+
 @app.post("/api/quizbot/text")
-def get_quiz_from_text(request: QuizPrompt):
-    result = generate_mcqs_from_text(request.prompt)
+async def get_quiz_from_text(request: QuizPrompt):
+    result = await generate_mcqs_from_text_async(request.prompt)
 
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -66,21 +227,48 @@ def get_quiz_from_text(request: QuizPrompt):
     return result
 
 
+@app.post("/api/quizbot/text/stream")
+async def stream_quiz_from_text_route(request: QuizPrompt):
+    return await _ndjson_response(stream_mcqs_from_text(request.prompt), "/api/quizbot/text/stream")
+
+
 @app.post("/api/topic-content")
-def get_topic_content(request: TopicRequest):
+async def get_topic_content(request: TopicRequest):
     try:
-        data = generate_topic_content(
+        data = await generate_topic_content_async(
             topic=request.topic,
             details=request.details,
             subtopics=request.subtopics,
         )
         return data
+    except admission.Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate topic content: {e}")
 
+@app.post("/api/topic-content/stream")
+async def stream_topic_content_route(request: TopicRequest):
+    items = await _start_stream(stream_topic_content(
+        topic=request.topic,
+        details=request.details,
+        subtopics=request.subtopics,
+    ), "/api/topic-content/stream")
+
+    async def events():
+        try:
+            async for event, data in items:
+                # same token payload as the chat stream, so clients share one parser
+                yield _sse(event, {"text": data} if event == "token" else data)
+        except Exception as e:
+            print("Exception in /api/topic-content/stream:", e)
+            traceback.print_exc()
+            yield _sse("error", {"detail": f"Failed to generate topic content: {e}"})
+
+    return _sse_response(events())
+
 @app.post("/api/schedule")
-def get_flashcards(request: Message):
-    result = generate_schedule(request.userMessage)
+async def get_flashcards(request: Message):
+    result = await generate_schedule_async(request.userMessage)
 
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -97,30 +285,101 @@ async def process_message_route(message: Message):
         raise HTTPException(status_code=400, detail="Please provide a message to process.")
 
     try:
-        bot_response = process_prompt(user_message)
+        bot_response = await process_prompt_async(user_message, session_id=message.sessionId)
         return JSONResponse(content={"botResponse": bot_response}, status_code=200)
+    except admission.Overloaded:
+        raise
     except Exception as e:
-        import traceback
         print("Exception in /api/chatbot/chat:", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"There was an error processing your message: {e}")
 
+@app.post("/api/chatbot/chat/stream")
+async def stream_message_route(message: Message):
+    user_message = message.userMessage
+
+    if not user_message:
+        raise HTTPException(status_code=400, detail="Please provide a message to process.")
+
+    texts = await _start_stream(
+        stream_prompt(user_message, session_id=message.sessionId), "/api/chatbot/chat/stream"
+    )
+
+    async def events():
+        try:
+            async for text in texts:
+                yield _sse("token", {"text": text})
+            yield _sse("done", {})
+        except Exception as e:
+            print("Exception in /api/chatbot/chat/stream:", e)
+            traceback.print_exc()
+            yield _sse("error", {"detail": f"There was an error processing your message: {e}"})
+
+    return _sse_response(events())
+
 @app.post("/api/chatbot/upload")
 async def process_document_route(request: FilePathRequest):
     try:
-        process_document(request.Path)
+        report = await process_document_async(request.Path)
         return JSONResponse(content={
-            "botResponse": "Thank you for providing your PDF document. I have analyzed it, so now you can ask me any questions regarding it!"
+            "botResponse": UPLOAD_RESPONSE,
+            "document": report,
         }, status_code=200)
+    except admission.Overloaded:
+        raise
     except Exception as e:
-        import traceback
         print("Exception in /api/chatbot/upload:", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"There was an error processing your document: {e}")
 
+@app.post("/api/chatbot/upload/jobs", status_code=202)
+def submit_upload_job(request: FilePathRequest, response: Response):
+    return _submit_job("upload", request.Path, response)
+
+
+@app.get("/api/jobs/{job_id}")
+def job_status(job_id: str):
+    """Poll a submitted job; `result` is set once `status` is "succeeded"."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+
+@app.get("/metrics")
+def metrics_route():
+    """Prometheus exposition: per-stage latency, token counts and cache hit ratios."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/health/admission")
+def admission_health():
+    """Per-provider rate budget use, queue depth and wait times."""
+    return admission.stats()
+
+
+@app.get("/health/config")
+def config_health():
+    """Which providers are missing configuration and which clients exist yet."""
+    return providers.check_config()
+
+
+@app.get("/health/jobs")
+def jobs_health():
+    return jobs.stats()
+
+
+@app.get("/health/sessions")
+def sessions_health():
+    """Open chat sessions, evictions and how often older turns were summarised."""
+    return conversation_stats()
+
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
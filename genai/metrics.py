@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Share of calls whose prompt/response payloads are logged at DEBUG level.
+DEBUG_SAMPLE_RATE = float(os.getenv("DEBUG_SAMPLE_RATE", "0.01"))
+DEBUG_PAYLOAD_CHARS = int(os.getenv("DEBUG_PAYLOAD_CHARS", "2000"))
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+STAGE_SECONDS = Histogram(
+    "genai_stage_seconds",
+    "Wall time of one pipeline stage",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80),
+)
+STAGE_ERRORS = Counter("genai_stage_errors_total", "Pipeline stages that raised", ["stage"])
+LLM_TOKENS = Histogram(
+    "genai_llm_tokens",
+    "Prompt and completion tokens of one model call, as reported by the provider",
+    ["provider", "model", "kind"],
+    buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+LLM_CALLS = Counter(
+    "genai_llm_calls_total",
+    "Model calls by event: call, retry, hedge (duplicate sent) and hedge_win",
+    ["event"],
+)
+
+
+@contextmanager
+def span(stage: str):
+    """Time the block as `stage`; works around awaits as well as blocking code."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        # cancellation and generator close are not failures of the stage
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_tokens(provider: str, model: str, prompt_tokens: int, completion_tokens: int):
+    if prompt_tokens:
+        LLM_TOKENS.labels(provider, model, "prompt").observe(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(provider, model, "completion").observe(completion_tokens)
+
+
+class _CacheCollector:
+    """Reads hit/miss counts from the caches' own stats() at scrape time."""
+
+    def __init__(self):
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, stats):
+        with self._lock:
+            self._sources[name] = stats
+
+    def collect(self):
+        hits = CounterMetricFamily("genai_cache_hits", "Cache lookups that hit", labels=["cache"])
+        misses = CounterMetricFamily("genai_cache_misses", "Cache lookups that missed", labels=["cache"])
+        ratio = GaugeMetricFamily("genai_cache_hit_ratio", "Hits over lookups since start", labels=["cache"])
+        with self._lock:
+            sources = list(self._sources.items())
+        for name, stats in sources:
+            current = stats()
+            lookups = current["hits"] + current["misses"]
+            hits.add_metric([name], current["hits"])
+            misses.add_metric([name], current["misses"])
+            ratio.add_metric([name], current["hits"] / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+
+_caches = _CacheCollector()
+REGISTRY.register(_caches)
+
+
+def register_cache(name: str, stats):
+    """Export a cache whose stats() returns at least "hits" and "misses"."""
+    _caches.add(name, stats)
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
+
+
+def log_sampled(logger: logging.Logger, label: str, payload):
+    """Log a truncated payload at DEBUG for roughly DEBUG_SAMPLE_RATE of calls."""
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= DEBUG_SAMPLE_RATE:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+    if len(text) > DEBUG_PAYLOAD_CHARS:
+        text = f"{text[:DEBUG_PAYLOAD_CHARS]}... ({len(text)} chars)"
+    logger.debug("%s: %s", label, text)
@@ -0,0 +1,187 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+
+import metrics
+from disk_cache import DiskCache
+from downloader import PdfFile, download_stats, fetch_pdf
+
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Documents with fewer pages are extracted in-process; the pool start-up and
+# pickling cost is not worth it for short handouts.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+
+_cache = DiskCache("pdf_text", max_bytes=PDF_CACHE_MAX_BYTES, suffix=".json")
+metrics.register_cache("pdf_text", _cache.stats)
+# a revalidated (304) download is a hit, a full transfer a miss
+metrics.register_cache("downloads", lambda: {
+    "hits": download_stats()["revalidated"],
+    "misses": download_stats()["downloaded"],
+})
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# sha256 -> Future of the extraction running for that document
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def is_url(pdf_source: str) -> bool:
+    return pdf_source.startswith(('http://', 'https://'))
+
+
+def open_pdf(pdf_source: str) -> PdfFile:
+    """Fetch a URL or hash a local file, returning a PdfFile for extraction."""
+    if is_url(pdf_source):
+        with metrics.span("download"):
+            return fetch_pdf(pdf_source)
+    return PdfFile.from_path(pdf_source)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn keeps workers independent of the server's threads and sockets
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _open_source(source):
+    import pdfplumber  # heavy; loaded on the first extraction
+
+    return pdfplumber.open(source if isinstance(source, str) else BytesIO(source))
+
+
+def _extract_pages(pdf, start: int, stop: int) -> list[str]:
+    texts = []
+    for page in pdf.pages[start:stop]:
+        texts.append(page.extract_text() or "")
+        # drop parsed layout objects so memory stays flat on long documents
+        page.close()
+    return texts
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> list[str]:
+    """Extract pages [start, stop) of a PDF file; runs inside a pool worker."""
+    with _open_source(path) as pdf:
+        return _extract_pages(pdf, start, stop)
+
+
+def _page_ranges(page_count: int, parts: int) -> list[tuple[int, int]]:
+    size = -(-page_count // parts)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+@contextmanager
+def _spooled(source):
+    """A path for the pool workers: in-memory bytes are written to disk once instead of pickled per task."""
+    if isinstance(source, str):
+        yield source
+        return
+    with tempfile.NamedTemporaryFile(dir=_cache.directory, suffix=".pdf", delete=False) as f:
+        f.write(source)
+    try:
+        yield f.name
+    finally:
+        os.remove(f.name)
+
+
+def _parse_pages(source) -> list[str]:
+    with _open_source(source) as pdf:
+        page_count = len(pdf.pages)
+        if PDF_WORKERS <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+            return _extract_pages(pdf, 0, page_count)
+
+        # A few ranges per worker evens out pages that are much slower than others.
+        ranges = _page_ranges(page_count, PDF_WORKERS * 2)
+        with _spooled(source) as path:
+            pool = _get_pool()
+            futures = [pool.submit(_extract_page_range, path, start, stop) for start, stop in ranges[1:]]
+            try:
+                # the document is already open here, so this process takes the first range
+                pages = _extract_pages(pdf, *ranges[0])
+                for future in futures:
+                    pages.extend(future.result())
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return pages
+
+
+def extract_document(pdf_source: str) -> tuple[str, list[str]]:
+    """
+    Extract per-page text from a PDF, reusing cached results for identical files.
+
+    Args:
+        pdf_source: Either a local file path or a Cloudinary URL
+
+    Returns:
+        (SHA-256 of the PDF bytes, list with the text of every page; empty
+        string for pages without text)
+    """
+    with open_pdf(pdf_source) as pdf_file:
+        cached = _cache.get(pdf_file.sha256)
+        if cached is not None:
+            return pdf_file.sha256, json.loads(cached)["pages"]
+        return pdf_file.sha256, _extract_once(pdf_file)
+
+
+def _extract_once(pdf_file: PdfFile) -> list[str]:
+    """
+    Extract and cache a document's pages, once per process however many
+    requests ask for it at the same time; the others wait for that result.
+    """
+    with _in_flight_lock:
+        future = _in_flight.get(pdf_file.sha256)
+        owner = future is None
+        if owner:
+            future = _in_flight[pdf_file.sha256] = Future()
+    if not owner:
+        return list(future.result())
+
+    try:
+        # an extraction that finished just before we registered has cached its pages
+        cached = _cache.get(pdf_file.sha256)
+        if cached is not None:
+            pages = json.loads(cached)["pages"]
+        else:
+            with metrics.span("extract"):
+                pages = _parse_pages(pdf_file.source)
+            _cache.set(pdf_file.sha256, json.dumps({"pages": pages}).encode("utf-8"))
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(pages)
+        return pages
+    finally:
+        with _in_flight_lock:
+            del _in_flight[pdf_file.sha256]
+
+
+def extract_pages(pdf_source: str) -> list[str]:
+    """Extract per-page text from a PDF; see extract_document."""
+    return extract_document(pdf_source)[1]
+
+
+def extract_text(pdf_source: str, separator: str = "\n") -> str:
+    """Extract the text of all non-empty pages joined with `separator`."""
+    pages = extract_pages(pdf_source)
+    return separator.join(page for page in pages if page)
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,52 @@
+import os
+import threading
+
+_providers = {}
+_clients = {}
+_lock = threading.Lock()
+
+
+class Provider:
+    """
+    An SDK client built on first use.
+
+    `required` lists the environment variables the client cannot work
+    without. They are checked by check_config() without importing the SDK
+    or opening a connection, so startup stays cheap.
+    """
+
+    def __init__(self, name: str, factory, required=()):
+        self.name = name
+        self.factory = factory
+        self.required = tuple(required)
+
+    def missing(self) -> list[str]:
+        return [var for var in self.required if not os.getenv(var)]
+
+
+def register(name: str, factory, required=()):
+    _providers[name] = Provider(name, factory, required)
+
+
+def client(name: str):
+    """Return the shared client for `name`, creating it on the first call."""
+    cached = _clients.get(name)
+    if cached is not None:
+        return cached
+    provider = _providers[name]
+    missing = provider.missing()
+    if missing:
+        raise EnvironmentError(f"{', '.join(missing)} not set")
+    with _lock:
+        cached = _clients.get(name)
+        if cached is None:
+            cached = _clients[name] = provider.factory()
+    return cached
+
+
+def check_config() -> dict:
+    """Per provider: missing environment variables and whether a client exists yet."""
+    return {
+        name: {"missing": provider.missing(), "initialized": name in _clients}
+        for name, provider in sorted(_providers.items())
+    }
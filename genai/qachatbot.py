@@ -1,207 +1,352 @@
 import os
-import time
-import numpy as np
-import pdfplumber
-import requests
-from io import BytesIO
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from google import genai
-from pinecone import Pinecone, ServerlessSpec
+
+from embeddings import embed_query, embed_query_async, embed_texts, embed_texts_async
+import admission
+import document_registry
+import lexical_index
+import metrics
+from chunker import iter_chunks
+from conversation import ConversationMemory
+from lexical_index import get_lexical_index
+from llm import MODELS, gemini_client, gemini_generate, gemini_generate_async, gemini_stream
+from pdf_text import extract_document
+from semantic_cache import SemanticCache
+from vector_store import get_vector_store
 
 
 load_dotenv()
 
 # Configuration from environment (set these in .env or environment)
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-EMBED_MODEL = "text-embedding-004"  # New Gemini embedding model
-CHAT_MODEL = "gemini-3-flash-preview"  # New Gemini chat model
+CHAT_MODEL = MODELS["chat"]
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_ENV = os.getenv("PINECONE_ENV")
-PINECONE_INDEX = os.getenv("PINECONE_INDEX", "genai-index")
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+# Vector and lexical hits fetched per query before rank fusion picks top_k.
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+# Bump when chunking changes so registered documents are re-indexed.
+CHUNK_VERSION = 2
 
+# recent turns and a rolling summary per chat session, bounded in tokens
+_memory = ConversationMemory()
+_background_tasks = set()
 
+# paraphrased questions over the same retrieved chunks reuse earlier answers
+_answer_cache = SemanticCache()
+metrics.register_cache("answers", _answer_cache.stats)
 
-# Gemini API key setup
-genai_client = None
-if GEMINI_API_KEY:
-    genai_client = genai.Client(api_key=GEMINI_API_KEY)
 
-# Pinecone client setup
-pc = None
-if PINECONE_API_KEY:
-    pc = Pinecone(api_key=PINECONE_API_KEY)
+def _embed_texts(texts):
+    """Generate embeddings for a list of text chunks using Gemini, as a float32 matrix."""
+    return embed_texts(texts)
 
 
-_chat_history = []
+async def _embed_texts_async(texts):
+    return await embed_texts_async(texts)
 
 
-def _extract_text(pdf_source: str) -> str:
-    """
-    Extract text from PDF either from file path or URL.
-    Args:
-        pdf_source: Either a local file path or a Cloudinary URL
-    Returns:
-        Extracted text from the PDF
-    """
+def _chunk_id(document_id: str, index: int) -> str:
+    # deterministic, so re-indexing the same PDF overwrites instead of duplicating
+    return f"doc-{document_id[:32]}-{index}"
+
+
+def _prepare_chunks(document_path: str):
     try:
-        if pdf_source.startswith(('http://', 'https://')):
-            # Download PDF from URL
-            response = requests.get(pdf_source)
-            response.raise_for_status()
-            pdf_file = BytesIO(response.content)
-            with pdfplumber.open(pdf_file) as pdf:
-                parts = [page.extract_text() for page in pdf.pages if page.extract_text()]
-        else:
-            # Open local file
-            with pdfplumber.open(pdf_source) as pdf:
-                parts = [page.extract_text() for page in pdf.pages if page.extract_text()]
-        return "\n\n".join(parts)
+        document_id, pages = extract_document(document_path)
     except Exception as e:
         raise ValueError(f"Error extracting text from PDF: {str(e)}")
+    with metrics.span("chunk"):
+        chunks = list(iter_chunks(pages))
+    if not chunks:
+        raise ValueError("No text found in the provided PDF.")
+    return document_id, chunks
+
+
+def _indexed_report(document_id: str, namespace: str = None):
+    """Report for a document the registry already has, or None if it must be indexed."""
+    record = document_registry.get(get_vector_store().name, namespace, document_id)
+    if record is None or record.get("chunk_version") != CHUNK_VERSION:
+        return None
+    return {
+        "document_id": document_id,
+        "namespace": namespace,
+        "chunks": record["chunks"],
+        "upserted": 0,
+        "batches": 0,
+        "skipped": True,
+    }
+
+
+def _upsert_chunks(document_id: str, chunks, embeddings, namespace: str = None):
+    store = get_vector_store()
+    vectors = []
+    for chunk, emb in zip(chunks, embeddings):
+        vectors.append((
+            _chunk_id(document_id, chunk.index),
+            emb.tolist(),
+            dict(chunk.metadata, text=chunk.text, document_id=document_id),
+        ))
+
+    def upsert_batch(batch):
+        # use an optional namespace to separate documents
+        store.upsert(batch, namespace=namespace)
+        return len(batch)
+
+    batches = [vectors[i:i + UPSERT_BATCH_SIZE] for i in range(0, len(vectors), UPSERT_BATCH_SIZE)]
+    with metrics.span("upsert"), ThreadPoolExecutor(max_workers=min(UPSERT_CONCURRENCY, len(batches))) as executor:
+        upserted = sum(executor.map(upsert_batch, batches))
+
+    # a previous indexing run with more chunks leaves ids we no longer produce
+    previous = document_registry.get(store.name, namespace, document_id)
+    if previous and previous["chunks"] > len(chunks):
+        store.delete(
+            [_chunk_id(document_id, i) for i in range(len(chunks), previous["chunks"])],
+            namespace=namespace,
+        )
 
+    document_registry.put(store.name, namespace, document_id, {
+        "chunks": len(chunks),
+        "chunk_version": CHUNK_VERSION,
+    })
+    return {
+        "document_id": document_id,
+        "namespace": namespace,
+        "chunks": len(chunks),
+        "upserted": upserted,
+        "batches": len(batches),
+        "skipped": False,
+    }
+
+
+def _index_lexical(document_id: str, chunks, namespace: str = None):
+    index = get_lexical_index()
+    if index.has(document_id, CHUNK_VERSION, namespace):
+        return
+    with metrics.span("lexical_index"):
+        index.add(document_id, CHUNK_VERSION, [
+            (_chunk_id(document_id, chunk.index), chunk.text, dict(chunk.metadata, text=chunk.text, document_id=document_id))
+            for chunk in chunks
+        ], namespace)
+
+
+def process_document(document_path: str, namespace: str = None) -> dict:
+    """
+    Extracts text from a PDF, chunks it, computes Gemini embeddings, and upserts vectors to the vector store.
+    The chunks also go into the namespace's BM25 index.
 
-def _chunk_text(text: str, max_chars: int = 1000):
-    chunks = []
-    start = 0
-    length = len(text)
-    while start < length:
-        end = min(start + max_chars, length)
-        cut = text.rfind("\n", start, end)
-        if cut <= start:
-            cut = text.rfind(" ", start, end)
-        if cut <= start:
-            cut = end
-        chunk = text[start:cut].strip()
-        if chunk:
-            chunks.append(chunk)
-        start = cut
-    return chunks
+    Documents already indexed in this namespace are skipped.
 
+    Returns:
+        Progress report with the document id, chunk count, vectors upserted,
+        number of upsert batches and whether the document was skipped
+    """
+    document_id, chunks = _prepare_chunks(document_path)
+    report = _indexed_report(document_id, namespace)
+    if report is None:
+        embeddings = _embed_texts([chunk.text for chunk in chunks])
+        report = _upsert_chunks(document_id, chunks, embeddings, namespace)
+    # documents indexed before the lexical index existed get their entry here
+    _index_lexical(document_id, chunks, namespace)
+    return report
 
-def _embed_texts(texts):
-    """Generate embeddings for a list of text chunks using Gemini."""
-    if not GEMINI_API_KEY:
-        raise EnvironmentError("GEMINI_API_KEY not set")
-    if genai_client is None:
-        raise EnvironmentError("genai_client not initialized")
-
-    embeddings = []
-    for text in texts:
-        resp = genai_client.models.embed_content(
-            model=EMBED_MODEL,
-            contents=text
-        )
-        # Extract embedding values as float32 numpy array
-        vec = np.array(resp.embeddings[0].values, dtype=np.float32)
-        embeddings.append(vec)
-    return embeddings
-
-
-def _ensure_pinecone_index(dim: int):
-    if not PINECONE_API_KEY:
-        raise EnvironmentError("PINECONE_API_KEY not set in environment")
-    if pc is None:
-        raise EnvironmentError("Pinecone client not initialized")
-    existing = pc.list_indexes().names()
-    if PINECONE_INDEX not in existing:
-        # You may want to update cloud/region as needed
-        pc.create_index(
-            name=PINECONE_INDEX,
-            dimension=dim,
-            metric="cosine",
-            spec=ServerlessSpec(cloud="aws", region="us-west-2")
-        )
-    return pc.Index(PINECONE_INDEX)
 
+async def process_document_async(document_path: str, namespace: str = None) -> dict:
+    """Async variant of process_document; PDF and vector store work run in threads."""
+    document_id, chunks = await asyncio.to_thread(_prepare_chunks, document_path)
+    report = await asyncio.to_thread(_indexed_report, document_id, namespace)
+    if report is None:
+        embeddings = await _embed_texts_async([chunk.text for chunk in chunks])
+        report = await asyncio.to_thread(_upsert_chunks, document_id, chunks, embeddings, namespace)
+    await asyncio.to_thread(_index_lexical, document_id, chunks, namespace)
+    return report
 
-def process_document(document_path: str, namespace: str = None):
-    """Extracts text from a PDF, chunks it, computes Gemini embeddings, and upserts vectors to Pinecone."""
-    text = _extract_text(document_path)
-    chunks = _chunk_text(text, max_chars=1200)
-    if not chunks:
-        raise ValueError("No text found in the provided PDF.")
-    embeddings = _embed_texts(chunks)
 
-    # ensure index exists and upsert
-    idx = _ensure_pinecone_index(dim=len(embeddings[0]))
-    vectors = []
-    ts = int(time.time())
-    for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-        vid = f"doc-{ts}-{i}"
-        vectors.append((vid, emb.tolist(), {"text": chunk}))
-
-    # use an optional namespace to separate documents
-    if namespace:
-        idx.upsert(vectors=vectors, namespace=namespace)
-    else:
-        idx.upsert(vectors=vectors)
+def _check_chat_clients():
+    # raises EnvironmentError when GEMINI_API_KEY is missing
+    gemini_client()
 
 
-def process_prompt(prompt: str, top_k: int = 4, namespace: str = None) -> str:
-    """Answers a user prompt by querying Pinecone for relevant chunks and calling Gemini chat."""
-    if not PINECONE_API_KEY:
-        raise EnvironmentError("PINECONE_API_KEY not set in environment")
-    if genai_client is None:
-        raise EnvironmentError("genai_client not initialized")
+def _search_lexical(prompt: str, top_k: int, namespace: str = None):
+    with metrics.span("lexical"):
+        return get_lexical_index().search(prompt, max(top_k, RETRIEVAL_CANDIDATES), namespace)
 
-    # Embed the query using new API
-    qresp = genai_client.models.embed_content(
-        model=EMBED_MODEL,
-        contents=prompt
-    )
-    q_vec = qresp.embeddings[0].values
 
-    idx = pc.Index(PINECONE_INDEX)
-    query_args = {"top_k": top_k, "include_metadata": True}
-    if namespace:
-        query_args["namespace"] = namespace
+def _lexical_only(lexical, namespace: str = None) -> bool:
+    """Whether the lexical hits can stand in for vector search."""
+    if not lexical_index.confident(lexical):
+        return False
+    # the lexical index only knows documents uploaded on this host, so it must
+    # hold exactly what the vector store holds; Pinecone cannot list its documents
+    documents = get_vector_store().document_ids(namespace)
+    return documents is not None and documents == get_lexical_index().documents(namespace, CHUNK_VERSION)
 
-    # Query Pinecone
-    try:
-        res = idx.query(vector=q_vec, **query_args)
-    except TypeError:
-        # fallback signature
-        res = idx.query(queries=[q_vec], **query_args)
 
-    matches = []
-    if isinstance(res, dict):
-        matches = res.get("matches", [])
-    elif hasattr(res, "matches"):
-        matches = res.matches
+def _retrieve(q_vec, top_k: int, namespace: str = None, lexical=()):
+    """
+    Return (context key, context text) for the top_k chunks closest to q_vec,
+    fused by reciprocal rank with the lexical hits when there are any.
+    """
+    candidates = max(top_k, RETRIEVAL_CANDIDATES) if lexical else top_k
+    with metrics.span("retrieve"):
+        matches = get_vector_store().query(q_vec, top_k=candidates, namespace=namespace)
+    if lexical:
+        matches = lexical_index.fuse([matches, lexical], top_k)
+    return _context(matches, top_k)
+
 
+def _context(matches, top_k: int):
+    ids = []
     context_chunks = []
     for m in matches[:top_k]:
-        md = m.get("metadata") if isinstance(m, dict) else getattr(m, "metadata", None)
+        md = m["metadata"]
         if md and "text" in md:
+            ids.append(m["id"])
             context_chunks.append(md["text"])
 
-    if not context_chunks:
-        context = ""
-    else:
-        context = "\n\n---\n\n".join(context_chunks)
+    context = "\n\n---\n\n".join(context_chunks)
+    # ids plus a digest of the text: a re-indexed chunk with new text is new context
+    context_key = (tuple(ids), hashlib.sha256(context.encode("utf-8")).hexdigest())
+    return context_key, context
+
 
+def _build_prompt(prompt: str, context: str, history: str = "") -> str:
     # Concatenate system and user prompts into single string (new SDK doesn't use roles)
-    combined_prompt = (
+    conversation = f"CONVERSATION SO FAR:\n{history}\n\n" if history else ""
+    return (
         "You are Disha Mitra, an educational mentor who helps students understand study material clearly and confidently. "
         "Answer concisely and supportively; when relevant, indicate which part of the provided context supports your answer.\n\n"
         f"CONTEXT:\n{context}\n\n"
+        f"{conversation}"
         f"QUESTION: {prompt}\n\n"
         f"Answer:"
     )
 
-    # Generate response using new API
-    resp = genai_client.models.generate_content(
-        model=CHAT_MODEL,
-        contents=combined_prompt
-    )
 
-    # Extract the text from response
-    answer = resp.text
+def _with_history(context_key, history: str):
+    # a follow-up's answer depends on the conversation, so only identical histories share answers
+    if not history:
+        return context_key
+    return context_key + (hashlib.sha256(history.encode("utf-8")).hexdigest(),)
+
+
+def _schedule_compaction(session_id: str):
+    task = asyncio.create_task(_memory.compact_async(session_id))
+    # keep a reference so the task is not garbage collected mid-flight
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
-    _chat_history.append((prompt, answer))
+
+def process_prompt(prompt: str, top_k: int = 4, namespace: str = None, session_id: str = None) -> str:
+    """
+    Answers a user prompt by querying the vector store for relevant chunks and calling Gemini chat.
+
+    With a session_id, earlier turns of that session are included in the prompt
+    and this turn is added to them.
+    """
+    with admission.priority(admission.INTERACTIVE):
+        return _process_prompt(prompt, top_k, namespace, session_id)
+
+
+def _process_prompt(prompt: str, top_k: int, namespace: str, session_id: str) -> str:
+    _check_chat_clients()
+
+    q_vec = None
+    lexical = _search_lexical(prompt, top_k, namespace)
+    if _lexical_only(lexical, namespace):
+        # an exact keyword hit: no query embedding or vector store round-trip needed
+        context_key, context = _context(lexical, top_k)
+    else:
+        # Embed the query (repeated questions come from the embedding cache)
+        q_vec = embed_query(prompt)
+        context_key, context = _retrieve(q_vec, top_k, namespace, lexical)
+    history = _memory.history(session_id)
+    context_key = _with_history(context_key, history)
+
+    answer = _answer_cache.lookup(namespace, q_vec, context_key) if q_vec is not None else None
+    if answer is None:
+        answer = gemini_generate(_build_prompt(prompt, context, history), CHAT_MODEL)
+        if q_vec is not None:
+            _answer_cache.store(namespace, q_vec, context_key, answer)
+
+    if session_id and _memory.record(session_id, prompt, answer):
+        _memory.compact(session_id)
+    return answer
+
+
+async def _retrieve_async(prompt: str, top_k: int, namespace: str):
+    """Return (query vector, context key, context); the vector is None when the lexical hit sufficed."""
+    lexical = await asyncio.to_thread(_search_lexical, prompt, top_k, namespace)
+    if await asyncio.to_thread(_lexical_only, lexical, namespace):
+        return None, *_context(lexical, top_k)
+    q_vec = await embed_query_async(prompt)
+    return q_vec, *await asyncio.to_thread(_retrieve, q_vec, top_k, namespace, lexical)
+
+
+async def process_prompt_async(prompt: str, top_k: int = 4, namespace: str = None, session_id: str = None) -> str:
+    """Async variant of process_prompt; the vector store query runs in a thread."""
+    with admission.priority(admission.INTERACTIVE):
+        return await _process_prompt_async(prompt, top_k, namespace, session_id)
+
+
+async def _process_prompt_async(prompt: str, top_k: int, namespace: str, session_id: str) -> str:
+    _check_chat_clients()
+
+    q_vec, context_key, context = await _retrieve_async(prompt, top_k, namespace)
+    history = await asyncio.to_thread(_memory.history, session_id)
+    context_key = _with_history(context_key, history)
+
+    answer = _answer_cache.lookup(namespace, q_vec, context_key) if q_vec is not None else None
+    if answer is None:
+        answer = await gemini_generate_async(_build_prompt(prompt, context, history), CHAT_MODEL)
+        if q_vec is not None:
+            _answer_cache.store(namespace, q_vec, context_key, answer)
+
+    # summarising older turns is not on the critical path of this answer
+    if session_id and await asyncio.to_thread(_memory.record, session_id, prompt, answer):
+        _schedule_compaction(session_id)
     return answer
 
 
+async def stream_prompt(prompt: str, top_k: int = 4, namespace: str = None, session_id: str = None):
+    """Like process_prompt_async, but yields answer text pieces as Gemini produces them."""
+    with admission.priority(admission.INTERACTIVE):
+        async for text in _stream_prompt(prompt, top_k, namespace, session_id):
+            yield text
+
+
+async def _stream_prompt(prompt: str, top_k: int, namespace: str, session_id: str):
+    _check_chat_clients()
+
+    q_vec, context_key, context = await _retrieve_async(prompt, top_k, namespace)
+    history = await asyncio.to_thread(_memory.history, session_id)
+    context_key = _with_history(context_key, history)
+
+    answer = _answer_cache.lookup(namespace, q_vec, context_key) if q_vec is not None else None
+    if answer is not None:
+        yield answer
+    else:
+        parts = []
+        async for text in gemini_stream(_build_prompt(prompt, context, history), CHAT_MODEL):
+            parts.append(text)
+            yield text
+        answer = "".join(parts)
+        if q_vec is not None:
+            _answer_cache.store(namespace, q_vec, context_key, answer)
+
+    if session_id and await asyncio.to_thread(_memory.record, session_id, prompt, answer):
+        _schedule_compaction(session_id)
+
+
+def answer_cache_stats() -> dict:
+    return _answer_cache.stats()
+
+
+def conversation_stats() -> dict:
+    return _memory.stats()
+
+
 if __name__ == "__main__":
-    print("This module now uses Pinecone for vector storage. Use `process_document(path)` and `process_prompt(prompt)`.")
\ No newline at end of file
+    print("This module stores vectors in Pinecone or, with VECTOR_STORE=local, on disk. Use `process_document(path)` and `process_prompt(prompt)`.")
\ No newline at end of file
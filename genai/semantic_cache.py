@@ -0,0 +1,72 @@
+import itertools
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+
+def _unit(vector) -> np.ndarray:
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SemanticCache:
+    """
+    Per-namespace LRU of (query embedding, retrieved context, answer).
+
+    A lookup hits when an earlier query retrieved exactly the same context and
+    its embedding is within `threshold` cosine similarity of the new query, so
+    paraphrased questions about the same passages reuse the earlier answer.
+    """
+
+    def __init__(self, max_entries: int = SEMANTIC_CACHE_SIZE, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._namespaces: dict[str, OrderedDict] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def lookup(self, namespace: str, query_vector, context_key):
+        q = _unit(query_vector)
+        with self._lock:
+            entries = self._namespaces.get(namespace or "")
+            candidates = [
+                (entry_id, entry) for entry_id, entry in (entries or {}).items()
+                if entry[1] == context_key
+            ]
+            if candidates:
+                scores = np.stack([entry[0] for _, entry in candidates]) @ q
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry[2]
+            self.misses += 1
+            return None
+
+    def store(self, namespace: str, query_vector, context_key, answer: str):
+        with self._lock:
+            entries = self._namespaces.setdefault(namespace or "", OrderedDict())
+            entries[next(self._ids)] = (_unit(query_vector), context_key, answer)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            entries = sum(len(e) for e in self._namespaces.values())
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,377 @@
+"""
+Rule-based parser for the end date or duration in a study request.
+
+Handles durations ("next 7 days", "in 3 weeks", "a couple of months"),
+calendar dates ("till 5th Dec", "by 2026-12-05", "12/05"), period ends
+("by end of next month", "end of june") and relative days ("tomorrow",
+"by friday"). Misspelled month, weekday and unit words are corrected with a
+symmetric-delete index built once at import.
+"""
+import calendar
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+
+MONTHS = {
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6,
+    "july": 7, "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+}
+MONTH_ABBREVIATIONS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "jun": 6, "jul": 7, "aug": 8,
+    "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4,
+    "saturday": 5, "sunday": 6,
+}
+WEEKDAY_ABBREVIATIONS = {
+    "mon": 0, "tue": 1, "tues": 1, "wed": 2, "thu": 3, "thur": 3, "thurs": 3,
+    "fri": 4, "sat": 5, "sun": 6,
+}
+UNITS = {
+    "day": 1, "days": 1, "week": 7, "weeks": 7, "fortnight": 14, "fortnights": 14,
+    "month": 30, "months": 30, "year": 365, "years": 365,
+}
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "fifteen": 15, "twenty": 20, "thirty": 30, "couple": 2, "few": 3,
+}
+KEYWORDS = {
+    "next", "this", "coming", "end", "of", "the", "by", "till", "until", "til",
+    "before", "through", "thru", "upto", "in", "within", "for", "over",
+    "tomorrow", "today", "tonight", "weekend",
+}
+
+# Words after which a bare month or weekday is read as a deadline.
+_DEADLINE_WORDS = {"by", "till", "until", "til", "before", "through", "thru", "upto", "in", "next", "this", "coming"}
+# Deadlines that mean "before this starts" rather than "through the end of it".
+_START_WORDS = {"by", "before"}
+
+_TOKEN_RE = re.compile(
+    r"(?P<iso>(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2}))"
+    # day first; dotted dates need a year so "1.5 weeks" stays a number
+    r"|(?P<dmy>(?P<d>\d{1,2})(?:/(?P<m>\d{1,2})(?:/(?P<y>\d{2,4}))?|\.(?P<dm>\d{1,2})\.(?P<dy>\d{2,4})))"
+    r"|(?P<number>\d+(?:\.\d+)?)(?:st|nd|rd|th)?"
+    r"|(?P<word>[a-z]+)"
+)
+
+
+def _vocabulary() -> dict:
+    vocabulary = {}
+    vocabulary.update({w: ("month", n) for w, n in MONTHS.items()})
+    vocabulary.update({w: ("month", n) for w, n in MONTH_ABBREVIATIONS.items()})
+    vocabulary.update({w: ("weekday", n) for w, n in WEEKDAYS.items()})
+    vocabulary.update({w: ("weekday", n) for w, n in WEEKDAY_ABBREVIATIONS.items()})
+    vocabulary.update({w: ("unit", n) for w, n in UNITS.items()})
+    vocabulary.update({w: ("number", n) for w, n in NUMBER_WORDS.items()})
+    vocabulary.update({w: ("keyword", w) for w in KEYWORDS})
+    return vocabulary
+
+
+def _deletes(word: str, distance: int) -> set:
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent swaps)."""
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class TypoIndex:
+    """
+    Symmetric-delete spelling index.
+
+    Every vocabulary word is stored under all strings reachable by deleting
+    up to its allowed number of characters; a query only has to generate its
+    own deletes and verify the few words that share one. Words of three
+    letters or fewer must match exactly, longer ones allow one typo, and
+    words of six letters or more allow two.
+    """
+
+    def __init__(self, vocabulary: dict, fuzzy_kinds=("month", "weekday", "unit", "keyword")):
+        self.vocabulary = vocabulary
+        self._deletes = {}
+        for word, meaning in vocabulary.items():
+            if meaning[0] not in fuzzy_kinds:
+                continue
+            for variant in _deletes(word, self.max_distance(word)):
+                self._deletes.setdefault(variant, set()).add(word)
+
+    @staticmethod
+    def max_distance(word: str) -> int:
+        if len(word) <= 3:
+            return 0
+        return 1 if len(word) <= 5 else 2
+
+    def lookup(self, word: str):
+        """Return the (kind, value) meaning of a word or its closest spelling, or None."""
+        meaning = self.vocabulary.get(word)
+        if meaning is not None:
+            return meaning
+        limit = self.max_distance(word)
+        if not limit:
+            return None
+        candidates = set()
+        for variant in _deletes(word, limit):
+            candidates |= self._deletes.get(variant, set())
+
+        best = None
+        meanings = set()
+        for candidate in candidates:
+            distance = _edit_distance(word, candidate)
+            if distance > min(limit, self.max_distance(candidate)):
+                continue
+            if best is None or distance < best:
+                best, meanings = distance, {self.vocabulary[candidate]}
+            elif distance == best:
+                meanings.add(self.vocabulary[candidate])
+        # a typo equally close to two different meanings is not guessed
+        if len(meanings) != 1:
+            return None
+        return meanings.pop()
+
+
+_index = TypoIndex(_vocabulary())
+
+
+@lru_cache(maxsize=4096)
+def _lookup_word(word: str):
+    return _index.lookup(word)
+
+
+@lru_cache(maxsize=1024)
+def _tokenize(text: str) -> tuple:
+    tokens = []
+    for m in _TOKEN_RE.finditer(text.lower()):
+        if m.group("iso"):
+            tokens.append(("date", (int(m.group("iso_y")), int(m.group("iso_m")), int(m.group("iso_d")))))
+        elif m.group("dmy"):
+            month = m.group("m") or m.group("dm")
+            year = m.group("y") or m.group("dy")
+            if year and len(year) == 2:
+                year = "20" + year
+            tokens.append(("date", (int(year) if year else None, int(month), int(m.group("d")))))
+        elif m.group("number"):
+            number = m.group("number")
+            tokens.append(("number", float(number) if "." in number else int(number)))
+        else:
+            meaning = _lookup_word(m.group("word"))
+            tokens.append(meaning or ("word", m.group("word")))
+    return tuple(tokens)
+
+
+def _make_date(year, month: int, day: int, today: date):
+    try:
+        result = date(year or today.year, month, day)
+    except ValueError:
+        return None
+    if year is None and result < today:
+        result = result.replace(year=today.year + 1)
+    return result
+
+
+def _month_end(year: int, month: int) -> date:
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _month_deadline(month: int, year, today: date, at_start: bool) -> date:
+    if year is None:
+        year = today.year if month >= today.month else today.year + 1
+    return date(year, month, 1) if at_start else _month_end(year, month)
+
+
+def _period_end(unit_days: int, offset: int, today: date):
+    if unit_days == 7:
+        return today + timedelta(days=6 - today.weekday() + 7 * offset)
+    if unit_days == 30:
+        month = today.month - 1 + offset
+        return _month_end(today.year + month // 12, month % 12 + 1)
+    if unit_days == 365:
+        return date(today.year + offset, 12, 31)
+    return None
+
+
+def _next_weekday(weekday: int, today: date) -> date:
+    return today + timedelta(days=(weekday - today.weekday() - 1) % 7 + 1)
+
+
+class _Reader:
+    """Walks the token list and collects every end date it can read."""
+
+    def __init__(self, tokens: tuple, today: date):
+        self.tokens = tokens
+        self.today = today
+        self.ends = []
+        # "starting tomorrow" is usually a start, so these only count alone
+        self.weak_ends = []
+
+    def kind(self, i: int):
+        return self.tokens[i][0] if i < len(self.tokens) else None
+
+    def value(self, i: int):
+        return self.tokens[i][1] if i < len(self.tokens) else None
+
+    def is_keyword(self, i: int, *words) -> bool:
+        return self.kind(i) == "keyword" and self.value(i) in words
+
+    def previous_keyword(self, i: int):
+        j = i - 1
+        while j >= 0 and self.is_keyword(j, "the"):
+            j -= 1
+        return self.value(j) if j >= 0 and self.kind(j) == "keyword" else None
+
+    def year_at(self, i: int):
+        value = self.value(i)
+        if self.kind(i) == "number" and 1900 < value < 2200:
+            return value
+        return None
+
+    def read(self):
+        i = 0
+        while i < len(self.tokens):
+            i = self.step(i)
+        return self.ends or self.weak_ends
+
+    def step(self, i: int) -> int:
+        kind, value = self.tokens[i]
+        today = self.today
+
+        if self.is_keyword(i, "end") and self.is_keyword(i + 1, "of"):
+            j = i + 2
+            while self.is_keyword(j, "the"):
+                j += 1
+            offset = 0
+            if self.is_keyword(j, "this", "coming", "next"):
+                offset = 1 if self.value(j) == "next" else 0
+                j += 1
+            if self.kind(j) == "unit":
+                end = _period_end(self.value(j), offset, today)
+                if end:
+                    self.ends.append(end)
+                return j + 1
+            if self.kind(j) == "month":
+                year = self.year_at(j + 1)
+                self.ends.append(_month_deadline(self.value(j), year, today, at_start=False))
+                return j + (2 if year else 1)
+            return i + 2
+
+        if kind == "number" and value == 1 and self.kind(i + 1) == "number" and self.value(i + 1) in (2, 3):
+            # "a couple of weeks", "a few days"
+            return i + 1
+
+        if kind == "number":
+            j = i + 1
+            if self.is_keyword(j, "of"):
+                j += 1
+            if self.kind(j) == "unit":
+                self.ends.append(today + timedelta(days=round(value * self.value(j)) - 1))
+                return j + 1
+            if isinstance(value, int) and 1 <= value <= 31:
+                # "5th dec", "5 of december 2026"
+                if self.kind(j) == "month":
+                    year = self.year_at(j + 1)
+                    end = _make_date(year, self.value(j), value, today)
+                    if end:
+                        self.ends.append(end)
+                    return j + (2 if year else 1)
+            return i + 1
+
+        if kind == "month":
+            # "dec 5", "december 5th 2026"
+            day = self.value(i + 1)
+            if self.kind(i + 1) == "number" and isinstance(day, int) and 1 <= day <= 31 and self.kind(i + 2) != "unit":
+                year = self.year_at(i + 2)
+                end = _make_date(year, value, self.value(i + 1), today)
+                if end:
+                    self.ends.append(end)
+                return i + (3 if year else 2)
+            previous = self.previous_keyword(i)
+            if previous in _DEADLINE_WORDS:
+                year = self.year_at(i + 1)
+                self.ends.append(_month_deadline(value, year, today, at_start=previous in _START_WORDS))
+                return i + (2 if year else 1)
+            return i + 1
+
+        if kind == "weekday":
+            if self.previous_keyword(i) in _DEADLINE_WORDS:
+                self.ends.append(_next_weekday(value, today))
+            return i + 1
+
+        if kind == "unit" and self.is_keyword(i - 1, "next", "this", "coming"):
+            if self.value(i - 1) == "this":
+                end = _period_end(value, 0, today)
+            else:
+                # "next week" has always meant the coming seven days
+                end = today + timedelta(days=value - 1)
+            if end:
+                self.ends.append(end)
+            return i + 1
+
+        if kind == "keyword":
+            end = None
+            if value == "tomorrow":
+                end = today + timedelta(days=1)
+            elif value in ("today", "tonight"):
+                end = today
+            elif value == "weekend":
+                end = today + timedelta(days=6 - today.weekday())
+            if end:
+                deadline = self.previous_keyword(i) in _DEADLINE_WORDS
+                (self.ends if deadline else self.weak_ends).append(end)
+            return i + 1
+
+        if kind == "date":
+            year, month, day = value
+            end = _make_date(year, month, day, today)
+            if end:
+                self.ends.append(end)
+        return i + 1
+
+
+@lru_cache(maxsize=1024)
+def _parse(text: str, today: date):
+    try:
+        ends = set(_Reader(_tokenize(text), today).read())
+    except (OverflowError, ValueError):
+        # "99999999999 days" and the like fall outside what date can hold
+        return None
+    # nothing found, or conflicting answers: leave it to the caller
+    if len(ends) != 1:
+        return None
+    days = (ends.pop() - today).days + 1
+    return days if days >= 1 else None
+
+
+def parse_total_days(text: str, today: date = None):
+    """
+    Number of days from today through the end date or duration in text.
+
+    Args:
+        text: Free-form request such as "study graphs till 5th Dec"
+        today: Reference date, defaults to the current date
+
+    Returns:
+        Day count (today counts as day 1), or None when the text has no
+        recognizable date or duration or mentions several that disagree
+    """
+    return _parse(" ".join(text.split()), today or date.today())
+
+
+def cache_info():
+    return _parse.cache_info()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the service modules are flat files in genai/, and the benchmarks live beside them
+GENAI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, GENAI_DIR)
+sys.path.insert(0, os.path.join(GENAI_DIR, "bench"))
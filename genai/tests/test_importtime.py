@@ -0,0 +1,19 @@
+import os
+
+from bench_importtime import LAZY_MODULES, cumulative_us, measure
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "800"))
+RUNS = 3
+
+
+def _best_import():
+    # the fastest of a few cold imports, so one slow run on a busy machine does not fail the test
+    return min((measure("main") for _ in range(RUNS)), key=lambda modules: cumulative_us(modules, "main"))
+
+
+def test_import_main_within_budget_and_lazy():
+    modules = _best_import()
+    total_ms = cumulative_us(modules, "main") / 1000
+    assert total_ms <= IMPORT_BUDGET_MS, f"import main took {total_ms:.0f} ms, budget {IMPORT_BUDGET_MS:.0f} ms"
+    imported = {entry[0] for entry in modules}
+    assert not imported & set(LAZY_MODULES), f"imported eagerly: {sorted(imported & set(LAZY_MODULES))}"
@@ -0,0 +1,19 @@
+import json
+import os
+from datetime import date
+
+import pytest
+
+import temporal
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench", "temporal_golden.json")
+
+with open(GOLDEN_PATH) as f:
+    GOLDEN = json.load(f)
+
+
+@pytest.mark.parametrize("case", GOLDEN["cases"], ids=lambda case: case["text"])
+def test_golden(case):
+    # a null "days" means the text is left to the LLM fallback
+    today = date.fromisoformat(GOLDEN["today"])
+    assert temporal.parse_total_days(case["text"], today) == case["days"]
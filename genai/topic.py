@@ -1,19 +1,79 @@
 import os
 import json
-from openai import OpenAI
+import time
+import asyncio
+import hashlib
+import threading
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+import metrics
+from disk_cache import DiskCache
+from json_stream import JsonStreamParser
+from llm import MODELS, complete, complete_async, stream_completion
 
-if not GROQ_API_KEY:
-    raise ValueError("❌ GROQ_API_KEY not found in environment variables.")
+TOPIC_MODEL = MODELS["topic"]
+# Bump whenever the prompt or schema below changes so cached documents expire.
+TOPIC_PROMPT_VERSION = 1
 
-client = OpenAI(
-    api_key=GROQ_API_KEY,
-    base_url="https://api.groq.com/openai/v1",
-)
+# Cached documents are served as-is for TOPIC_CACHE_TTL seconds, then served
+# stale while a background refresh runs for another TOPIC_CACHE_STALE_SECONDS.
+TOPIC_CACHE_TTL = int(os.getenv("TOPIC_CACHE_TTL", str(7 * 24 * 3600)))
+TOPIC_CACHE_STALE_SECONDS = int(os.getenv("TOPIC_CACHE_STALE_SECONDS", str(30 * 24 * 3600)))
+TOPIC_CACHE_MAX_BYTES = int(os.getenv("TOPIC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
 
+_cache = DiskCache("topics", max_bytes=TOPIC_CACHE_MAX_BYTES, suffix=".json")
+metrics.register_cache("topics", _cache.stats)
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_background_tasks = set()
 
-def generate_topic_content(topic: str, details: str | None = None, subtopics: list[str] | None = None):
+
+def _normalize(value: str | None) -> str:
+    return " ".join((value or "").split()).casefold()
+
+
+def _cache_key(topic: str, details: str | None, subtopics: list[str] | None) -> str:
+    normalized_subtopics = sorted(filter(None, (_normalize(s) for s in subtopics or [])))
+    payload = json.dumps([
+        _normalize(topic),
+        _normalize(details),
+        normalized_subtopics,
+        TOPIC_MODEL,
+        TOPIC_PROMPT_VERSION,
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str):
+    """Return (document, is_stale), or (None, False) on a miss."""
+    raw = _cache.get(key)
+    if raw is None:
+        return None, False
+    entry = json.loads(raw)
+    age = time.time() - entry["created_at"]
+    if age > TOPIC_CACHE_TTL + TOPIC_CACHE_STALE_SECONDS:
+        _cache.delete(key)
+        return None, False
+    return entry["data"], age > TOPIC_CACHE_TTL
+
+
+def _cache_put(key: str, data: dict):
+    _cache.set(key, json.dumps({"created_at": time.time(), "data": data}).encode("utf-8"))
+
+
+def _claim_refresh(key: str) -> bool:
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+        return True
+
+
+def _release_refresh(key: str):
+    with _refreshing_lock:
+        _refreshing.discard(key)
+
+
+def _build_messages(topic: str, details: str | None, subtopics: list[str] | None):
     schema = {
         "topic": "",
         "overview": "",
@@ -94,15 +154,133 @@ Subtopics:
 {os.linesep.join(f"- {s}" for s in subtopics_list)}
 """
 
-    result = client.chat.completions.create(
-        model="moonshotai/kimi-k2-instruct-0905",
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": user_content}
+    ]
+
+
+def _generate(topic: str, details: str | None, subtopics: list[str] | None):
+    raw = complete(
+        _build_messages(topic, details, subtopics),
+        TOPIC_MODEL,
         response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": user_content}
-        ],
     )
+    with metrics.span("parse"):
+        return json.loads(raw)
+
+
+async def _generate_async(topic: str, details: str | None, subtopics: list[str] | None):
+    raw = await complete_async(
+        _build_messages(topic, details, subtopics),
+        TOPIC_MODEL,
+        response_format={"type": "json_object"},
+    )
+    with metrics.span("parse"):
+        return json.loads(raw)
+
+
+def _refresh(key: str, topic: str, details: str | None, subtopics: list[str] | None):
+    try:
+        _cache_put(key, _generate(topic, details, subtopics))
+    except Exception as e:
+        print(f"Background refresh of topic '{topic}' failed: {e}")
+    finally:
+        _release_refresh(key)
 
-    raw = result.choices[0].message.content
-    data = json.loads(raw)
+
+async def _refresh_async(key: str, topic: str, details: str | None, subtopics: list[str] | None):
+    try:
+        _cache_put(key, await _generate_async(topic, details, subtopics))
+    except Exception as e:
+        print(f"Background refresh of topic '{topic}' failed: {e}")
+    finally:
+        _release_refresh(key)
+
+
+def _schedule_refresh_async(key: str, topic: str, details: str | None, subtopics: list[str] | None):
+    if _claim_refresh(key):
+        task = asyncio.create_task(_refresh_async(key, topic, details, subtopics))
+        # keep a reference so the task is not garbage collected mid-flight
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+def generate_topic_content(topic: str, details: str | None = None, subtopics: list[str] | None = None):
+    key = _cache_key(topic, details, subtopics)
+    cached, stale = _cache_get(key)
+    if cached is not None:
+        if stale and _claim_refresh(key):
+            threading.Thread(target=_refresh, args=(key, topic, details, subtopics), daemon=True).start()
+        return cached
+
+    data = _generate(topic, details, subtopics)
+    _cache_put(key, data)
+    return data
+
+
+async def generate_topic_content_async(topic: str, details: str | None = None, subtopics: list[str] | None = None):
+    key = _cache_key(topic, details, subtopics)
+    cached, stale = await asyncio.to_thread(_cache_get, key)
+    if cached is not None:
+        if stale:
+            _schedule_refresh_async(key, topic, details, subtopics)
+        return cached
+
+    data = await _generate_async(topic, details, subtopics)
+    await asyncio.to_thread(_cache_put, key, data)
     return data
+
+
+def _cached_events(data: dict):
+    for key, value in data.items():
+        if isinstance(value, list):
+            for index, item in enumerate(value):
+                yield "section", {"key": key, "index": index, "value": item}
+        else:
+            yield "section", {"key": key, "value": value}
+    yield "done", data
+
+
+async def stream_topic_content(topic: str, details: str | None = None, subtopics: list[str] | None = None):
+    """
+    Stream topic content as it is generated.
+
+    Yields (event, data) pairs:
+        ("token", text) for every piece of model output,
+        ("section", {"key", "value"}) when a top-level section completes,
+        ("section", {"key", "index", "value"}) for each entry of a list section,
+        ("done", full_document) once the JSON closes.
+
+    Cached documents are replayed as section events without any tokens.
+    """
+    key = _cache_key(topic, details, subtopics)
+    cached, stale = await asyncio.to_thread(_cache_get, key)
+    if cached is not None:
+        if stale:
+            _schedule_refresh_async(key, topic, details, subtopics)
+        for event in _cached_events(cached):
+            yield event
+        return
+
+    stream = stream_completion(
+        _build_messages(topic, details, subtopics),
+        TOPIC_MODEL,
+        response_format={"type": "json_object"},
+    )
+
+    parser = JsonStreamParser(max_depth=2)
+    async for delta in stream:
+        yield "token", delta
+        for path, value in parser.feed(delta):
+            if len(path) == 2 and isinstance(path[1], int):
+                yield "section", {"key": path[0], "index": path[1], "value": value}
+            elif len(path) == 1 and not isinstance(value, list):
+                # list sections were already sent entry by entry
+                yield "section", {"key": path[0], "value": value}
+
+    if not parser.done:
+        raise ValueError("Model output ended before the JSON document was complete")
+    data = parser.result()
+    await asyncio.to_thread(_cache_put, key, data)
+    yield "done", data
@@ -0,0 +1,390 @@
+import fcntl
+import json
+import os
+import re
+import threading
+import uuid
+
+import numpy as np
+from dotenv import load_dotenv
+
+import providers
+
+load_dotenv()
+
+# "pinecone" (default) or "local"
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone").lower()
+
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+PINECONE_ENV = os.getenv("PINECONE_ENV")
+PINECONE_INDEX = os.getenv("PINECONE_INDEX", "genai-index")
+# Control-plane endpoint override, e.g. for the local stand-in in bench/.
+PINECONE_HOST = os.getenv("PINECONE_HOST")
+
+LOCAL_VECTOR_DIR = os.getenv(
+    "LOCAL_VECTOR_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_store"),
+)
+# Overwritten and deleted rows are dropped once there are this many and at
+# least as many as live rows.
+COMPACT_MIN_DEAD_ROWS = int(os.getenv("LOCAL_VECTOR_COMPACT_ROWS", "1024"))
+
+
+class VectorStore:
+    """
+    Minimal vector index interface used by qachatbot.
+
+    Vectors are (id, values, metadata) tuples. query returns a list of
+    {"id", "score", "metadata"} dicts, best match first.
+    """
+
+    # identifies the physical index, e.g. for the document registry
+    name = "vector-store"
+
+    def upsert(self, vectors, namespace: str = None):
+        raise NotImplementedError
+
+    def query(self, vector, top_k: int, namespace: str = None) -> list[dict]:
+        raise NotImplementedError
+
+    def delete(self, ids, namespace: str = None):
+        raise NotImplementedError
+
+    def document_ids(self, namespace: str = None):
+        """Ids of the documents with vectors in the namespace, or None when the backend cannot list them."""
+        return None
+
+
+def _create_pinecone():
+    from pinecone import Pinecone
+
+    return Pinecone(api_key=PINECONE_API_KEY, host=PINECONE_HOST)
+
+
+if VECTOR_STORE == "pinecone":
+    providers.register("pinecone", _create_pinecone, required=["PINECONE_API_KEY"])
+
+
+class PineconeVectorStore(VectorStore):
+    def __init__(self):
+        self.pc = providers.client("pinecone")
+        self.name = f"pinecone:{PINECONE_INDEX}"
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _ensure_index(self, dim: int = None):
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            if dim is not None:
+                from pinecone import ServerlessSpec
+
+                existing = self.pc.list_indexes().names()
+                if PINECONE_INDEX not in existing:
+                    # You may want to update cloud/region as needed
+                    self.pc.create_index(
+                        name=PINECONE_INDEX,
+                        dimension=dim,
+                        metric="cosine",
+                        spec=ServerlessSpec(cloud="aws", region="us-west-2")
+                    )
+            self._index = self.pc.Index(PINECONE_INDEX)
+            return self._index
+
+    def upsert(self, vectors, namespace: str = None):
+        vectors = list(vectors)
+        if not vectors:
+            return
+        idx = self._ensure_index(dim=len(vectors[0][1]))
+        # use an optional namespace to separate documents
+        if namespace:
+            idx.upsert(vectors=vectors, namespace=namespace)
+        else:
+            idx.upsert(vectors=vectors)
+
+    def query(self, vector, top_k: int, namespace: str = None) -> list[dict]:
+        idx = self._ensure_index()
+        query_args = {"top_k": top_k, "include_metadata": True}
+        if namespace:
+            query_args["namespace"] = namespace
+        vector = [float(v) for v in vector]
+
+        try:
+            res = idx.query(vector=vector, **query_args)
+        except TypeError:
+            # fallback signature
+            res = idx.query(queries=[vector], **query_args)
+
+        matches = []
+        if isinstance(res, dict):
+            matches = res.get("matches", [])
+        elif hasattr(res, "matches"):
+            matches = res.matches
+
+        results = []
+        for m in matches[:top_k]:
+            if isinstance(m, dict):
+                results.append({"id": m.get("id"), "score": m.get("score"), "metadata": m.get("metadata") or {}})
+            else:
+                results.append({
+                    "id": getattr(m, "id", None),
+                    "score": getattr(m, "score", None),
+                    "metadata": getattr(m, "metadata", None) or {},
+                })
+        return results
+
+    def delete(self, ids, namespace: str = None):
+        idx = self._ensure_index()
+        if namespace:
+            idx.delete(ids=list(ids), namespace=namespace)
+        else:
+            idx.delete(ids=list(ids))
+
+
+class _LocalNamespace:
+    """
+    One namespace of the local store, shared by every worker on the host.
+
+    `records.jsonl` is an append-only log: a header naming the vectors file
+    and its dimension, then one line per upserted row ({"id", "row",
+    "metadata"}) or deletion ({"id", "deleted"}). Rows are L2-normalized
+    float32 vectors appended to the vectors file and read through a memory
+    map. Writers hold an flock on `.lock`; readers replay the lines appended
+    since they last looked, and start over when compaction rewrites the log.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.records_path = os.path.join(directory, "records.jsonl")
+        self.lock_path = os.path.join(directory, ".lock")
+        self._reset()
+
+    def _reset(self):
+        self.header = b""
+        self.offset = 0
+        self.dim = 0
+        self.vectors_path = None
+        # per row, including rows later overwritten or deleted
+        self.ids = []
+        self.metadata = []
+        # id -> live row
+        self.positions = {}
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self._live = None
+        self._documents = None
+
+    def refresh(self):
+        """Pick up log lines appended since the last read (possibly by another process)."""
+        try:
+            size = os.path.getsize(self.records_path)
+        except FileNotFoundError:
+            if self.header:
+                self._reset()
+            return
+        with open(self.records_path, "rb") as f:
+            if self.header and (size < self.offset or f.read(len(self.header)) != self.header):
+                # compacted since we last read it
+                self._reset()
+            if size == self.offset:
+                return
+            f.seek(self.offset)
+            tail = f.read(size - self.offset)
+        # ignore a partially written last line; it is picked up next time
+        complete = tail[:tail.rfind(b"\n") + 1]
+        for line in complete.splitlines(keepends=True):
+            self._apply(line)
+        self.offset += len(complete)
+        self._live = None
+        self._documents = None
+        if self.ids and self.matrix.shape[0] != len(self.ids):
+            self.matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+
+    def _apply(self, line: bytes):
+        record = json.loads(line)
+        if "vectors" in record:
+            self.header = line
+            self.dim = record["dim"]
+            self.vectors_path = os.path.join(self.directory, record["vectors"])
+        elif record.get("deleted"):
+            self.positions.pop(record["id"], None)
+        else:
+            self.positions[record["id"]] = record["row"]
+            self.ids.append(record["id"])
+            self.metadata.append(record["metadata"])
+
+    def live_rows(self) -> np.ndarray:
+        if self._live is None:
+            self._live = np.fromiter(self.positions.values(), dtype=np.int64, count=len(self.positions))
+        return self._live
+
+    def document_ids(self) -> set:
+        if self._documents is None:
+            self._documents = {self.metadata[row].get("document_id") for row in self.positions.values()}
+            self._documents.discard(None)
+        return self._documents
+
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(self.lock_path, "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _append(self, lines):
+        with open(self.records_path, "ab") as f:
+            f.write("".join(json.dumps(line) + "\n" for line in lines).encode("utf-8"))
+
+    def _rewrite(self, ids, matrix: np.ndarray, metadata):
+        """Replace the log and vectors file with just these rows."""
+        vectors_name = f"vectors-{uuid.uuid4().hex}.f32"
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(os.path.join(self.directory, vectors_name))
+        tmp_records = f"{self.records_path}.{os.getpid()}.tmp"
+        with open(tmp_records, "w") as f:
+            f.write(json.dumps({"vectors": vectors_name, "dim": int(matrix.shape[1])}) + "\n")
+            for row, (vid, md) in enumerate(zip(ids, metadata)):
+                f.write(json.dumps({"id": vid, "row": row, "metadata": md}) + "\n")
+        old_vectors = self.vectors_path
+        os.replace(tmp_records, self.records_path)
+        # readers that still map the old file keep it alive until they refresh
+        if old_vectors and old_vectors != os.path.join(self.directory, vectors_name):
+            try:
+                os.remove(old_vectors)
+            except FileNotFoundError:
+                pass
+        self.refresh()
+
+    def _compact_if_needed(self):
+        dead = len(self.ids) - len(self.positions)
+        if dead < max(COMPACT_MIN_DEAD_ROWS, len(self.positions)):
+            return
+        live = self.live_rows()
+        self._rewrite(
+            [self.ids[row] for row in live],
+            np.asarray(self.matrix[live]).reshape(len(live), self.dim),
+            [self.metadata[row] for row in live],
+        )
+
+    def upsert(self, ids, rows: np.ndarray, metadata):
+        with self._locked():
+            self.refresh()
+            if not self.header:
+                self._rewrite([], np.empty((0, rows.shape[1]), dtype=np.float32), [])
+            if self.dim != rows.shape[1]:
+                raise ValueError(f"Vector dimension {rows.shape[1]} does not match namespace dimension {self.dim}")
+            # Vectors first, log lines second, with explicit row numbers: a log
+            # line only ever points at a fully written row, even after a crash.
+            first_row = len(self.ids)
+            with open(self.vectors_path, "r+b") as f:
+                # drop rows a crashed writer wrote but never logged
+                f.truncate(first_row * 4 * self.dim)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(rows, dtype=np.float32).tobytes())
+            self._append(
+                {"id": vid, "row": first_row + i, "metadata": md}
+                for i, (vid, md) in enumerate(zip(ids, metadata))
+            )
+            self.refresh()
+            self._compact_if_needed()
+
+    def delete(self, ids):
+        with self._locked():
+            self.refresh()
+            gone = [vid for vid in ids if vid in self.positions]
+            if not gone:
+                return
+            self._append({"id": vid, "deleted": True} for vid in gone)
+            self.refresh()
+            self._compact_if_needed()
+
+    def query(self, q: np.ndarray, top_k: int) -> list[dict]:
+        self.refresh()
+        live = self.live_rows()
+        n = len(live)
+        if n == 0 or top_k <= 0:
+            return []
+        # dead rows are at most as many as live ones, so scoring all rows is cheap
+        scores = (self.matrix @ q)[live]
+        k = min(top_k, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"id": self.ids[live[i]], "score": float(scores[i]), "metadata": self.metadata[live[i]]}
+            for i in top
+        ]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Exact cosine search over in-process NumPy matrices, one per namespace,
+    persisted as memory-mapped files under LOCAL_VECTOR_DIR. Worker processes
+    on the same host may share the directory.
+    """
+
+    def __init__(self, directory: str = LOCAL_VECTOR_DIR):
+        self.directory = directory
+        self.name = f"local:{os.path.abspath(directory)}"
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: str = None) -> _LocalNamespace:
+        name = namespace or "__default__"
+        ns = self._namespaces.get(name)
+        if ns is None:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+            ns = _LocalNamespace(os.path.join(self.directory, safe_name))
+            self._namespaces[name] = ns
+        return ns
+
+    def upsert(self, vectors, namespace: str = None):
+        vectors = list(vectors)
+        if not vectors:
+            return
+        ids = [v[0] for v in vectors]
+        rows = _normalize_rows(np.asarray([v[1] for v in vectors], dtype=np.float32))
+        metadata = [v[2] if len(v) > 2 else {} for v in vectors]
+        with self._lock:
+            self._namespace(namespace).upsert(ids, rows, metadata)
+
+    def query(self, vector, top_k: int, namespace: str = None) -> list[dict]:
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        with self._lock:
+            return self._namespace(namespace).query(q, top_k)
+
+    def delete(self, ids, namespace: str = None):
+        with self._lock:
+            self._namespace(namespace).delete(list(ids))
+
+    def document_ids(self, namespace: str = None):
+        with self._lock:
+            ns = self._namespace(namespace)
+            ns.refresh()
+            return set(ns.document_ids())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Return the process-wide store selected by VECTOR_STORE."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if VECTOR_STORE == "local":
+                _store = LocalVectorStore()
+            elif VECTOR_STORE == "pinecone":
+                _store = PineconeVectorStore()
+            else:
+                raise ValueError(f"Unknown VECTOR_STORE '{VECTOR_STORE}' (expected 'pinecone' or 'local')")
+        return _store